@@ -2,7 +2,6 @@ import argparse
 import logging
 import os
 import socket
-import time
 from multiprocessing import set_start_method
 
 import foreverbull_core.logger
@@ -34,9 +33,10 @@ def run_foreverbull(client_parser: Parser, worker_pool: WorkerPool):
     fb = Foreverbull(broker.socket_config, worker_pool)
     client_parser.import_algo_file()
     fb.start()
-
-    while not broker.socket_config.port:
-        time.sleep(0.2)
+    fb.started.wait()
+    if not fb.running:
+        logging.error("unable to start instance")
+        return
 
     try:
         broker.http.service.update_instance(
@@ -48,12 +48,12 @@ def run_foreverbull(client_parser: Parser, worker_pool: WorkerPool):
         return
 
     try:
-        while fb.running:
-            time.sleep(0.5)
+        fb.join()
     except KeyboardInterrupt:
         logging.info("Keyboard- Interrupt recieved exiting")
 
     fb.stop()
+    fb.join()
 
     broker.http.service.update_instance(
         os.environ.get("SERVICE_NAME"), socket.gethostname(), broker.socket_config, False
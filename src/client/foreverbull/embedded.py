@@ -0,0 +1,146 @@
+import logging
+import threading
+from typing import List
+
+from foreverbull.foreverbull import Foreverbull
+from foreverbull.models import OHLC, Configuration
+from foreverbull.worker.worker import Worker
+from foreverbull_core.models.backtest import EngineConfig, Result
+from foreverbull_core.models.finance import OHLCBatch, Order, SymbolTable
+from foreverbull_core.models.socket import Request, SocketConfig, SocketTransport
+from foreverbull_core.models.worker import Database, Parameter
+from foreverbull_core.socket.memory import MemorySocket
+
+try:
+    from foreverbull_zipline.app import Application
+except ImportError:  # pragma: no cover
+    Application = None
+
+
+class EmbeddedError(Exception):
+    pass
+
+
+class EmbeddedWorker(Worker):
+    def __init__(self, **routes):
+        """Worker called directly by the embedded backtest instead of listening on a socket
+
+        Args:
+            routes: Functions to call per task, same as registered with Foreverbull.on
+        """
+        super(EmbeddedWorker, self).__init__(None, None, None, **routes)
+
+    def configure(self, configuration: Configuration):
+        self.logger.info("configuring embedded worker")
+        self._setup(configuration)
+
+    def process(self, request: Request) -> List[Order]:
+        """Runs the algorithm on a feed message
+
+        Args:
+            request (Request): ohlc or ohlc_batch message from the feed
+
+        Returns:
+            List[Order]: Orders placed by the algorithm
+        """
+        data = request.data
+        if self.configuration.symbols is not None:
+            data = self.configuration.symbols.decode(data)
+        if request.task == "ohlc_batch":
+            return self._process_ohlc_batch(OHLCBatch.from_trusted(data))
+        order = self._process_ohlc(OHLC.from_trusted(data))
+        return [order] if order else []
+
+
+class EmbeddedBacktest:
+    def __init__(
+        self,
+        engine_config: EngineConfig,
+        execution_id: str = "embedded",
+        parameters: List[Parameter] = None,
+        database: Database = None,
+        **routes,
+    ):
+        """Runs the backtest engine and the algorithm in this process. Application, Feed and Broker are
+        connected with memory sockets so messages are passed as objects and never serialized.
+
+        Args:
+            engine_config (EngineConfig): Configuration of the backtest
+            execution_id (str, optional): Id of the execution. Defaults to "embedded".
+            parameters (List[Parameter], optional): Parameters to the algorithm. Defaults to None.
+            database (Database, optional): Database of the algorithm, in memory if not set. Defaults to None.
+            routes: Functions to call per task. Defaults to the ones registered with Foreverbull.on
+
+        Raises:
+            EmbeddedError: In case foreverbull_zipline is not installed
+        """
+        if Application is None:
+            raise EmbeddedError("foreverbull_zipline is required to run embedded backtests")
+        self.logger = logging.getLogger(__name__)
+        self.engine_config = engine_config
+        self.execution_id = execution_id
+        self.parameters = parameters
+        self.database = database
+        self._routes = routes if routes else Foreverbull._worker_routes
+        self._completed = threading.Event()
+        self._error = None
+
+    @staticmethod
+    def _request(socket: MemorySocket, request: Request) -> dict:
+        socket.send(request)
+        response = socket.recv()
+        if response.error:
+            raise EmbeddedError(response.error)
+        return response.data
+
+    def _on_feed(self, application: Application, worker: EmbeddedWorker, message: Request) -> None:
+        try:
+            if message.task in ("ohlc", "ohlc_batch"):
+                for order in worker.process(message):
+                    self._request(application.stock_broker.socket, Request.construct(task="order", data=order))
+            elif message.task == "day_completed":
+                self._request(application.socket, Request(task="continue"))
+            elif message.task == "backtest_completed":
+                self._completed.set()
+        except Exception as exc:
+            self.logger.exception(repr(exc))
+            self._error = exc
+            self._completed.set()
+
+    def run(self, timeout: float = None) -> Result:
+        """Runs the backtest to the end
+
+        Args:
+            timeout (float, optional): Seconds to wait for the backtest to complete. Defaults to None.
+
+        Raises:
+            EmbeddedError: In case the engine or the algorithm fails
+
+        Returns:
+            Result: Result of the backtest
+        """
+        application = Application(SocketConfig(transport=SocketTransport.MEMORY.value), transport="memory")
+        application.run()
+        worker = EmbeddedWorker(**self._routes)
+        application.feed.socket.connect(lambda message: self._on_feed(application, worker, message))
+        try:
+            symbols = self._request(application.socket, Request(task="configure", data=self.engine_config))
+            worker.configure(
+                Configuration(
+                    execution_id=self.execution_id,
+                    execution_start_date=self.engine_config.start_date,
+                    execution_end_date=self.engine_config.end_date,
+                    database=self.database,
+                    parameters=self.parameters,
+                    socket=application.socket_config,
+                    symbols=SymbolTable.from_trusted(symbols),
+                )
+            )
+            self._request(application.socket, Request(task="run"))
+            if not self._completed.wait(timeout):
+                raise EmbeddedError("timeout when waiting for backtest to complete")
+            if self._error is not None:
+                raise EmbeddedError(repr(self._error))
+            return Result.load(self._request(application.socket, Request(task="result")))
+        finally:
+            application.stop()
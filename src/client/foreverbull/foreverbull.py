@@ -3,6 +3,8 @@ import threading
 
 from foreverbull.models import Configuration
 from foreverbull.worker import WorkerPool
+from foreverbull_core import metrics
+from foreverbull_core.models.socket import Response
 from foreverbull_core.socket.client import SocketClient, SocketConfig
 from foreverbull_core.socket.exceptions import SocketClosed, SocketTimeout
 from foreverbull_core.socket.router import MessageRouter
@@ -11,15 +13,23 @@ from foreverbull_core.socket.router import MessageRouter
 class Foreverbull(threading.Thread):
     _worker_routes = {}
 
-    def __init__(self, socket_config: SocketConfig = None, worker_pool: WorkerPool = None):
+    def __init__(self, socket_config: SocketConfig = None, worker_pool: WorkerPool = None, contexts: int = 4):
         self.socket_config = socket_config
+        self.contexts = contexts
         self.running = False
         self._worker_pool: WorkerPool = worker_pool
+        self._waiting = set()
+        self._waiting_lock = threading.Lock()
+        self._stopped = False
+        self.started = threading.Event()
         self.logger = logging.getLogger(__name__)
         self._routes = MessageRouter()
-        self._routes.add_route(self.stop, "stop")
-        self._routes.add_route(self.configure, "configure", Configuration)
-        self._routes.add_route(self.run_backtest, "run_backtest")
+        # the worker pool talks to its workers over a single survey socket
+        self._routes.add_route(self.stop, "stop", serialize="workers")
+        self._routes.add_route(self.configure, "configure", Configuration, serialize="workers")
+        self._routes.add_route(self.run_backtest, "run_backtest", serialize="workers")
+        self._routes.add_route(metrics.snapshot, "metrics")
+        self._routes.add_route(self._openmetrics, "openmetrics")
         threading.Thread.__init__(self)
 
     @staticmethod
@@ -31,27 +41,64 @@ class Foreverbull(threading.Thread):
         return decorator
 
     def run(self):
-        self.running = True
         self.logger.info("Starting instance")
-        socket = SocketClient(self.socket_config)
-        context_socket = None
+        try:
+            socket = SocketClient(self.socket_config)
+            with self._waiting_lock:
+                self.running = not self._stopped
+        finally:
+            self.started.set()
         self.logger.info("Listening on {}:{}".format(self.socket_config.host, self.socket_config.port))
+        contexts = [threading.Thread(target=self._serve, args=(socket,)) for _ in range(self.contexts)]
+        for context in contexts:
+            context.start()
+        for context in contexts:
+            context.join()
+        socket.close()
+        self.logger.info("exiting")
+
+    def _recv(self, context_socket):
+        # contexts waiting for a request are closed on stop, so stop does not wait for receive timeouts
+        with self._waiting_lock:
+            if not self.running:
+                raise SocketClosed("instance stopped")
+            self._waiting.add(context_socket)
+        try:
+            return context_socket.recv(lazy=True)
+        finally:
+            with self._waiting_lock:
+                self._waiting.discard(context_socket)
+
+    def _serve(self, socket: SocketClient) -> None:
         while self.running:
+            context_socket = socket.new_context()
+            request = None
             try:
-                self.logger.info("Getting context socket")
-                context_socket = socket.new_context()
-                self.logger.info("Context socket recieved")
-                request = context_socket.recv()
+                self.logger.info("Getting request")
+                request = self._recv(context_socket)
                 response = self._routes(request)
                 context_socket.send(response)
-                context_socket.close()
             except SocketTimeout:
-                context_socket.close()
-            except SocketClosed as exc:
-                self.logger.exception(exc)
+                pass
+            except SocketClosed:
                 self.logger.info("main socket closed, exiting")
-        socket.close()
-        self.logger.info("exiting")
+                return
+            except Exception as exc:
+                # the context keeps serving, the requester gets the error instead of waiting for a reply
+                self.logger.error(f"Error serving request: {repr(exc)}", exc_info=True)
+                self._send_error(context_socket, request, exc)
+            finally:
+                context_socket.close()
+
+    def _send_error(self, context_socket, request, exc: Exception) -> None:
+        task = request.task if request is not None else "unknown"
+        try:
+            context_socket.send(Response(task=task, error=repr(exc)))
+        except Exception as send_exc:
+            self.logger.warning(f"Unable to send error response: {repr(send_exc)}")
+
+    def _openmetrics(self) -> dict:
+        return {"text": metrics.openmetrics()}
 
     def configure(self, configuration: Configuration) -> None:
         self.logger.info("Configuring instance")
@@ -66,4 +113,8 @@ class Foreverbull(threading.Thread):
         self.logger.info("Stopping instance")
         if self._worker_pool:
             self._worker_pool.stop()
-        self.running = False
+        with self._waiting_lock:
+            self.running = False
+            self._stopped = True
+            for context_socket in self._waiting:
+                context_socket.close()
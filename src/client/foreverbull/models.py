@@ -2,6 +2,7 @@ from datetime import date, datetime
 from typing import List, Optional
 
 from foreverbull_core.models.base import Base
+from foreverbull_core.models.finance import SymbolTable
 from foreverbull_core.models.socket import SocketConfig
 from foreverbull_core.models.worker import Database, Parameter
 
@@ -11,6 +12,7 @@ class Configuration(Base):
     Args:
         database (Database, optional): Optional[Database]
         parameters (List[Parameter], optional): Optional[List[Parameter]]
+        symbols (SymbolTable, optional): Optional[SymbolTable]
     Returns:
         Instance: instance
     """
@@ -21,6 +23,7 @@ class Configuration(Base):
     database: Optional[Database]
     parameters: Optional[List[Parameter]]
     socket: SocketConfig
+    symbols: Optional[SymbolTable]
 
 
 class OHLC(Base):
@@ -7,9 +7,14 @@ import pynng
 from foreverbull.data import Database, DateManager
 from foreverbull.models import OHLC, Configuration
 from foreverbull.worker.exceptions import WorkerException
+from foreverbull_core import codec as codecs
+from foreverbull_core.models.finance import OHLCBatch
 from foreverbull_core.models.socket import Request, Response
 from foreverbull_core.models.worker import Parameter
+from foreverbull_core.socket import compression
+from foreverbull_core.socket.envelope import Envelope, is_envelope
 from foreverbull_core.socket.exceptions import SocketTimeout
+from foreverbull_core.socket.nanomsg import is_frame, unpack_frame
 
 
 class Worker:
@@ -20,6 +25,7 @@ class Worker:
         self._state_address = state_address
         self._stop_event = stop_event
         self._routes = routes
+        self.parameters = {}
         self.logger.info("worker configured correctly")
         super(Worker, self).__init__()
 
@@ -36,16 +42,64 @@ class Worker:
         except KeyError:
             raise WorkerException("No route for ohlc")
 
-    def configure(self, configuration: Configuration):
+    def _process_ohlc_batch(self, batch: OHLCBatch):
+        self.logger.debug("Processing OHLC batch: %s instruments, %s", len(batch), batch.time)
+        self.date.current = batch.time
+        if "ohlc_batch" in self._routes:
+            return self._routes["ohlc_batch"](batch, self.database)
+        orders = [self._process_ohlc(OHLC.from_trusted(ohlc.dict())) for ohlc in batch.ohlc()]
+        return [order for order in orders if order]
+
+    def _load_request(self, data: bytes) -> Request:
+        if is_frame(data):
+            meta, columns = unpack_frame(data)
+            # bar columns stay numpy views on the frame, only the isins are turned into a list to look up
+            columns["isin"] = columns["isin"].tolist()
+            # the time is sent as epoch microseconds, pydantic would guess seconds or milliseconds from its size
+            time = codecs.from_epoch(meta["time"])
+            request = Request.from_trusted({"task": meta["task"], "data": dict(columns, time=time)})
+        elif is_envelope(data):
+            request = Envelope.unpack(data).load(Request, trusted=True)
+        else:
+            request = Request.load(data, trusted=True)
+        if self.configuration.symbols is not None and request.data:
+            request.data = self.configuration.symbols.decode(request.data)
+        return request
+
+    def _dump_response(self, response: Response, request_data: bytes) -> bytes:
+        if is_envelope(request_data):
+            return Envelope.from_message(response, Envelope.unpack(request_data).codec).dump()
+        return response.dump(codecs.detect(request_data))
+
+    def _dump_error(self, error: Exception, request: Request, request_data: bytes) -> bytes:
+        response = Response(task=request.task if request is not None else "unknown", error=repr(error))
+        if request_data is None:
+            return self._peer.pack(response.dump())
+        try:
+            return self._peer.pack(self._dump_response(response, request_data))
+        except Exception:
+            # the request could not be read, so its codec is not known either
+            return self._peer.pack(response.dump())
+
+    def _setup(self, configuration: Configuration):
         self.configuration = configuration
-        self.logger.info("configuring worker")
-        self.socket = pynng.Rep0(dial=f"tcp://{self.configuration.socket.host}:{self.configuration.socket.port}")
-        self.socket.recv_timeout = 500
-        self.socket.send_timeout = 500
         if configuration.parameters:
             self._setup_parameters(*configuration.parameters)
         self.date = DateManager(configuration.execution_start_date, configuration.execution_end_date)
         self.database = Database(configuration.execution_id, self.date, configuration.database)
+
+    def configure(self, configuration: Configuration):
+        self.logger.info("configuring worker")
+        self._setup(configuration)
+        self.socket = pynng.Rep0(dial=self.configuration.socket.url())
+        # the raw socket does not decompress, requests over the threshold arrive compressed
+        self._peer = compression.Peer(
+            compression.resolve(configuration.socket.compression),
+            configuration.socket.compression_threshold,
+            compression.Peer.REPLY,
+        )
+        self.socket.recv_timeout = 500
+        self.socket.send_timeout = 500
         self.logger.info("worker configured correctly")
 
     def run(self):
@@ -56,6 +110,7 @@ class Worker:
         state.send(b"ready")
         self.logger.info("starting worker")
         while True:
+            request = None
             try:
                 request = Request.load(responder.recv())
                 self.logger.info("Received request")
@@ -79,27 +134,37 @@ class Worker:
                 pass
             except Exception as e:
                 self.logger.exception(repr(e))
-                responder.send(Response(task=request.task, error=repr(e)).dump())
+                task = request.task if request is not None else "unknown"
+                responder.send(Response(task=task, error=repr(e)).dump())
                 responder.close()
                 state.close()
                 raise WorkerException(repr(e))
 
     def run_backtest(self):
         while True:
+            request = None
+            data = None
             try:
                 self.logger.info("Getting context socket")
                 context_socket = self.socket.new_context()
                 self.logger.info("Getting request")
-                request = Request.load(context_socket.recv())
-                order = self._process_ohlc(OHLC(**request.data))
-                self.logger.info(f"Sending response {order}")
-                context_socket.send(Response(task=request.task, data=order).dump())
+                data = self._peer.unpack(context_socket.recv())
+                request = self._load_request(data)
+                if request.task == "ohlc_batch":
+                    orders = self._process_ohlc_batch(OHLCBatch.from_trusted(request.data))
+                    self.logger.info(f"Sending response {orders}")
+                    response = Response(task=request.task, data={"orders": orders})
+                else:
+                    order = self._process_ohlc(OHLC.from_trusted(request.data))
+                    self.logger.info(f"Sending response {order}")
+                    response = Response(task=request.task, data=order)
+                context_socket.send(self._peer.pack(self._dump_response(response, data)))
                 context_socket.close()
             except (SocketTimeout, pynng.exceptions.Timeout):
                 context_socket.close()
             except Exception as e:
                 self.logger.exception(repr(e))
-                context_socket.send(Response(task=request.task, error=repr(e)).dump())
+                context_socket.send(self._dump_error(e, request, data))
                 context_socket.close()
                 raise WorkerException(repr(e))
             if self._stop_event.is_set():
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import pytest
+from foreverbull.embedded import EmbeddedBacktest, EmbeddedError, EmbeddedWorker
+from foreverbull.models import Configuration
+from foreverbull_core.models.backtest import EngineConfig, IngestConfig
+from foreverbull_core.models.finance import OHLC, OHLCBatch, Order, SymbolTable
+from foreverbull_core.models.socket import Request, SocketConfig
+
+
+def embedded_configuration(**kwargs):
+    return Configuration(
+        execution_id="test",
+        execution_start_date=datetime(2020, 1, 1),
+        execution_end_date=datetime(2021, 12, 31),
+        socket=SocketConfig(transport="memory"),
+        **kwargs,
+    )
+
+
+@pytest.fixture()
+def engine_config(loaded_database, database_config, instruments):
+    bundles = pytest.importorskip("zipline.data.bundles")
+    backtest = pytest.importorskip("foreverbull_zipline.backtest")
+    try:
+        bundles.load("foreverbull")
+    except ValueError:
+        ingest_config = IngestConfig(
+            database=database_config.dict(),
+            name="foreverbull",
+            calendar_name="NYSE",
+            from_date="2020-01-01",
+            to_date="2021-12-31",
+            isins=list(instruments),
+        )
+        backtest.Backtest().ingest(ingest_config)
+    return EngineConfig(
+        bundle="foreverbull",
+        calendar="NYSE",
+        start_date="2020-01-07",
+        end_date="2020-02-01",
+        benchmark="US0378331005",
+        isins=["US0378331005", "US88160R1014"],
+    )
+
+
+def test_embedded_worker():
+    received = []
+
+    def ohlc(ohlc, database):
+        received.append(ohlc)
+        return Order(isin=ohlc.isin, amount=10)
+
+    worker = EmbeddedWorker(ohlc=ohlc)
+    worker.configure(embedded_configuration())
+
+    bar = OHLC(isin="ISIN11223344", open=1.0, high=2.0, low=0.5, close=1.5, volume=100, time=datetime(2020, 1, 7))
+    orders = worker.process(Request(task="ohlc", data=bar.dict()))
+    assert orders == [Order(isin="ISIN11223344", amount=10)]
+    assert received[0].isin == "ISIN11223344"
+
+    batch = OHLCBatch.from_ohlc([bar, bar], bar.time)
+    orders = worker.process(Request(task="ohlc_batch", data=batch.dict()))
+    assert len(orders) == 2
+
+
+def test_embedded_worker_symbol_ids():
+    received = []
+
+    def ohlc(ohlc, database):
+        received.append(ohlc.isin)
+
+    symbols = SymbolTable(isins=["ISIN11223344", "ISIN55667788"])
+    worker = EmbeddedWorker(ohlc=ohlc)
+    worker.configure(embedded_configuration(symbols=symbols))
+
+    bar = OHLC(isin="ISIN55667788", open=1.0, high=2.0, low=0.5, close=1.5, volume=100, time=datetime(2020, 1, 7))
+    assert worker.process(Request(task="ohlc", data=symbols.encode(bar.dict()))) == []
+    assert received == ["ISIN55667788"]
+
+
+def test_embedded_backtest(engine_config):
+    received = []
+
+    def ohlc(ohlc, database):
+        received.append(ohlc)
+        if len(received) == 1:
+            return Order(isin=ohlc.isin, amount=10)
+
+    result = EmbeddedBacktest(engine_config, ohlc=ohlc).run(timeout=120)
+    assert {bar.isin for bar in received} == {"US0378331005", "US88160R1014"}
+    assert len(result.periods) == len({bar.time for bar in received})
+    assert result.periods[-1].long_value > 0
+
+
+@pytest.mark.parametrize("feed_mode", ["ohlc_batch", "ohlc_frame"])
+def test_embedded_backtest_batches(engine_config, feed_mode):
+    received = []
+
+    def ohlc(ohlc, database):
+        received.append(ohlc.isin)
+
+    engine_config.feed_mode = feed_mode
+    engine_config.symbol_ids = True
+    result = EmbeddedBacktest(engine_config, ohlc=ohlc).run(timeout=120)
+    assert set(received) == {"US0378331005", "US88160R1014"}
+    assert len(result.periods) > 0
+
+
+def test_embedded_backtest_algorithm_error(engine_config):
+    def ohlc(ohlc, database):
+        raise ValueError("bad algorithm")
+
+    with pytest.raises(EmbeddedError, match="bad algorithm"):
+        EmbeddedBacktest(engine_config, ohlc=ohlc).run(timeout=120)
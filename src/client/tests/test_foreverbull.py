@@ -61,3 +61,24 @@ def test_configure_and_stop_over_socket(client_socket_config, worker_pool, confi
     assert response.error is None
 
     fb.join()
+
+
+def test_bad_request_answered(client_socket_config):
+    fb = Foreverbull(client_socket_config, contexts=1)
+    fb.start()
+    fb.started.wait(5)
+
+    socket = Req0(dial=f"tcp://{client_socket_config.host}:{client_socket_config.port}")
+    socket.recv_timeout = 5000
+    socket.send(b"{not json")
+    response = Response.load(socket.recv())
+    assert response.task == "unknown"
+    assert response.error is not None
+
+    # the only context keeps serving
+    socket.send(Request(task="metrics").dump())
+    assert Response.load(socket.recv()).error is None
+
+    socket.close()
+    fb.stop()
+    fb.join()
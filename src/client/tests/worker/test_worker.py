@@ -1,14 +1,21 @@
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from multiprocessing import Event
+from types import SimpleNamespace
 
+import numpy as np
 import pynng
 import pytest
 from foreverbull.data import Database
 from foreverbull.models import OHLC
+from foreverbull.worker.exceptions import WorkerException
 from foreverbull.worker.worker import Worker, WorkerPool, WorkerProcess, WorkerThread
-from foreverbull_core.models.finance import Order
+from foreverbull_core.models.finance import OHLCBatch, Order
+from foreverbull_core import codec
 from foreverbull_core.models.socket import Request, Response
+from foreverbull_core.socket import compression
+from foreverbull_core.socket.envelope import Envelope
+from foreverbull_core.socket.nanomsg import pack_frame
 from pandas import DataFrame
 from pynng import Req0
 
@@ -128,3 +135,56 @@ def test_pool(client_config, server_socket_config, spawn_process, loaded_databas
 
     assert response.task == request.task
     assert response.error is None
+
+
+@pytest.mark.parametrize("time", [datetime(2020, 1, 7, tzinfo=timezone.utc), datetime(1970, 3, 1, tzinfo=timezone.utc)])
+def test_load_request_frame(time):
+    worker = Worker("ipc:///tmp/worker_pool.ipc", "ipc:///tmp/worker_pool_state.ipc", Event())
+    worker.configuration = SimpleNamespace(symbols=None)
+    arrays = {
+        "isin": np.array(["US0378331005", "US88160R1014"]),
+        "open": np.array([1.0, 2.0]),
+        "high": np.array([1.5, 2.5]),
+        "low": np.array([0.5, 1.5]),
+        "close": np.array([1.2, 2.2]),
+        "volume": np.array([100, 200], dtype=np.int64),
+    }
+    request = worker._load_request(pack_frame(arrays, {"task": "ohlc_batch", "time": codec.to_epoch(time)}))
+    assert request.task == "ohlc_batch"
+    batch = OHLCBatch.from_trusted(request.data)
+    assert batch.isin == ["US0378331005", "US88160R1014"]
+    assert batch.time == time
+    # bar columns are passed on without being copied into lists
+    assert isinstance(batch.close, np.ndarray) and not batch.close.flags.owndata
+    assert batch.ohlc()[1].close == 2.2
+
+
+@pytest.mark.parametrize(
+    "data, task",
+    [
+        (Envelope.from_message(Request(task="ohlc", data={"isin": "US0378331005"}), codec.MSGPACK).dump(), "ohlc"),
+        (b"{not json", "unknown"),
+    ],
+)
+def test_run_backtest_error(data, task):
+    worker = Worker("ipc:///tmp/worker_pool.ipc", "ipc:///tmp/worker_pool_state.ipc", Event())
+    worker.configuration = SimpleNamespace(symbols=None)
+    worker.socket = pynng.Rep0(listen="tcp://127.0.0.1:5858", recv_timeout=5000)
+    worker._peer = compression.Peer(compression.resolve(compression.ZLIB), 65536, compression.Peer.REPLY)
+    requester = Req0(dial="tcp://127.0.0.1:5858", recv_timeout=5000)
+
+    requester.send(data)
+    with pytest.raises(WorkerException):
+        worker.run_backtest()
+    reply = requester.recv()
+    if task == "unknown":
+        response = Response.load(reply)
+    else:
+        # answered in the envelope and codec of the request
+        assert Envelope.unpack(reply).codec.name == codec.MSGPACK
+        response = Envelope.unpack(reply).load(Response)
+    assert response.task == task
+    assert response.error is not None
+
+    requester.close()
+    worker.socket.close()
@@ -0,0 +1,207 @@
+import enum
+import json
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Union
+
+from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+
+class CodecNotFound(Exception):
+    pass
+
+
+def to_utc(value: datetime) -> datetime:
+    """Treats a naive datetime as UTC, the same as every codec does on the wire
+
+    Args:
+        value (datetime): datetime to convert
+
+    Returns:
+        datetime: value with a timezone, UTC in case it had none
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def to_epoch(value: Union[date, datetime]) -> int:
+    """Converts a date or datetime into microseconds since epoch, naive datetimes are treated as UTC
+
+    Args:
+        value (Union[date, datetime]): date or datetime to convert
+
+    Returns:
+        int: microseconds since 1970-01-01 UTC
+    """
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return (to_utc(value) - EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch(value: int) -> datetime:
+    """Converts microseconds since epoch into a UTC datetime, see to_epoch
+
+    Args:
+        value (int): microseconds since 1970-01-01 UTC
+
+    Returns:
+        datetime: UTC datetime
+    """
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+class Codec:
+    """Serializes dictionaries to and from bytes sent over a socket"""
+
+    name: str = None
+
+    def encode(self, data: dict) -> bytes:
+        raise NotImplementedError()
+
+    def decode(self, data: bytes) -> dict:
+        raise NotImplementedError()
+
+    def detect(self, data: bytes) -> bool:
+        """Checks if the data looks like it has been encoded by this codec
+
+        Args:
+            data (bytes): Encoded data
+
+        Returns:
+            bool: True in case this codec should be used to decode the data
+        """
+        raise NotImplementedError()
+
+
+class JSONCodec(Codec):
+    name = JSON
+
+    def encode(self, data: dict) -> bytes:
+        return json.dumps(data, default=pydantic_encoder).encode()
+
+    def decode(self, data: bytes) -> dict:
+        return json.loads(data.decode())
+
+    def detect(self, data: bytes) -> bool:
+        return data[:1] in (b"{", b"[")
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, datetime):
+        # a timestamp extension, a bare epoch would be read as seconds or milliseconds depending on its size
+        seconds, microseconds = divmod(to_epoch(obj), 1000000)
+        return msgpack.Timestamp(seconds, microseconds * 1000)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    return pydantic_encoder(obj)
+
+
+class MsgpackCodec(Codec):
+    """Compact binary codec, datetimes are sent as timestamps and decoded as UTC, naive ones are treated as UTC"""
+
+    name = MSGPACK
+
+    def encode(self, data: dict) -> bytes:
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+    def decode(self, data: bytes) -> dict:
+        return msgpack.unpackb(data, raw=False, timestamp=3)
+
+    def detect(self, data: bytes) -> bool:
+        # fixmap, map16 or map32
+        return len(data) > 0 and (0x80 <= data[0] <= 0x8F or data[0] in (0xDE, 0xDF))
+
+
+_codecs: Dict[str, Codec] = {}
+
+
+def register(codec: Codec) -> None:
+    """Register a codec so it can be selected by name in a SocketConfig
+
+    Args:
+        codec (Codec): Codec to register
+    """
+    _codecs[codec.name] = codec
+
+
+def available() -> list:
+    """Names of all codecs that can be used in this process
+
+    Returns:
+        list: codec names
+    """
+    return list(_codecs)
+
+
+def get(codec: Union[str, Codec, None] = None) -> Codec:
+    """Returns a registered codec, JSON in case nothing is given
+
+    Args:
+        codec (Union[str, Codec, None], optional): Name of codec or codec itself. Defaults to None.
+
+    Raises:
+        CodecNotFound: In case the codec is not registered
+
+    Returns:
+        Codec: Codec to use
+    """
+    if codec is None:
+        return _codecs[JSON]
+    if isinstance(codec, Codec):
+        return codec
+    try:
+        return _codecs[codec]
+    except KeyError:
+        raise CodecNotFound(f"codec {codec} not found")
+
+
+def resolve(codec: Union[str, None]) -> Codec:
+    """Codec a socket starts sending with, the configured one if this process has it and JSON otherwise.
+    Nothing is agreed with the peer up front: every peer detects the codec of what it receives and
+    replies in it, so a sender that fell back to JSON is still understood.
+
+    Args:
+        codec (Union[str, None]): Name of the configured codec
+
+    Returns:
+        Codec: Codec to send with
+    """
+    try:
+        return get(codec)
+    except CodecNotFound:
+        return _codecs[JSON]
+
+
+def detect(data: bytes) -> Codec:
+    """Find out which codec was used to encode incoming data, older peers only speak JSON
+
+    Args:
+        data (bytes): Encoded data
+
+    Returns:
+        Codec: Codec to decode the data with
+    """
+    for codec in _codecs.values():
+        if codec.detect(data):
+            return codec
+    return _codecs[JSON]
+
+
+register(JSONCodec())
+if msgpack is not None:
+    register(MsgpackCodec())
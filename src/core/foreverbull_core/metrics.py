@@ -0,0 +1,187 @@
+import bisect
+import math
+import threading
+from typing import Dict, Tuple
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+
+# seconds, from fast message handling up to slow requests like ingest
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class Counter:
+    """Value that only goes up, like number of messages sent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Counts observations, like latencies, into buckets of upper bounds"""
+
+    def __init__(self, buckets: Tuple[float] = DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.buckets):
+                self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self) -> Dict[float, int]:
+        """Number of observations less than or equal to each bucket, the last one is +Inf
+
+        Returns:
+            Dict[float, int]: upper bound and count
+        """
+        buckets = {}
+        total = 0
+        with self._lock:
+            for bound, count in zip(self.buckets, self.counts):
+                total += count
+                buckets[bound] = total
+            buckets[math.inf] = self.count
+        return buckets
+
+
+def _format_labels(labels: Tuple[Tuple[str, str]], **extra) -> str:
+    labels = list(labels) + list(extra.items())
+    if not labels:
+        return ""
+    values = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"')) for key, value in labels
+    )
+    return "{" + values + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == math.inf else repr(bound)
+
+
+class Registry:
+    def __init__(self):
+        """Holds all metrics of the process, metrics are identified by name and labels"""
+        self._lock = threading.Lock()
+        self._families = {}
+
+    def _metric(self, kind: str, name: str, help: str, labels: dict, factory):
+        key = tuple(sorted((str(key), str(value)) for key, value in labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, {"type": kind, "help": help, "metrics": {}})
+            if family["type"] != kind:
+                raise ValueError(f"metric {name} is a {family['type']}, not a {kind}")
+            if key not in family["metrics"]:
+                family["metrics"][key] = factory()
+            return family["metrics"][key]
+
+    def counter(self, name: str, help: str, **labels) -> Counter:
+        """Get or create a counter
+
+        Args:
+            name (str): Name of the metric, without _total
+            help (str): Description of the metric
+            labels: Labels identifying the counter within the metric
+
+        Returns:
+            Counter: counter
+        """
+        return self._metric(COUNTER, name, help, labels, Counter)
+
+    def histogram(self, name: str, help: str, **labels) -> Histogram:
+        """Get or create a histogram
+
+        Args:
+            name (str): Name of the metric
+            help (str): Description of the metric
+            labels: Labels identifying the histogram within the metric
+
+        Returns:
+            Histogram: histogram
+        """
+        return self._metric(HISTOGRAM, name, help, labels, Histogram)
+
+    def snapshot(self) -> dict:
+        """Current value of all metrics
+
+        Returns:
+            dict: metric name to a list of labels and values
+        """
+        with self._lock:
+            families = {name: (family["type"], dict(family["metrics"])) for name, family in self._families.items()}
+        snapshot = {}
+        for name, (kind, metrics) in families.items():
+            samples = []
+            for labels, metric in metrics.items():
+                if kind == COUNTER:
+                    samples.append({"labels": dict(labels), "value": metric.value})
+                else:
+                    buckets = {_format_bound(bound): count for bound, count in metric.cumulative().items()}
+                    samples.append(
+                        {"labels": dict(labels), "count": metric.count, "sum": metric.sum, "buckets": buckets}
+                    )
+            snapshot[name] = samples
+        return snapshot
+
+    def openmetrics(self) -> str:
+        """All metrics in OpenMetrics text format
+
+        Returns:
+            str: metrics, ending with # EOF
+        """
+        with self._lock:
+            families = [
+                (name, family["type"], family["help"], dict(family["metrics"]))
+                for name, family in self._families.items()
+            ]
+        lines = []
+        for name, kind, help, metrics in families:
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"# HELP {name} {help}")
+            for labels, metric in metrics.items():
+                if kind == COUNTER:
+                    lines.append(f"{name}_total{_format_labels(labels)} {metric.value}")
+                    continue
+                for bound, count in metric.cumulative().items():
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=_format_bound(bound))} {count}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Remove all metrics"""
+        with self._lock:
+            self._families = {}
+
+
+REGISTRY = Registry()
+
+
+def snapshot() -> dict:
+    """Current value of all metrics in the process, see Registry.snapshot
+
+    Returns:
+        dict: metric name to a list of labels and values
+    """
+    return REGISTRY.snapshot()
+
+
+def openmetrics() -> str:
+    """All metrics in the process in OpenMetrics text format, see Registry.openmetrics
+
+    Returns:
+        str: metrics
+    """
+    return REGISTRY.openmetrics()
@@ -1,8 +1,11 @@
+import enum
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
+import pydantic
 from foreverbull_core.models import worker
 from foreverbull_core.models.base import Base
+from foreverbull_core.models.finance import Position
 from foreverbull_core.models.socket import SocketConfig
 
 # KEEP TILL HTTP IS FIXED
@@ -42,6 +45,11 @@ class Sockets(Base):
     running: bool
 
 
+class DataFrequency(enum.Enum):
+    DAILY = "daily"
+    MINUTE = "minute"
+
+
 class IngestConfig(Base):
     name: str
     calendar_name: str
@@ -49,6 +57,17 @@ class IngestConfig(Base):
     to_date: str
     isins: List[str]
     database: Optional[Database]
+    frequency: str = DataFrequency.DAILY.value
+
+    @pydantic.validator("frequency")
+    def validate_frequency(cls, v):
+        return DataFrequency(v).value
+
+
+class FeedMode(enum.Enum):
+    OHLC = "ohlc"
+    OHLC_BATCH = "ohlc_batch"
+    OHLC_FRAME = "ohlc_frame"
 
 
 class EngineConfig(Base):
@@ -59,6 +78,68 @@ class EngineConfig(Base):
     timezone: str = "utc"
     benchmark: str
     isins: List[str]
+    data_frequency: str = DataFrequency.DAILY.value
+    feed_mode: str = FeedMode.OHLC.value
+    symbol_ids: bool = False
+    feed_window: int = 0
+    feed_buffer: int = 0
+    feed_queue: int = 0
+    feed_credit: int = 0
+    feed_portfolio: bool = False
+    feed_keyframe: int = 20
+
+    @pydantic.validator("data_frequency")
+    def validate_data_frequency(cls, v):
+        return DataFrequency(v).value
+
+    @pydantic.validator("feed_mode")
+    def validate_feed_mode(cls, v):
+        return FeedMode(v).value
+
+
+class FeedSequence(Base):
+    """Sequence number of a feed message, used to acknowledge or replay messages
+
+    Args:
+        seq (int): int
+
+    Returns:
+        FeedSequence: sequence
+    """
+
+    seq: int
+
+
+class FeedCredit(Base):
+    """Number of days the engine may run ahead of the consumer
+
+    Args:
+        days (int): int
+
+    Returns:
+        FeedCredit: credit
+    """
+
+    days: int
+
+    @pydantic.validator("days")
+    def validate_days(cls, v):
+        if v < 1:
+            raise ValueError("days must be at least 1")
+        return v
+
+
+class SessionId(Base):
+    """Id of a backtest session hosted by an engine
+
+    Args:
+        id (str): str
+
+    Returns:
+        SessionId: session
+    """
+
+    id: str
 
 
 class Period(Base):
@@ -110,5 +191,45 @@ class Period(Base):
         return period
 
 
+class PortfolioSnapshot(Base):
+    """Period of the portfolio together with the positions added or changed since the previous snapshot
+    and the isins of positions closed. A keyframe carries all open positions.
+
+    Args:
+        period (Period): Period
+        positions (List[Position]): List[Position]
+        closed (List[str]): List[str]
+        keyframe (bool): bool
+
+    Returns:
+        PortfolioSnapshot: snapshot
+    """
+
+    period: Period
+    positions: List[Position] = []
+    closed: List[str] = []
+    keyframe: bool = False
+
+    def apply(self, positions: Dict[str, Position] = None) -> Dict[str, Position]:
+        """Applies the snapshot to the positions built from earlier snapshots
+
+        Args:
+            positions (Dict[str, Position], optional): Open positions by isin. Defaults to None.
+
+        Raises:
+            ValueError: In case there are no earlier positions and the snapshot is not a keyframe
+
+        Returns:
+            Dict[str, Position]: Open positions by isin after this snapshot
+        """
+        if self.keyframe:
+            return {position.isin: position for position in self.positions}
+        if positions is None:
+            raise ValueError("wait for a keyframe before applying changes")
+        positions = {isin: position for isin, position in positions.items() if isin not in self.closed}
+        positions.update({position.isin: position for position in self.positions})
+        return positions
+
+
 class Result(Base):
     periods: List[Period]
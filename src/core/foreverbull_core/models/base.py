@@ -1,7 +1,38 @@
-import json
-from typing import Union
+import enum
+from datetime import date, datetime
+from typing import Callable, Dict, Optional, Union
 
+from foreverbull_core import codec as codecs
 from pydantic import BaseModel
+from pydantic.datetime_parse import parse_date, parse_datetime
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+
+_trusted_converters: Dict[type, Dict[str, Callable]] = {}
+
+
+def _field_converter(field: ModelField) -> Optional[Callable]:
+    type_ = field.type_
+    if not isinstance(type_, type):
+        return None
+    if issubclass(type_, Base):
+
+        def convert(v):
+            return v if isinstance(v, type_) else type_.from_trusted(v)
+
+    elif issubclass(type_, datetime):
+        convert = parse_datetime
+    elif issubclass(type_, date):
+        convert = parse_date
+    elif issubclass(type_, enum.Enum):
+        convert = type_
+    else:
+        return None
+
+    if field.shape == SHAPE_SINGLETON:
+        return lambda v: None if v is None else convert(v)
+    if field.shape == SHAPE_LIST:
+        return lambda v: None if v is None else [convert(item) for item in v]
+    return None
 
 
 class Base(BaseModel):
@@ -10,28 +41,65 @@ class Base(BaseModel):
     """
 
     @classmethod
-    def load(cls, data: Union[dict, bytes]) -> object:
+    def from_trusted(cls, data: dict) -> object:
+        """Builds the object without validation, intended for data coming from our own processes.
+        Only nested models, dates, datetimes and enums are converted, validators are not run.
+
+        Args:
+            data (dict): Dictionary with the values of the object
+
+        Returns:
+            object: Pydantic object that represents the Data.
+        """
+        converters = _trusted_converters.get(cls)
+        if converters is None:
+            converters = {}
+            for name, field in cls.__fields__.items():
+                converter = _field_converter(field)
+                if converter is not None:
+                    converters[name] = converter
+            _trusted_converters[cls] = converters
+        values = {}
+        for name, value in data.items():
+            if name not in cls.__fields__:
+                continue
+            values[name] = converters[name](value) if name in converters else value
+        return cls.construct(**values)
+
+    @classmethod
+    def load(cls, data: Union[dict, bytes], codec: Union[str, codecs.Codec] = None, trusted: bool = False) -> object:
         """Loads a dynamic Dictionary or byte string containing dynamic Dictionary.
         Sets the inner key, values into the Pydantic Object
 
         Args:
             data (Union[dict, bytes]): Can either be a Dictionary or en encoded string of the Dictionary.
+            An instance of the model itself is returned as is.
+            codec (Union[str, Codec], optional): Codec used to decode bytes. Detected from the data if not set.
+            trusted (bool, optional): Skip validation, see from_trusted. Defaults to False.
 
         Returns:
             object: Pydantic object that represents the Data.
         """
-        if type(data) is dict:
-            return cls(**data)
-        loaded = json.loads(data.decode())
-        return cls(**loaded)
+        if isinstance(data, cls):
+            return data
+        if type(data) is not dict:
+            if codec is None:
+                codec = codecs.detect(data)
+            data = codecs.get(codec).decode(data)
+        if trusted:
+            return cls.from_trusted(data)
+        return cls(**data)
 
-    def dump(self) -> bytes:
-        """_summary_
+    def dump(self, codec: Union[str, codecs.Codec] = None) -> bytes:
+        """Serializes the object to bytes
+
+        Args:
+            codec (Union[str, Codec], optional): Codec to encode with. Defaults to JSON.
 
         Returns:
-            bytes: _description_
+            bytes: Encoded object
         """
-        return self.json().encode()
+        return codecs.get(codec).encode(self.dict())
 
     def update_fields(self, object: dict):
         """_summary_
@@ -1,10 +1,110 @@
 from datetime import datetime
 from enum import IntEnum
-from typing import Optional
+from typing import Dict, List, Optional, Union
+
+import pydantic
 
 from foreverbull_core.models.base import Base
 
 
+class UnknownAssetId(Exception):
+    pass
+
+
+# message fields holding an isin or a list of isins, nested dictionaries are looked into as well
+_ISIN_FIELDS = ("isin", "closed")
+
+
+class SymbolTable(Base):
+    """Isins of a session, the index of an isin is the asset id sent in its place over the wire.
+    Both ends get the same table when the session is configured.
+
+    Args:
+        isins (List[str]): List[str]
+
+    Returns:
+        SymbolTable: table
+    """
+
+    isins: List[str] = []
+    _ids: Dict[str, int] = pydantic.PrivateAttr(default_factory=dict)
+
+    def id(self, isin: Union[str, int]) -> Union[str, int]:
+        """Asset id of an isin, isins not part of the session are returned as is
+
+        Args:
+            isin (Union[str, int]): isin
+
+        Returns:
+            Union[str, int]: asset id
+        """
+        if len(self._ids) != len(self.isins):
+            self._ids = {isin: index for index, isin in enumerate(self.isins)}
+        return self._ids.get(isin, isin)
+
+    def isin(self, asset_id: Union[str, int]) -> str:
+        """Isin of an asset id, isins are returned as is
+
+        Args:
+            asset_id (Union[str, int]): asset id
+
+        Raises:
+            UnknownAssetId: In case the id is not part of the session
+
+        Returns:
+            str: isin
+        """
+        if isinstance(asset_id, int):
+            if not 0 <= asset_id < len(self.isins):
+                raise UnknownAssetId(f"asset id {asset_id} is not part of the session")
+            return self.isins[asset_id]
+        return asset_id
+
+    def _map(self, data: dict, convert) -> dict:
+        mapped = None
+        for key, value in data.items():
+            if value is None:
+                continue
+            if key in _ISIN_FIELDS:
+                value = [convert(i) for i in value] if isinstance(value, list) else convert(value)
+            elif isinstance(value, dict):
+                value = self._map(value, convert)
+            elif isinstance(value, list) and value and isinstance(value[0], dict):
+                value = [self._map(item, convert) for item in value]
+            else:
+                continue
+            if mapped is None:
+                mapped = dict(data)
+            mapped[key] = value
+        return data if mapped is None else mapped
+
+    def encode(self, data: dict) -> dict:
+        """Replaces the isins in message data with asset ids, also in nested data such as the positions
+        of a portfolio snapshot
+
+        Args:
+            data (dict): message data
+
+        Returns:
+            dict: copy of data with asset ids
+        """
+        return self._map(data, self.id)
+
+    def decode(self, data: dict) -> dict:
+        """Replaces asset ids in message data with isins, reverse of encode
+
+        Args:
+            data (dict): message data
+
+        Raises:
+            UnknownAssetId: In case an asset id is not part of the session
+
+        Returns:
+            dict: copy of data with isins
+        """
+        return self._map(data, self.isin)
+
+
 class Instrument(Base):
     isin: str
     symbol: str
@@ -22,6 +122,68 @@ class OHLC(Base):
     time: datetime
 
 
+class OHLCBatch(Base):
+    """All bars of a single period stored as parallel columns, one row per instrument. Loaded from an
+    array frame the price and volume columns are numpy arrays.
+
+    Args:
+        isin (List[str]): List[str]
+        open (List[float]): List[float]
+        high (List[float]): List[float]
+        low (List[float]): List[float]
+        close (List[float]): List[float]
+        volume (List[int]): List[int]
+        time (datetime): datetime
+
+    Returns:
+        OHLCBatch: batch
+    """
+
+    isin: List[str] = []
+    open: List[float] = []
+    high: List[float] = []
+    low: List[float] = []
+    close: List[float] = []
+    volume: List[int] = []
+    time: datetime
+
+    @pydantic.root_validator(skip_on_failure=True)
+    def validate_columns(cls, values):
+        rows = len(values["isin"])
+        for column in ("open", "high", "low", "close", "volume"):
+            if len(values[column]) != rows:
+                raise ValueError(f"column {column} has {len(values[column])} rows, expected {rows}")
+        return values
+
+    def __len__(self) -> int:
+        return len(self.isin)
+
+    @classmethod
+    def from_ohlc(cls, ohlcs: List[OHLC], time: datetime) -> "OHLCBatch":
+        return cls(
+            isin=[ohlc.isin for ohlc in ohlcs],
+            open=[ohlc.open for ohlc in ohlcs],
+            high=[ohlc.high for ohlc in ohlcs],
+            low=[ohlc.low for ohlc in ohlcs],
+            close=[ohlc.close for ohlc in ohlcs],
+            volume=[ohlc.volume for ohlc in ohlcs],
+            time=time,
+        )
+
+    def ohlc(self) -> List[OHLC]:
+        """Splits the batch into one OHLC per instrument
+
+        Returns:
+            List[OHLC]: bars in the same order as the columns
+        """
+        return [
+            OHLC.construct(isin=isin, open=open, high=high, low=low, close=close, volume=volume, time=self.time)
+            for isin, open, high, low, close, volume in zip(
+                self.isin, self.open, self.high, self.low, self.close, self.volume
+            )
+        ]
+
+
 class OrderStatus(IntEnum):
     OPEN = 0
     FILLED = 1
@@ -4,6 +4,7 @@ from typing import Optional, Union
 
 import pydantic
 import pynng
+from foreverbull_core import codec as codecs
 from foreverbull_core.models.base import Base
 
 
@@ -14,6 +15,13 @@ class SocketType(enum.Enum):
     SUBSCRIBER = pynng.Sub0
 
 
+class SocketTransport(enum.Enum):
+    TCP = "tcp"
+    IPC = "ipc"
+    INPROC = "inproc"
+    MEMORY = "memory"
+
+
 class SocketConfig(Base):
     """_summary_
 
@@ -24,6 +32,13 @@ class SocketConfig(Base):
         listen (bool): bool = True
         recv_timeout (int): int = 5000
         send_timeout (int): int = 5000
+        codec (str): str = "json"
+        envelope (bool): bool = False
+        compression (str, optional): Optional[str] = None
+        compression_threshold (int): int = 65536
+        transport (str): str = "tcp"
+        path (str, optional): Optional[str] = None, address of ipc and inproc sockets
+        topics (bool): bool = False, publishers prefix messages with a topic key
 
     Returns:
         SocketConfig: _description_
@@ -35,6 +50,13 @@ class SocketConfig(Base):
     listen: bool = True
     recv_timeout: int = 5000
     send_timeout: int = 5000
+    codec: str = codecs.JSON
+    envelope: bool = False
+    compression: Optional[str] = None
+    compression_threshold: int = 65536
+    transport: str = SocketTransport.TCP.value
+    path: Optional[str] = None
+    topics: bool = False
 
     @pydantic.validator("socket_type")
     def validate_socket_type(cls, v):
@@ -42,6 +64,20 @@ class SocketConfig(Base):
             return getattr(SocketType, v.upper())
         return v
 
+    @pydantic.validator("transport")
+    def validate_transport(cls, v):
+        return SocketTransport(v).value
+
+    def url(self) -> str:
+        """Address to listen on or dial, tcp sockets use host and port while ipc and inproc use path
+
+        Returns:
+            str: url in nng format
+        """
+        if self.transport == SocketTransport.TCP.value:
+            return f"tcp://{self.host}:{self.port}"
+        return f"{self.transport}://{self.path}"
+
     def dict(self, *args, **kwargs):
         return {
             "socket_type": self.socket_type.name,
@@ -50,6 +86,13 @@ class SocketConfig(Base):
             "listen": self.listen,
             "recv_timeout": self.recv_timeout,
             "send_timeout": self.send_timeout,
+            "codec": self.codec,
+            "envelope": self.envelope,
+            "compression": self.compression,
+            "compression_threshold": self.compression_threshold,
+            "transport": self.transport,
+            "path": self.path,
+            "topics": self.topics,
         }
 
     def dump(self):
@@ -62,6 +105,8 @@ class Request(Base):
     Args:
         task (str): str
         data (dict, optional): Optional[dict] = None
+        seq (int, optional): Optional[int] = None, sequence number set by publishers
+        session (str, optional): Optional[str] = None, session of a server hosting many
 
     Returns:
         Request: request
@@ -69,6 +114,17 @@ class Request(Base):
 
     task: str
     data: Optional[dict] = None
+    seq: Optional[int] = None
+    session: Optional[str] = None
+
+    def dict(self, *args, **kwargs):
+        data = super().dict(*args, **kwargs)
+        if self.seq is None:
+            # only feed messages are numbered, keep the rest as they were
+            data.pop("seq", None)
+        if self.session is None:
+            data.pop("session", None)
+        return data
 
 
 class Response(Base):
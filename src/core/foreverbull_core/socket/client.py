@@ -1,17 +1,65 @@
+import time
+from typing import Tuple, Union
+
+from foreverbull_core import codec as codecs
+from foreverbull_core import metrics
 from foreverbull_core.models.socket import Request, Response, SocketConfig
+from foreverbull_core.socket.envelope import Envelope, is_envelope
 from foreverbull_core.socket.nanomsg import NanomsgContextSocket, NanomsgSocket
 
 
+def _encode_seconds() -> metrics.Histogram:
+    return metrics.REGISTRY.histogram("message_encode_seconds", "Time encoding outgoing messages")
+
+
+def _encode(message: Response, codec: codecs.Codec, envelope: bool, encode_seconds: metrics.Histogram) -> bytes:
+    started = time.perf_counter()
+    if envelope:
+        data = Envelope.from_message(message, codec).dump()
+    else:
+        data = message.dump(codec)
+    encode_seconds.observe(time.perf_counter() - started)
+    return data
+
+
+def _decode(
+    data: bytes, codec: codecs.Codec, trusted: bool, lazy: bool
+) -> Tuple[Union[Request, Envelope], codecs.Codec, bool]:
+    if is_envelope(data):
+        envelope = Envelope.unpack(data)
+        codec = envelope.codec or codec
+        return envelope if lazy else envelope.load(Request, trusted), codec, True
+    codec = codecs.detect(data)
+    return Request.load(data, codec, trusted), codec, False
+
+
 class ContextClient:
-    def __init__(self, context_socket: NanomsgContextSocket):
+    def __init__(
+        self,
+        context_socket: NanomsgContextSocket,
+        codec: codecs.Codec = None,
+        trusted: bool = False,
+        envelope: bool = False,
+        encode_seconds: metrics.Histogram = None,
+    ):
         """Context client is sub socket of SocketClient that will keep track of who sends the request
         to make sure respone will go to the same peer.
 
         Args:
             context_socket (NanomsgContextSocket): The context_socket to be used for communication,
             uses same Port/int as socket itself.
+            codec (Codec, optional): Codec to use until the peer has sent us something. Defaults to JSON.
+            trusted (bool, optional): Load requests without validation. Defaults to False.
+            envelope (bool, optional): Send messages as envelopes until the peer has sent us something.
+            Defaults to False.
+            encode_seconds (Histogram, optional): Histogram of encoding times, shared with the socket client.
+            Defaults to None, looked up in the registry.
         """
         self._context_socket = context_socket
+        self._codec = codecs.get(codec)
+        self._trusted = trusted
+        self._envelope = envelope
+        self._encode_seconds = encode_seconds or _encode_seconds()
 
     def send(self, message: Response) -> None:
         """Sends a response back to the requester
@@ -19,31 +67,68 @@ class ContextClient:
         Args:
             message (Response): Response will be serialized to bytes before transmitting
         """
-        self._context_socket.send(message.dump())
+        self._context_socket.send(_encode(message, self._codec, self._envelope, self._encode_seconds))
 
-    def recv(self) -> Request:
+    def recv(self, lazy: bool = False) -> Union[Request, Envelope]:
         """Waits until incoming bytes has been received and load it into a Request Model
 
+        Args:
+            lazy (bool, optional): Return envelopes as is, leaving the payload undecoded. Defaults to False.
+
         Returns:
-            Request: Request that has been received
+            Union[Request, Envelope]: Request that has been received
         """
-        data = self._context_socket.recv()
-        return Request.load(data)
+        message, self._codec, self._envelope = _decode(self._context_socket.recv(), self._codec, self._trusted, lazy)
+        return message
 
     def close(self) -> None:
         """Close the socket"""
         self._context_socket.close()
 
 
+class AsyncContextClient(ContextClient):
+    """ContextClient where send and recv are coroutines, for use within an asyncio event loop"""
+
+    async def send(self, message: Response) -> None:
+        """Sends a response back to the requester
+
+        Args:
+            message (Response): Response will be serialized to bytes before transmitting
+        """
+        await self._context_socket.asend(_encode(message, self._codec, self._envelope, self._encode_seconds))
+
+    async def recv(self, lazy: bool = False) -> Union[Request, Envelope]:
+        """Waits until incoming bytes has been received and load it into a Request Model
+
+        Args:
+            lazy (bool, optional): Return envelopes as is, leaving the payload undecoded. Defaults to False.
+
+        Returns:
+            Union[Request, Envelope]: Request that has been received
+        """
+        data = await self._context_socket.arecv()
+        message, self._codec, self._envelope = _decode(data, self._codec, self._trusted, lazy)
+        return message
+
+
 class SocketClient:
-    def __init__(self, config: SocketConfig) -> None:
+    _context_client = ContextClient
+
+    def __init__(self, config: SocketConfig, trusted: bool = False) -> None:
         """SocketClient provides a higher level connection for a socket intended to listen to incoming requests
 
         Args:
             config (SocketConfig): Configuration for how to socket should work, timeouts etc.
+            trusted (bool, optional): Load requests without validation, only use when the peer is one of our own
+            processes. Defaults to False.
         """
         self.config = config
+        self._trusted = trusted
         self._socket = NanomsgSocket(config)
+        self._codec = codecs.resolve(config.codec)
+        self._envelope = config.envelope
+        # looked up once, the registry takes a lock on every lookup
+        self._encode_seconds = _encode_seconds()
 
     def url(self) -> str:
         """Receive the connection information
@@ -59,16 +144,19 @@ class SocketClient:
         Args:
             message (Response): Response will be serialized to bytes before transmitting
         """
-        self._socket.send(message.dump())
+        self._socket.send(_encode(message, self._codec, self._envelope, self._encode_seconds))
 
-    def recv(self) -> Request:
+    def recv(self, lazy: bool = False) -> Union[Request, Envelope]:
         """Waits until incoming bytes has been received and load it into a Request Model
 
+        Args:
+            lazy (bool, optional): Return envelopes as is, leaving the payload undecoded. Defaults to False.
+
         Returns:
-            Request: Request that has been received
+            Union[Request, Envelope]: Request that has been received
         """
-        data = self._socket.recv()
-        return Request.load(data)
+        message, self._codec, self._envelope = _decode(self._socket.recv(), self._codec, self._trusted, lazy)
+        return message
 
     def close(self) -> None:
         """Close the socket"""
@@ -82,4 +170,38 @@ class SocketClient:
         Returns:
             ContextClient: A new conext client based in this Socket and its address.
         """
-        return ContextClient(NanomsgContextSocket(self._socket.new_context()))
+        return self._context_client(
+            self._socket.new_context(),
+            codecs.resolve(self.config.codec),
+            self._trusted,
+            self.config.envelope,
+            self._encode_seconds,
+        )
+
+
+class AsyncSocketClient(SocketClient):
+    """SocketClient where send and recv are coroutines, for use within an asyncio event loop.
+    Several sockets can then be served by one event loop instead of one thread each."""
+
+    _context_client = AsyncContextClient
+
+    async def send(self, message: Response) -> None:
+        """Sends a response back to the requester
+
+        Args:
+            message (Response): Response will be serialized to bytes before transmitting
+        """
+        await self._socket.asend(_encode(message, self._codec, self._envelope, self._encode_seconds))
+
+    async def recv(self, lazy: bool = False) -> Union[Request, Envelope]:
+        """Waits until incoming bytes has been received and load it into a Request Model
+
+        Args:
+            lazy (bool, optional): Return envelopes as is, leaving the payload undecoded. Defaults to False.
+
+        Returns:
+            Union[Request, Envelope]: Request that has been received
+        """
+        data = await self._socket.arecv()
+        message, self._codec, self._envelope = _decode(data, self._codec, self._trusted, lazy)
+        return message
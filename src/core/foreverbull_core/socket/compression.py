@@ -0,0 +1,268 @@
+import struct
+import zlib
+from typing import Dict, Optional, Union
+
+from .exceptions import CompressionError
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+ZLIB = "zlib"
+ZSTD = "zstd"
+LZ4 = "lz4"
+
+COMPRESSION_MAGIC = b"FZ"
+# magic, compressor id, length of uncompressed data
+COMPRESSION_HEADER = struct.Struct("<2sBI")
+ACCEPT_MAGIC = b"FA"
+# magic, bit mask of the compressor ids the sender can decompress
+ACCEPT_HEADER = struct.Struct("<2sB")
+
+
+class Compressor:
+    """Compresses data sent over a socket, id is written in the header so the receiver knows how to decompress"""
+
+    name: str = None
+    id: int = None
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError()
+
+    def decompress(self, data: bytes, size: int) -> bytes:
+        raise NotImplementedError()
+
+
+class ZlibCompressor(Compressor):
+    name = ZLIB
+    id = 1
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, 1)
+
+    def decompress(self, data: bytes, size: int) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    name = ZSTD
+    id = 2
+
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+
+    def decompress(self, data: bytes, size: int) -> bytes:
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+
+
+class LZ4Compressor(Compressor):
+    name = LZ4
+    id = 3
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4.frame.compress(data)
+
+    def decompress(self, data: bytes, size: int) -> bytes:
+        return lz4.frame.decompress(data)
+
+
+_compressors: Dict[str, Compressor] = {}
+_compressors_by_id: Dict[int, Compressor] = {}
+
+
+def register(compressor: Compressor) -> None:
+    """Register a compressor so it can be selected by name in a SocketConfig
+
+    Args:
+        compressor (Compressor): Compressor to register
+    """
+    _compressors[compressor.name] = compressor
+    _compressors_by_id[compressor.id] = compressor
+
+
+def available() -> list:
+    """Names of all compressors that can be used in this process
+
+    Returns:
+        list: compressor names
+    """
+    return list(_compressors)
+
+
+def resolve(compressor: Union[str, None]) -> Union[Compressor, None]:
+    """Configured compressor if this process has it, otherwise data is sent uncompressed. What is sent to a
+    peer is agreed per peer, see Peer.
+
+    Args:
+        compressor (Union[str, None]): Name of the compressor
+
+    Returns:
+        Union[Compressor, None]: Compressor to use, None to not compress
+    """
+    return _compressors.get(compressor)
+
+
+def accepted() -> int:
+    """Compressors this process can decompress, as sent to peers in the accept header
+
+    Returns:
+        int: bit mask of compressor ids
+    """
+    mask = 0
+    for compressor_id in _compressors_by_id:
+        mask |= 1 << compressor_id
+    return mask
+
+
+def select(compressor: Union[Compressor, None], mask: int) -> Union[Compressor, None]:
+    """Compressor to send with to a peer accepting mask, falls back to zlib which every peer has
+
+    Args:
+        compressor (Union[Compressor, None]): Preferred compressor
+        mask (int): Compressors accepted by the peer, see accepted
+
+    Returns:
+        Union[Compressor, None]: Compressor to use, None to not compress
+    """
+    if compressor is None:
+        return None
+    if mask & 1 << compressor.id:
+        return compressor
+    zlib_compressor = _compressors[ZLIB]
+    if mask & 1 << zlib_compressor.id:
+        return zlib_compressor
+    return None
+
+
+def is_compressed(data: bytes) -> bool:
+    """Checks if the data starts with a compression header
+
+    Args:
+        data (bytes): Incoming data
+
+    Returns:
+        bool: True if the data has been compressed by compress
+    """
+    return len(data) >= COMPRESSION_HEADER.size and data[: len(COMPRESSION_MAGIC)] == COMPRESSION_MAGIC
+
+
+def compress(data: bytes, compressor: Union[Compressor, None], threshold: int) -> bytes:
+    """Compresses the data if a compressor is given and the data is at least threshold bytes.
+    Data that does not shrink is sent as is.
+
+    Args:
+        data (bytes): Data to send
+        compressor (Union[Compressor, None]): Compressor to use
+        threshold (int): Minimum size in bytes before we bother compressing
+
+    Returns:
+        bytes: Compressed data with header, or the original data
+    """
+    if compressor is None or len(data) < threshold:
+        return data
+    compressed = compressor.compress(data)
+    if len(compressed) + COMPRESSION_HEADER.size >= len(data):
+        return data
+    return COMPRESSION_HEADER.pack(COMPRESSION_MAGIC, compressor.id, len(data)) + compressed
+
+
+def decompress(data: bytes) -> bytes:
+    """Decompresses data created by compress, anything else is returned as is
+
+    Args:
+        data (bytes): Incoming data
+
+    Raises:
+        CompressionError: In case the compressor used by the peer is not available here
+
+    Returns:
+        bytes: Uncompressed data
+    """
+    if not is_compressed(data):
+        return data
+    _, compressor_id, size = COMPRESSION_HEADER.unpack_from(data)
+    try:
+        compressor = _compressors_by_id[compressor_id]
+    except KeyError:
+        raise CompressionError(f"compressor with id {compressor_id} not available")
+    offset = COMPRESSION_HEADER.size
+    return compressor.decompress(memoryview(data)[offset:], size)
+
+
+class Peer:
+    # roles of the socket towards its peer
+    REQUEST = "request"
+    REPLY = "reply"
+    PUBLISH = "publish"
+
+    def __init__(self, compressor: Union[Compressor, None], threshold: int, role: str = REQUEST):
+        """Compression towards a single peer. Senders with a compressor put an accept header in front of
+        their data telling the peer what they can decompress, and only compress with what the peer accepted.
+        Repliers only compress and advertise towards peers that advertised, so peers without compression
+        keep getting plain data. Publishers never hear from their subscribers and only use zlib.
+
+        Args:
+            compressor (Union[Compressor, None]): Preferred compressor, None to never compress
+            threshold (int): Minimum size in bytes before data is compressed
+            role (str, optional): Role of the socket, Peer.REQUEST, Peer.REPLY or Peer.PUBLISH.
+            Defaults to Peer.REQUEST.
+        """
+        self.compressor = compressor
+        self.threshold = threshold
+        self.role = role
+        # compressors accepted by the peer, None until it has told us
+        self.mask: Optional[int] = None
+        if role == Peer.PUBLISH:
+            self.mask = 1 << _compressors[ZLIB].id
+
+    def unpack(self, data: bytes) -> bytes:
+        """Strips the accept header, remembering what the peer accepts, and decompresses the data
+
+        Args:
+            data (bytes): Data received from the peer
+
+        Raises:
+            CompressionError: In case the compressor used by the peer is not available here
+
+        Returns:
+            bytes: Uncompressed data
+        """
+        if data[: len(ACCEPT_MAGIC)] == ACCEPT_MAGIC and len(data) >= ACCEPT_HEADER.size:
+            _, self.mask = ACCEPT_HEADER.unpack_from(data)
+            offset = ACCEPT_HEADER.size
+            data = memoryview(data)[offset:]
+            if not is_compressed(data):
+                return bytes(data)
+        elif self.role != Peer.PUBLISH:
+            # a replier may serve another peer next, one that never told us anything
+            self.mask = None
+        return decompress(data)
+
+    def pack(self, data: bytes) -> bytes:
+        """Compresses data for the peer and puts the accept header in front of it
+
+        Args:
+            data (bytes): Data to send
+
+        Returns:
+            bytes: Data to put on the wire
+        """
+        if self.compressor is None or (self.role == Peer.REPLY and self.mask is None):
+            return data
+        data = compress(data, select(self.compressor, self.mask or 0), self.threshold)
+        if self.role == Peer.PUBLISH:
+            return data
+        return ACCEPT_HEADER.pack(ACCEPT_MAGIC, accepted()) + data
+
+
+register(ZlibCompressor())
+if zstandard is not None:
+    register(ZstdCompressor())
+if lz4 is not None:
+    register(LZ4Compressor())
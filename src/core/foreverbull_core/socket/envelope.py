@@ -0,0 +1,152 @@
+import struct
+from typing import Type, Union
+
+from foreverbull_core import codec as codecs
+from foreverbull_core.models.base import Base
+
+from .exceptions import EnvelopeError
+
+ENVELOPE_MAGIC = b"FE"
+ENVELOPE_VERSION = 1
+# magic, version, flags, length of task, length of payload
+ENVELOPE_HEADER = struct.Struct("<2sBBHI")
+
+FLAG_PAYLOAD = 0x01
+# the session follows the task, prefixed with its length, so it is read without decoding the payload
+FLAG_SESSION = 0x02
+SESSION_LENGTH = struct.Struct("<B")
+
+
+def is_envelope(data: bytes) -> bool:
+    """Checks if the data starts with an envelope header
+
+    Args:
+        data (bytes): Incoming data
+
+    Returns:
+        bool: True if the data is an envelope
+    """
+    return len(data) >= ENVELOPE_HEADER.size and data[: len(ENVELOPE_MAGIC)] == ENVELOPE_MAGIC
+
+
+class Envelope:
+    def __init__(self, task: str, payload: Union[bytes, memoryview] = None, flags: int = 0, session: str = None):
+        """A message split in a small fixed header holding the task and an opaque payload.
+        The payload is only decoded when someone asks for it, so routing and forwarding is cheap.
+
+        Args:
+            task (str): Task of the message
+            payload (Union[bytes, memoryview], optional): Encoded remainder of the message. Defaults to None.
+            flags (int, optional): Header flags. Defaults to 0.
+            session (str, optional): Session of a server hosting many, kept in the header. Defaults to None.
+        """
+        self.task = task
+        self.payload = payload
+        self.session = session
+        flags = flags | FLAG_PAYLOAD if payload else flags & ~FLAG_PAYLOAD
+        self.flags = flags | FLAG_SESSION if session else flags & ~FLAG_SESSION
+
+    @classmethod
+    def from_message(cls, message: Base, codec: Union[str, codecs.Codec] = None) -> "Envelope":
+        """Wraps a Request or Response, everything but the task and session goes into the payload
+
+        Args:
+            message (Base): Message with a task field
+            codec (Union[str, Codec], optional): Codec used for the payload. Defaults to JSON.
+
+        Returns:
+            Envelope: envelope
+        """
+        values = message.dict()
+        task = values.pop("task")
+        session = values.pop("session", None)
+        if all(value is None for value in values.values()):
+            return cls(task, session=session)
+        return cls(task, codecs.get(codec).encode(values), session=session)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "Envelope":
+        """Reads the header of an envelope, the payload is kept as a view on the incoming data
+
+        Args:
+            data (bytes): Data received from a socket
+
+        Raises:
+            EnvelopeError: In case the data is not a valid envelope
+
+        Returns:
+            Envelope: envelope
+        """
+        if not is_envelope(data):
+            raise EnvelopeError("data is not an envelope")
+        _, version, flags, task_length, payload_length = ENVELOPE_HEADER.unpack_from(data)
+        if version != ENVELOPE_VERSION:
+            raise EnvelopeError(f"unsupported envelope version {version}")
+        offset = ENVELOPE_HEADER.size
+        start = offset + task_length
+        view = memoryview(data)
+        task = bytes(view[offset:start]).decode()
+        session = None
+        if flags & FLAG_SESSION:
+            if len(data) < start + SESSION_LENGTH.size:
+                raise EnvelopeError("envelope too short for its session")
+            session_start = start + SESSION_LENGTH.size
+            (session_length,) = SESSION_LENGTH.unpack_from(data, start)
+            start = session_start + session_length
+            session = bytes(view[session_start:start]).decode()
+        if len(data) != start + payload_length:
+            raise EnvelopeError(f"envelope length mismatch, expected {start + payload_length} got {len(data)}")
+        payload = view[start:] if flags & FLAG_PAYLOAD else None
+        return cls(task, payload, flags, session)
+
+    def dump(self) -> bytes:
+        """Serializes the envelope, the payload is passed on as is
+
+        Raises:
+            EnvelopeError: In case the session is too long for the header
+
+        Returns:
+            bytes: header, task, session and payload
+        """
+        task = self.task.encode()
+        session = b""
+        if self.session:
+            session = self.session.encode()
+            if len(session) > 255:
+                raise EnvelopeError(f"session {self.session} is too long for an envelope")
+            session = SESSION_LENGTH.pack(len(session)) + session
+        payload = self.payload if self.payload else b""
+        header = ENVELOPE_HEADER.pack(ENVELOPE_MAGIC, ENVELOPE_VERSION, self.flags, len(task), len(payload))
+        return b"".join([header, task, session, payload])
+
+    @property
+    def codec(self) -> codecs.Codec:
+        """Codec the payload was encoded with, None if there is no payload"""
+        if not self.payload:
+            return None
+        return codecs.detect(self.payload)
+
+    def decode(self) -> dict:
+        """Decodes the payload
+
+        Returns:
+            dict: Payload, empty in case there is none
+        """
+        if not self.payload:
+            return {}
+        return self.codec.decode(bytes(self.payload))
+
+    def load(self, model: Type[Base], trusted: bool = False) -> Base:
+        """Decodes the payload into a Request or Response
+
+        Args:
+            model (Type[Base]): Model with a task field
+            trusted (bool, optional): Skip validation, see Base.from_trusted. Defaults to False.
+
+        Returns:
+            Base: message
+        """
+        values = dict(self.decode(), task=self.task)
+        if self.session is not None:
+            values["session"] = self.session
+        return model.load(values, trusted=trusted)
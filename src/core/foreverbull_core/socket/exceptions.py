@@ -4,3 +4,15 @@ class SocketTimeout(Exception):
 
 class SocketClosed(Exception):
     pass
+
+
+class FrameError(Exception):
+    pass
+
+
+class EnvelopeError(Exception):
+    pass
+
+
+class CompressionError(Exception):
+    pass
@@ -0,0 +1,77 @@
+from collections import deque
+from typing import Any, Callable
+
+from foreverbull_core.models.socket import SocketConfig, SocketType
+
+from .exceptions import SocketClosed, SocketTimeout
+
+
+class MemorySocket:
+    def __init__(self, config: SocketConfig):
+        """Socket for components running in the same process. Messages are handed to the peer as objects,
+        nothing is serialized. The peer connects a handler that is called for every message sent.
+        For requesters and repliers the return value of the handler is the reply read with recv.
+
+        Args:
+            config (SocketConfig): Configuration of the socket, transport is expected to be memory
+        """
+        self._config = config
+        self._handler = None
+        self._replies = deque()
+        self._closed = False
+
+    def url(self) -> str:
+        """Returns the local address of the socket
+
+        Returns:
+            str: Address in memory://id format
+        """
+        return f"memory://{id(self)}"
+
+    def connect(self, handler: Callable[[Any], Any]) -> None:
+        """Connect the peer, handler is called with every message sent over the socket
+
+        Args:
+            handler (Callable[[Any], Any]): Function receiving messages
+        """
+        self._handler = handler
+
+    def send(self, message: Any) -> None:
+        """Hand a message to the peer. Like a publisher without subscribers the message is dropped
+        if no peer is connected.
+
+        Args:
+            message (Any): Message to send, passed as is
+
+        Raises:
+            SocketClosed: In case the socket has been closed
+        """
+        if self._closed:
+            raise SocketClosed("socket is closed")
+        if self._handler is None:
+            return
+        reply = self._handler(message)
+        if self._config.socket_type in (SocketType.REQUESTER, SocketType.REPLIER):
+            self._replies.append(reply)
+
+    def recv(self) -> Any:
+        """Returns the oldest reply from the peer
+
+        Raises:
+            SocketClosed: In case the socket has been closed
+            SocketTimeout: In case there is no reply waiting
+
+        Returns:
+            Any: Reply from the peer
+        """
+        if self._closed:
+            raise SocketClosed("socket is closed")
+        if not self._replies:
+            raise SocketTimeout("no reply waiting")
+        return self._replies.popleft()
+
+    def close(self) -> None:
+        """Closes the socket"""
+        self._closed = True
+        self._handler = None
+        self._replies.clear()
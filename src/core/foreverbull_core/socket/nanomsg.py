@@ -1,17 +1,166 @@
-from foreverbull_core.models.socket import SocketConfig
+import os
+import struct
+import tempfile
+import time
+import uuid
+from typing import Dict, Tuple
+
+from foreverbull_core import codec as codecs
+from foreverbull_core import metrics
+from foreverbull_core.models.socket import SocketConfig, SocketTransport, SocketType
 from pynng import exceptions, nng
 
-from .exceptions import SocketClosed, SocketTimeout
+from . import compression
+from .exceptions import FrameError, SocketClosed, SocketTimeout
+from .topic import add_topic
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+FRAME_MAGIC = b"FBNP"
+FRAME_VERSION = 1
+FRAME_ALIGNMENT = 8
+# magic, version, number of arrays, length of metadata
+FRAME_HEADER = struct.Struct("<4sBHI")
+
+
+def _aligned(size: int) -> int:
+    return (size + FRAME_ALIGNMENT - 1) // FRAME_ALIGNMENT * FRAME_ALIGNMENT
+
+
+def is_frame(data: bytes) -> bool:
+    """Checks if the data is an array frame created by pack_frame
+
+    Args:
+        data (bytes): Incoming data
+
+    Returns:
+        bool: True if the data starts with the frame header
+    """
+    return data[: len(FRAME_MAGIC)] == FRAME_MAGIC
+
+
+def pack_frame(arrays: Dict[str, "np.ndarray"], meta: dict = None) -> bytes:
+    """Packs a small JSON header followed by the raw buffers of each array.
+    Buffers are aligned so the receiver can map them straight into numpy without copying.
+
+    Args:
+        arrays (Dict[str, np.ndarray]): Named arrays to send, object arrays are not supported
+        meta (dict, optional): Extra metadata to send along with the arrays. Defaults to None.
+
+    Raises:
+        FrameError: In case numpy is missing or an array cannot be sent as a raw buffer
+
+    Returns:
+        bytes: Frame ready to be sent over a socket
+    """
+    if np is None:
+        raise FrameError("numpy is required to send array frames")
+    columns = []
+    buffers = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise FrameError(f"array {name} of dtype object can not be sent as a frame")
+        columns.append({"name": name, "dtype": array.dtype.str, "shape": array.shape, "offset": offset})
+        buffers.append(memoryview(array.reshape(-1).view(np.uint8)))
+        padding = _aligned(array.nbytes) - array.nbytes
+        buffers.append(b"\0" * padding)
+        offset += array.nbytes + padding
+    header = codecs.get(codecs.JSON).encode({"meta": meta or {}, "arrays": columns})
+    header += b"\0" * (_aligned(FRAME_HEADER.size + len(header)) - FRAME_HEADER.size - len(header))
+    return b"".join([FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(columns), len(header)), header, *buffers])
+
+
+def unpack_frame(data: bytes) -> Tuple[dict, Dict[str, "np.ndarray"]]:
+    """Unpacks a frame created by pack_frame. Arrays are read-only views on the incoming data, nothing is copied.
+
+    Args:
+        data (bytes): Frame received from a socket
+
+    Raises:
+        FrameError: In case numpy is missing or the data is not a valid frame
+
+    Returns:
+        Tuple[dict, Dict[str, np.ndarray]]: metadata and named arrays
+    """
+    if np is None:
+        raise FrameError("numpy is required to receive array frames")
+    if len(data) < FRAME_HEADER.size or not is_frame(data):
+        raise FrameError("data is not an array frame")
+    _, version, count, header_length = FRAME_HEADER.unpack_from(data)
+    if version != FRAME_VERSION:
+        raise FrameError(f"unsupported frame version {version}")
+    offset = FRAME_HEADER.size
+    start = offset + header_length
+    try:
+        header = codecs.get(codecs.JSON).decode(bytes(data[offset:start]).rstrip(b"\0"))
+        arrays = {}
+        for column in header["arrays"][:count]:
+            dtype = np.dtype(column["dtype"])
+            shape = tuple(column["shape"])
+            items = 1
+            for dimension in shape:
+                items *= dimension
+            array = np.frombuffer(data, dtype=dtype, count=items, offset=start + column["offset"])
+            arrays[column["name"]] = array.reshape(shape)
+        return header["meta"], arrays
+    except (ValueError, TypeError, KeyError, IndexError) as exc:
+        raise FrameError(f"invalid array frame: {exc}")
+
+
+class SocketMetrics:
+    def __init__(self, socket_type: str, transport: str):
+        """Counters and histograms of a socket, shared between the socket and its contexts.
+        Sockets of the same type and transport share them, addresses would grow the metrics without bound.
+
+        Args:
+            socket_type (str): Type of the socket, used as label
+            transport (str): Transport of the socket, used as label
+        """
+        labels = {"type": socket_type, "transport": transport}
+        self.messages_sent = metrics.REGISTRY.counter("socket_messages_sent", "Messages sent", **labels)
+        self.bytes_sent = metrics.REGISTRY.counter("socket_bytes_sent", "Bytes sent, after compression", **labels)
+        self.messages_received = metrics.REGISTRY.counter("socket_messages_received", "Messages received", **labels)
+        self.bytes_received = metrics.REGISTRY.counter(
+            "socket_bytes_received", "Bytes received, before decompression", **labels
+        )
+        self.timeouts = metrics.REGISTRY.counter("socket_timeouts", "Receives that timed out", **labels)
+        self.recv_wait = metrics.REGISTRY.histogram(
+            "socket_recv_wait_seconds", "Time waiting for a message to arrive", **labels
+        )
+
+    def sent(self, data: bytes) -> None:
+        self.messages_sent.inc()
+        self.bytes_sent.inc(len(data))
+
+    def received(self, data: bytes, started: float) -> None:
+        self.recv_wait.observe(time.perf_counter() - started)
+        self.messages_received.inc()
+        self.bytes_received.inc(len(data))
 
 
 class NanomsgContextSocket:
-    def __init__(self, context_socket: nng.Context):
+    def __init__(
+        self,
+        context_socket: nng.Context,
+        peer: compression.Peer = None,
+        socket_metrics: SocketMetrics = None,
+    ):
         """Provides a low level class for managing context sockets
 
         Args:
             context_socket (nng.Context): Context socket coming from a "normal" socket
+            peer (Peer, optional): Compression towards the peer of the context. Defaults to None, no compression.
+            socket_metrics (SocketMetrics, optional): Metrics of the socket the context belongs to.
+            Defaults to metrics labeled as context.
         """
         self._context_socket = context_socket
+        self._peer = peer or compression.Peer(None, 0)
+        self._metrics = socket_metrics or SocketMetrics("context", "unknown")
 
     def send(self, data: bytes) -> None:
         """Send byte data over the socket to a peer
@@ -25,10 +174,12 @@ class NanomsgContextSocket:
         Returns:
             None:
         """
+        data = self._peer.pack(data)
         try:
-            return self._context_socket.send(data)
+            self._context_socket.send(data)
         except exceptions.Closed as exc:
             raise SocketClosed(exc)
+        self._metrics.sent(data)
 
     def recv(self) -> bytes:
         """Wait and receive byte data from a peer
@@ -40,12 +191,73 @@ class NanomsgContextSocket:
         Returns:
             bytes: Incoming byte data
         """
+        started = time.perf_counter()
         try:
-            return self._context_socket.recv()
+            data = self._context_socket.recv()
         except exceptions.Timeout as exc:
+            self._metrics.timeouts.inc()
             raise SocketTimeout(exc)
         except exceptions.Closed as exc:
             raise SocketClosed(exc)
+        self._metrics.received(data, started)
+        return self._peer.unpack(data)
+
+    async def asend(self, data: bytes) -> None:
+        """Send byte data over the socket to a peer without blocking the event loop
+
+        Args:
+            data (bytes): Bytes to send over the socket
+
+        Raises:
+            SocketClosed: In case the we are trying to send over a closed socket
+
+        Returns:
+            None:
+        """
+        data = self._peer.pack(data)
+        try:
+            await self._context_socket.asend(data)
+        except exceptions.Closed as exc:
+            raise SocketClosed(exc)
+        self._metrics.sent(data)
+
+    async def arecv(self) -> bytes:
+        """Wait for byte data from a peer without blocking the event loop
+
+        Raises:
+            SocketTimeout: In case nothing is received within the receive timeout
+            SocketClosed: In case the socket is closed while waiting
+
+        Returns:
+            bytes: Incoming byte data
+        """
+        started = time.perf_counter()
+        try:
+            data = await self._context_socket.arecv()
+        except exceptions.Timeout as exc:
+            self._metrics.timeouts.inc()
+            raise SocketTimeout(exc)
+        except exceptions.Closed as exc:
+            raise SocketClosed(exc)
+        self._metrics.received(data, started)
+        return self._peer.unpack(data)
+
+    def send_frame(self, arrays: Dict[str, "np.ndarray"], meta: dict = None) -> None:
+        """Send numpy arrays as a raw buffer frame, see pack_frame
+
+        Args:
+            arrays (Dict[str, np.ndarray]): Named arrays to send
+            meta (dict, optional): Extra metadata to send along with the arrays. Defaults to None.
+        """
+        return self.send(pack_frame(arrays, meta))
+
+    def recv_frame(self) -> Tuple[dict, Dict[str, "np.ndarray"]]:
+        """Receive a raw buffer frame, see unpack_frame
+
+        Returns:
+            Tuple[dict, Dict[str, np.ndarray]]: metadata and named arrays
+        """
+        return unpack_frame(self.recv())
 
     def close(self) -> None:
         """Close the socket"""
@@ -63,15 +275,35 @@ class NanomsgSocket:
         self._socket = None
         self._config = config
         self._socket = self._config.socket_type.value
+        # path of an ipc socket we generated, removed again on close
+        self._ipc_path = None
+        if self._config.listen and self._config.path is None:
+            if self._config.transport == SocketTransport.IPC.value:
+                self._config.path = os.path.join(tempfile.gettempdir(), f"foreverbull-{uuid.uuid4().hex}.ipc")
+                self._ipc_path = self._config.path
+            elif self._config.transport == SocketTransport.INPROC.value:
+                self._config.path = f"foreverbull-{uuid.uuid4().hex}"
         if self._config.listen:
-            self._socket = self._config.socket_type.value(listen=f"tcp://{self._config.host}:{self._config.port}")
+            self._socket = self._config.socket_type.value(listen=self._config.url())
         else:
-            self._socket = self._config.socket_type.value(dial=f"tcp://{self._config.host}:{self._config.port}")
+            self._socket = self._config.socket_type.value(dial=self._config.url())
         self._socket.recv_timeout = self._config.recv_timeout
         self._socket.send_timeout = self._config.send_timeout
-        if self._config.listen and self._config.port == 0:
+        self._compressor = compression.resolve(self._config.compression)
+        self._peer = self._new_peer()
+        if self._config.listen and self._config.transport == SocketTransport.TCP.value and self._config.port == 0:
             # Pretty hacky way to find the port that OS randomly assigns when it's orginally set as 0
             self._config.port = int(self._socket.listeners[0].url.split(":")[-1])
+        self._metrics = SocketMetrics(self._config.socket_type.name.lower(), self._config.transport)
+
+    def _new_peer(self) -> compression.Peer:
+        if self._config.socket_type == SocketType.REPLIER:
+            role = compression.Peer.REPLY
+        elif self._config.socket_type == SocketType.PUBLISHER:
+            role = compression.Peer.PUBLISH
+        else:
+            role = compression.Peer.REQUEST
+        return compression.Peer(self._compressor, self._config.compression_threshold, role)
 
     def url(self) -> str:
         """Returns the local address of the socket
@@ -83,11 +315,13 @@ class NanomsgSocket:
             return self._socket.listeners[0].url
         return self._socket.dialers[0].url
 
-    def send(self, data: bytes) -> None:
+    def send(self, data: bytes, topic: bytes = None) -> None:
         """Send byte data over the socket to a peer
 
         Args:
             data (bytes): Bytes to send over the socket
+            topic (bytes, optional): Topic key to prefix the data with, see foreverbull_core.socket.topic.
+                Added after compression so subscribers can match on it. Defaults to None.
 
         Raises:
             SocketClosed: In case the we are trying to send over a closed socket
@@ -95,10 +329,14 @@ class NanomsgSocket:
         Returns:
             None:
         """
+        data = self._peer.pack(data)
+        if topic is not None:
+            data = add_topic(data, topic)
         try:
-            return self._socket.send(data)
+            self._socket.send(data)
         except exceptions.Closed as exc:
             raise SocketClosed(exc)
+        self._metrics.sent(data)
 
     def recv(self) -> bytes:
         """Wait and receive byte data from a peer
@@ -110,16 +348,83 @@ class NanomsgSocket:
         Returns:
             bytes: Incoming byte data
         """
+        started = time.perf_counter()
+        try:
+            data = self._socket.recv()
+        except exceptions.Timeout as exc:
+            self._metrics.timeouts.inc()
+            raise SocketTimeout(exc)
+        except exceptions.Closed as exc:
+            raise SocketClosed(exc)
+        self._metrics.received(data, started)
+        return self._peer.unpack(data)
+
+    async def asend(self, data: bytes) -> None:
+        """Send byte data over the socket to a peer without blocking the event loop
+
+        Args:
+            data (bytes): Bytes to send over the socket
+
+        Raises:
+            SocketClosed: In case the we are trying to send over a closed socket
+
+        Returns:
+            None:
+        """
+        data = self._peer.pack(data)
+        try:
+            await self._socket.asend(data)
+        except exceptions.Closed as exc:
+            raise SocketClosed(exc)
+        self._metrics.sent(data)
+
+    async def arecv(self) -> bytes:
+        """Wait for byte data from a peer without blocking the event loop
+
+        Raises:
+            SocketTimeout: In case nothing is received within the receive timeout
+            SocketClosed: In case the socket is closed while waiting
+
+        Returns:
+            bytes: Incoming byte data
+        """
+        started = time.perf_counter()
         try:
-            return self._socket.recv()
+            data = await self._socket.arecv()
         except exceptions.Timeout as exc:
+            self._metrics.timeouts.inc()
             raise SocketTimeout(exc)
         except exceptions.Closed as exc:
             raise SocketClosed(exc)
+        self._metrics.received(data, started)
+        return self._peer.unpack(data)
+
+    def send_frame(self, arrays: Dict[str, "np.ndarray"], meta: dict = None) -> None:
+        """Send numpy arrays as a raw buffer frame, see pack_frame
+
+        Args:
+            arrays (Dict[str, np.ndarray]): Named arrays to send
+            meta (dict, optional): Extra metadata to send along with the arrays. Defaults to None.
+        """
+        return self.send(pack_frame(arrays, meta))
+
+    def recv_frame(self) -> Tuple[dict, Dict[str, "np.ndarray"]]:
+        """Receive a raw buffer frame, see unpack_frame
+
+        Returns:
+            Tuple[dict, Dict[str, np.ndarray]]: metadata and named arrays
+        """
+        return unpack_frame(self.recv())
 
     def close(self) -> None:
         """Closes the socket"""
-        return self._socket.close()
+        self._socket.close()
+        if self._ipc_path is not None:
+            try:
+                os.unlink(self._ipc_path)
+            except FileNotFoundError:
+                pass
+            self._ipc_path = None
 
     def new_context(self) -> NanomsgContextSocket:
         """Returns a context socket used when we have multiple concurrent connections coming to us
@@ -127,4 +432,4 @@ class NanomsgSocket:
         Returns:
             NanomsgContextSocket: Context socket based on this socket
         """
-        return NanomsgContextSocket(self._socket.new_context())
+        return NanomsgContextSocket(self._socket.new_context(), self._new_peer(), self._metrics)
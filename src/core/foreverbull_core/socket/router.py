@@ -1,11 +1,34 @@
+import asyncio
+import inspect
 import logging
+import threading
+import time
 from collections import namedtuple
-from typing import Callable
+from typing import Callable, Tuple, Union
 
 import pydantic
+from foreverbull_core import metrics
 from foreverbull_core.models.socket import Request, Response
+from foreverbull_core.socket.envelope import Envelope
 
-ROUTE = namedtuple("route", "func, route, model")
+ROUTE = namedtuple("route", "func, route, model, trusted, lock")
+
+
+class RouteMetrics:
+    def __init__(self, route: str):
+        """Counters and histograms of a route
+
+        Args:
+            route (str): Name of the route, used as label
+        """
+        self.calls = metrics.REGISTRY.counter("router_calls", "Requests routed", route=route)
+        self.errors = metrics.REGISTRY.counter(
+            "router_errors", "Requests where decoding or the handler failed", route=route
+        )
+        self.decode = metrics.REGISTRY.histogram("router_decode_seconds", "Time decoding request data", route=route)
+        self.handler = metrics.REGISTRY.histogram(
+            "router_handler_seconds", "Time in the handler, including waiting for serialized routes", route=route
+        )
 
 
 class TaskNotFoundError(Exception):
@@ -17,35 +40,75 @@ class TaskAlreadyExists(Exception):
 
 
 class MessageRouter:
-    def __init__(self):
+    def __init__(self, trusted: bool = False):
+        """Routes incoming requests to functions based on the task
+
+        Args:
+            trusted (bool, optional): Build route models without validation, only for requests coming from
+            our own processes. Can be overridden per route. Defaults to False.
+        """
         self._logger = logging.getLogger(__name__)
         self._routes = {}
+        self._locks = {}
+        self._metrics = {}
+        self._trusted = trusted
+        self._unknown = metrics.REGISTRY.counter("router_unknown_tasks", "Requests for tasks without a route")
 
-    def __call__(self, request: Request) -> Response:
-        """Call the router with a Request, trying to find the saved route to call
+    def __call__(self, request: Union[Request, Envelope]) -> Response:
+        """Call the router with a Request, trying to find the saved route to call.
+        Payload of an Envelope is only decoded when the route takes a model.
 
         Args:
-            request (Request): Request to send to a routed function
+            request (Union[Request, Envelope]): Request to send to a routed function
 
         Returns:
             Response: Response with possible data from the function called
         """
         if request.task not in self._routes:
+            self._unknown.inc()
             return Response(task=request.task, error=str(TaskNotFoundError("task not found")))
         route = self._routes[request.task]
+        route_metrics = self._metrics[route.route]
+        route_metrics.calls.inc()
         try:
-            if route.model is None:
-                data = route.func()
+            started = time.perf_counter()
+            request, args = self._arguments(route, request)
+            decoded = time.perf_counter()
+            route_metrics.decode.observe(decoded - started)
+            if route.lock is None:
+                data = route.func(*args)
             else:
-                model_data = route.model.load(request.data)
-                data = route.func(model_data)
+                with self._locks[route.lock]:
+                    data = route.func(*args)
+            route_metrics.handler.observe(time.perf_counter() - decoded)
             return Response(task=request.task, data=data)
         except Exception as exc:
+            route_metrics.errors.inc()
             self._logger.error(f"Error calling task: {request.task}")
             self._logger.error(exc, exc_info=True)
             return Response(task=request.task, error=repr(exc))
 
-    def add_route(self, function: Callable, route: str, model: pydantic.BaseModel = None):
+    def __contains__(self, task: str) -> bool:
+        return task in self._routes
+
+    def _arguments(self, route: ROUTE, request: Union[Request, Envelope]) -> Tuple[Request, tuple]:
+        if route.model is None:
+            return request, ()
+        if isinstance(request, Envelope):
+            request = request.load(Request, trusted=route.trusted)
+        return request, (route.model.load(request.data, trusted=route.trusted),)
+
+    def _new_lock(self) -> threading.Lock:
+        return threading.Lock()
+
+    def add_route(
+        self,
+        function: Callable,
+        route: str,
+        model: pydantic.BaseModel = None,
+        trusted: bool = None,
+        serialize: Union[bool, str] = False,
+    ):
         """Add a route to the local _routes with a name<->function pair.
 
         Args:
@@ -53,11 +116,74 @@ class MessageRouter:
             route (str): Name task which should call a specific function
             model (pydantic.BaseModel, optional): In case we shall include some data to the function being called.
             Defaults to None.
+            trusted (bool, optional): Build the model without validation. Defaults to the setting of the router.
+            serialize (Union[bool, str], optional): Never run this route concurrently with itself, for functions
+            that are not thread-safe. Routes given the same name share a lock and never run concurrently with
+            each other. Defaults to False.
 
         Raises:
             TaskAlreadyExists: The task we are trying to add is already registed
         """
         if route in self._routes:
             raise TaskAlreadyExists(f"{route} already registered")
-        new_route = ROUTE(function, route, model)
+        if trusted is None:
+            trusted = self._trusted
+        lock = None
+        if serialize:
+            lock = route if serialize is True else serialize
+            if lock not in self._locks:
+                self._locks[lock] = self._new_lock()
+        new_route = ROUTE(function, route, model, trusted, lock)
         self._routes[route] = new_route
+        self._metrics[route] = RouteMetrics(route)
+
+
+class AsyncMessageRouter(MessageRouter):
+    """MessageRouter to use within an asyncio event loop, routes can be coroutine functions or
+    regular functions. Regular functions are called directly and should not block."""
+
+    def _new_lock(self) -> None:
+        # created when first used so the lock belongs to the running event loop
+        return None
+
+    async def __call__(self, request: Union[Request, Envelope]) -> Response:
+        """Call the router with a Request, trying to find the saved route to call.
+        Payload of an Envelope is only decoded when the route takes a model.
+
+        Args:
+            request (Union[Request, Envelope]): Request to send to a routed function
+
+        Returns:
+            Response: Response with possible data from the function called
+        """
+        if request.task not in self._routes:
+            self._unknown.inc()
+            return Response(task=request.task, error=str(TaskNotFoundError("task not found")))
+        route = self._routes[request.task]
+        route_metrics = self._metrics[route.route]
+        route_metrics.calls.inc()
+        try:
+            started = time.perf_counter()
+            request, args = self._arguments(route, request)
+            decoded = time.perf_counter()
+            route_metrics.decode.observe(decoded - started)
+            if route.lock is None:
+                data = await self._call(route, args)
+            else:
+                if self._locks[route.lock] is None:
+                    self._locks[route.lock] = asyncio.Lock()
+                async with self._locks[route.lock]:
+                    data = await self._call(route, args)
+            route_metrics.handler.observe(time.perf_counter() - decoded)
+            return Response(task=request.task, data=data)
+        except Exception as exc:
+            route_metrics.errors.inc()
+            self._logger.error(f"Error calling task: {request.task}")
+            self._logger.error(exc, exc_info=True)
+            return Response(task=request.task, error=repr(exc))
+
+    async def _call(self, route: ROUTE, args: tuple):
+        data = route.func(*args)
+        if inspect.isawaitable(data):
+            data = await data
+        return data
@@ -0,0 +1,41 @@
+from typing import Optional
+
+
+class SequenceTracker:
+    def __init__(self):
+        """Keeps track of the sequence numbers of received messages to find messages lost on the way.
+        Messages older than the ones already seen, for example replayed ones, are not counted as gaps.
+        """
+        self.expected = None
+        self.missed = 0
+
+    @property
+    def last(self) -> Optional[int]:
+        """Sequence number of the newest message received, None if nothing has been received"""
+        return None if self.expected is None else self.expected - 1
+
+    def check(self, seq: Optional[int]) -> range:
+        """Register a received sequence number
+
+        Args:
+            seq (Optional[int]): Sequence number of the message, messages without one are ignored
+
+        Returns:
+            range: Sequence numbers missing before this message, empty if nothing was lost
+        """
+        if seq is None:
+            return range(0)
+        if self.expected is None:
+            self.expected = seq + 1
+            return range(0)
+        if seq < self.expected:
+            return range(0)
+        missing = range(self.expected, seq)
+        self.missed += len(missing)
+        self.expected = seq + 1
+        return missing
+
+    def reset(self) -> None:
+        """Forget all received sequence numbers, for example when a new backtest starts"""
+        self.expected = None
+        self.missed = 0
@@ -0,0 +1,51 @@
+from typing import Tuple, Union
+
+TOPIC_SEPARATOR = b"/"
+TOPIC_END = b"\x00"
+
+
+def topic(task: str, asset: Union[str, int] = None) -> bytes:
+    """Topic key of a message, also the prefix to subscribe with on a Sub0 socket.
+    Keys end with a separator so subscribing to ohlc does not match ohlc_batch.
+
+    Args:
+        task (str): Task of the message
+        asset (Union[str, int], optional): isin or asset id the message is about. Defaults to None.
+
+    Returns:
+        bytes: topic key, like b"ohlc/US0378331005/"
+    """
+    key = task.encode() + TOPIC_SEPARATOR
+    if asset is not None:
+        key += str(asset).encode() + TOPIC_SEPARATOR
+    return key
+
+
+def add_topic(data: bytes, key: bytes) -> bytes:
+    """Prefix data with a topic key
+
+    Args:
+        data (bytes): Encoded message
+        key (bytes): Topic key, see topic
+
+    Returns:
+        bytes: Topic key, end marker and data
+    """
+    return b"".join([key, TOPIC_END, data])
+
+
+def split_topic(data: bytes) -> Tuple[bytes, memoryview]:
+    """Split data prefixed by add_topic in topic key and message
+
+    Args:
+        data (bytes): Data received from a Sub0 socket
+
+    Raises:
+        ValueError: In case the data has no topic
+
+    Returns:
+        Tuple[bytes, memoryview]: Topic key and a view on the encoded message
+    """
+    end = data.index(TOPIC_END)
+    offset = end + 1
+    return data[:end], memoryview(data)[offset:]
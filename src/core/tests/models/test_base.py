@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from foreverbull_core.models.base import Base
+from foreverbull_core.models.finance import Order, OrderStatus
+
+
+class Child(Base):
+    name: str
+    created: Optional[datetime]
+
+
+class Parent(Base):
+    child: Child
+    children: List[Child] = []
+    count: int
+
+
+def test_load_trusted():
+    data = {
+        "child": {"name": "first", "created": "2020-01-07T00:00:00+00:00"},
+        "children": [{"name": "second", "created": None}],
+        "count": 2,
+        "unknown": "dropped",
+    }
+    parent = Parent.load(data, trusted=True)
+    assert parent == Parent(**data)
+    assert type(parent.child) == Child
+    assert parent.child.created == datetime(2020, 1, 7, tzinfo=timezone.utc)
+    assert type(parent.children[0]) == Child
+
+
+def test_load_trusted_bytes():
+    order = Order(id="order_id", isin="aabbcc123", amount=10, created_at=datetime.now(), status=OrderStatus.FILLED)
+    loaded = Order.load(order.dump(), trusted=True)
+    assert loaded == order
+    assert loaded.status is OrderStatus.FILLED
+
+
+def test_load_trusted_skips_validation():
+    parent = Parent.load({"child": {"name": "first"}, "count": "not a number"}, trusted=True)
+    assert parent.count == "not a number"
+    assert parent.children == []
+
+
+def test_load_instance():
+    order = Order(isin="aabbcc123", amount=10)
+    assert Order.load(order) is order
+    assert Order.load(order, trusted=True) is order
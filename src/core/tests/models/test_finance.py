@@ -1,6 +1,17 @@
 from datetime import datetime
 
-from foreverbull_core.models.finance import Instrument, Order, OrderStatus, Position
+import pydantic
+import pytest
+from foreverbull_core.models.finance import (
+    OHLC,
+    Instrument,
+    OHLCBatch,
+    Order,
+    OrderStatus,
+    Position,
+    SymbolTable,
+    UnknownAssetId,
+)
 
 
 def test_instrument():
@@ -36,3 +47,66 @@ def test_position():
     data = position.dump()
     loaded = Position.load(data)
     assert position == loaded
+
+
+def test_ohlc_batch():
+    time = datetime(2020, 1, 7)
+    ohlcs = [
+        OHLC(isin="aabbcc123", open=1.0, high=2.0, low=0.5, close=1.5, volume=100, time=time),
+        OHLC(isin="ddeeff456", open=3.0, high=4.0, low=2.5, close=3.5, volume=200, time=time),
+    ]
+    batch = OHLCBatch.from_ohlc(ohlcs, time)
+    assert len(batch) == 2
+    assert batch.close == [1.5, 3.5]
+
+    data = batch.dump()
+    loaded = OHLCBatch.load(data)
+    assert batch == loaded
+    assert loaded.ohlc() == ohlcs
+
+
+def test_ohlc_batch_uneven_columns():
+    with pytest.raises(pydantic.ValidationError, match="column open has 1 rows, expected 2"):
+        OHLCBatch(
+            isin=["aabbcc123", "ddeeff456"],
+            open=[1.0],
+            high=[2.0, 4.0],
+            low=[0.5, 2.5],
+            close=[1.5, 3.5],
+            volume=[100, 200],
+            time=datetime.now(),
+        )
+
+
+def test_symbol_table():
+    symbols = SymbolTable(isins=["aabbcc123", "ddeeff456"])
+    assert symbols.id("ddeeff456") == 1
+    assert symbols.isin(1) == "ddeeff456"
+    assert symbols.id("unknown") == "unknown"
+    assert symbols.isin("unknown") == "unknown"
+    for asset_id in (-1, 2):
+        with pytest.raises(UnknownAssetId, match=f"asset id {asset_id} is not part of the session"):
+            symbols.isin(asset_id)
+
+    loaded = SymbolTable.load(symbols.dump(), trusted=True)
+    assert loaded.id("aabbcc123") == 0
+
+
+def test_symbol_table_encode_decode():
+    symbols = SymbolTable(isins=["aabbcc123", "ddeeff456"])
+    position = {"isin": "ddeeff456", "amount": 10, "cost_basis": 1.0, "period": datetime.now()}
+    encoded = symbols.encode(position)
+    assert encoded["isin"] == 1
+    assert symbols.decode(encoded) == position
+
+    batch = {"isin": ["ddeeff456", "aabbcc123"], "open": [1.0, 2.0]}
+    encoded = symbols.encode(batch)
+    assert encoded["isin"] == [1, 0]
+    assert symbols.decode(encoded) == batch
+
+    assert symbols.encode({"period": "2020-01-07"}) == {"period": "2020-01-07"}
+
+    snapshot = {"period": {"cash": 1.0}, "positions": [position], "closed": ["aabbcc123"], "keyframe": False}
+    encoded = symbols.encode(snapshot)
+    assert encoded["positions"][0]["isin"] == 1 and encoded["closed"] == [0]
+    assert symbols.decode(encoded) == snapshot
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+import pytest
+from foreverbull_core.models.backtest import Period, PortfolioSnapshot
+from foreverbull_core.models.finance import Position
+
+PERIOD = datetime(2020, 1, 7, tzinfo=timezone.utc)
+
+
+def position(isin: str, amount: int) -> Position:
+    return Position(isin=isin, amount=amount, cost_basis=10.0, period=PERIOD)
+
+
+def test_portfolio_snapshot_apply():
+    keyframe = PortfolioSnapshot(
+        period=Period(period=PERIOD), positions=[position("A", 10), position("B", 5)], keyframe=True
+    )
+    positions = keyframe.apply()
+    assert {isin: p.amount for isin, p in positions.items()} == {"A": 10, "B": 5}
+
+    delta = PortfolioSnapshot(
+        period=Period(period=PERIOD), positions=[position("B", 7), position("C", 1)], closed=["A"]
+    )
+    positions = delta.apply(positions)
+    assert {isin: p.amount for isin, p in positions.items()} == {"B": 7, "C": 1}
+
+    loaded = PortfolioSnapshot.load(delta.dump())
+    assert loaded == delta
+
+
+def test_portfolio_snapshot_needs_keyframe():
+    delta = PortfolioSnapshot(period=Period(period=PERIOD), closed=["A"])
+    with pytest.raises(ValueError, match="wait for a keyframe"):
+        delta.apply()
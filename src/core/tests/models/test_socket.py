@@ -21,6 +21,14 @@ def test_request():
     data = request.dump()
     loaded = Request.load(data)
     assert request == loaded
+    assert "session" not in request.dict()
+
+
+def test_request_session():
+    request = Request(task="status", session="abc")
+
+    loaded = Request.load(request.dump())
+    assert loaded.session == "abc"
 
 
 def test_response():
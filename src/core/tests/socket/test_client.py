@@ -1,8 +1,9 @@
+import asyncio
 from threading import Thread
 
 import pynng
 from foreverbull_core.models.socket import Request, Response, SocketConfig, SocketType
-from foreverbull_core.socket.client import ContextClient, SocketClient
+from foreverbull_core.socket.client import AsyncSocketClient, ContextClient, SocketClient
 
 
 def test_socket_client():
@@ -119,3 +120,44 @@ def test_context_client_in_thread():
     assert from_first.task == "from first"
     assert from_second.task == "from second"
     assert from_third.task == "from third"
+
+
+def test_async_socket_client():
+    async def serve(client: AsyncSocketClient):
+        request = await client.recv()
+        await client.send(Response(task=request.task, data={"echo": True}))
+
+    client = AsyncSocketClient(SocketConfig(host="127.0.0.1", socket_type=SocketType.REPLIER))
+    req_socket = pynng.Req0(dial=client.url())
+    req_socket.recv_timeout = 5000
+
+    req_socket.send(Request(task="demo").dump())
+    asyncio.run(serve(client))
+    response = Response.load(req_socket.recv())
+    assert response.task == "demo"
+    assert response.data == {"echo": True}
+
+    req_socket.close()
+    client.close()
+
+
+def test_async_context_client():
+    async def serve(client: AsyncSocketClient, requests: int):
+        async def handle():
+            context = client.new_context()
+            request = await context.recv()
+            await context.send(Response(task=request.task))
+            context.close()
+
+        await asyncio.gather(*[handle() for _ in range(requests)])
+
+    client = AsyncSocketClient(SocketConfig(host="127.0.0.1", socket_type=SocketType.REPLIER))
+    requesters = [pynng.Req0(dial=client.url(), recv_timeout=5000) for _ in range(3)]
+    for index, requester in enumerate(requesters):
+        requester.send(Request(task=f"demo{index}").dump())
+
+    asyncio.run(serve(client, len(requesters)))
+    for index, requester in enumerate(requesters):
+        assert Response.load(requester.recv()).task == f"demo{index}"
+        requester.close()
+    client.close()
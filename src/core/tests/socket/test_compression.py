@@ -0,0 +1,107 @@
+import pytest
+from foreverbull_core.models.socket import Request, SocketConfig
+from foreverbull_core.socket import compression
+from foreverbull_core.socket.exceptions import CompressionError
+from foreverbull_core.socket.nanomsg import NanomsgSocket
+
+LARGE = Request(task="result", data={"periods": [{"pnl": 1.0, "returns": 0.1}] * 5000}).dump()
+
+
+@pytest.mark.parametrize("name", [compression.ZLIB, compression.ZSTD, compression.LZ4])
+def test_compress_decompress(name):
+    if name not in compression.available():
+        pytest.skip(f"{name} not installed")
+    compressor = compression.resolve(name)
+    data = compression.compress(LARGE, compressor, 1024)
+    assert compression.is_compressed(data)
+    assert len(data) < len(LARGE) / 10
+    assert compression.decompress(data) == LARGE
+
+
+def test_compress_below_threshold():
+    small = Request(task="status").dump()
+    compressor = compression.resolve(compression.ZLIB)
+    assert compression.compress(small, compressor, 1024) == small
+    assert compression.compress(LARGE, None, 0) == LARGE
+    assert compression.decompress(small) == small
+
+
+def test_resolve_unknown():
+    assert compression.resolve("asdf") is None
+    assert compression.resolve(None) is None
+
+
+def test_decompress_unknown_compressor():
+    data = compression.COMPRESSION_HEADER.pack(compression.COMPRESSION_MAGIC, 255, 10) + b"abc"
+    with pytest.raises(CompressionError, match="compressor with id 255 not available"):
+        compression.decompress(data)
+
+
+def test_nanomsg_socket_compression():
+    replier = NanomsgSocket(
+        SocketConfig(socket_type="replier", host="127.0.0.1", port=1337, compression=compression.ZLIB)
+    )
+    requester = NanomsgSocket(
+        SocketConfig(
+            socket_type="requester",
+            host="127.0.0.1",
+            port=1337,
+            listen=False,
+            compression=compression.ZLIB,
+            compression_threshold=1024,
+        )
+    )
+
+    requester.send(LARGE)
+    assert replier.recv() == LARGE
+    replier.send(b"small")
+    assert requester.recv() == b"small"
+
+    context = requester.new_context()
+    context.send(LARGE)
+    assert replier.recv() == LARGE
+    replier.send(LARGE)
+    assert context.recv() == LARGE
+
+    context.close()
+    requester.close()
+    replier.close()
+
+
+def test_peer_replier_without_advertisement():
+    replier = compression.Peer(compression.resolve(compression.ZLIB), 1024, compression.Peer.REPLY)
+    # a peer that never advertised gets plain data, without accept header
+    assert replier.unpack(Request(task="result").dump()) == Request(task="result").dump()
+    assert replier.pack(LARGE) == LARGE
+
+
+def test_peer_negotiation():
+    requester = compression.Peer(compression.resolve(compression.ZLIB), 1024)
+    replier = compression.Peer(compression.resolve(compression.ZLIB), 1024, compression.Peer.REPLY)
+
+    # nothing is known about the replier yet, the request is not compressed but tells what we accept
+    data = requester.pack(LARGE)
+    assert data[:2] == compression.ACCEPT_MAGIC and not compression.is_compressed(data[3:])
+    assert replier.unpack(data) == LARGE
+    assert replier.mask == compression.accepted()
+
+    data = replier.pack(LARGE)
+    assert compression.is_compressed(data[3:])
+    assert requester.unpack(data) == LARGE
+    assert compression.is_compressed(requester.pack(LARGE)[3:])
+
+
+def test_peer_falls_back_to_zlib():
+    if compression.ZSTD not in compression.available():
+        pytest.skip("zstd not installed")
+    replier = compression.Peer(compression.resolve(compression.ZSTD), 1024, compression.Peer.REPLY)
+    zlib_only = 1 << compression.resolve(compression.ZLIB).id
+    replier.unpack(compression.ACCEPT_HEADER.pack(compression.ACCEPT_MAGIC, zlib_only) + b"{}")
+    data = replier.pack(LARGE)
+    _, compressor_id, _ = compression.COMPRESSION_HEADER.unpack_from(data, compression.ACCEPT_HEADER.size)
+    assert compressor_id == compression.resolve(compression.ZLIB).id
+
+    publisher = compression.Peer(compression.resolve(compression.ZSTD), 1024, compression.Peer.PUBLISH)
+    data = publisher.pack(LARGE)
+    _, compressor_id, _ = compression.COMPRESSION_HEADER.unpack_from(data)
+    assert compressor_id == compression.resolve(compression.ZLIB).id
@@ -0,0 +1,85 @@
+import pytest
+from foreverbull_core import codec
+from foreverbull_core.models.socket import Request, Response, SocketConfig
+from foreverbull_core.socket.client import SocketClient
+from foreverbull_core.socket.envelope import Envelope, is_envelope
+from foreverbull_core.socket.exceptions import EnvelopeError
+from pynng import Req0
+
+
+@pytest.mark.parametrize("name", [codec.JSON, codec.MSGPACK])
+def test_envelope(name):
+    request = Request(task="demo", data={"demo": "data"})
+    data = Envelope.from_message(request, name).dump()
+    assert is_envelope(data)
+
+    envelope = Envelope.unpack(data)
+    assert envelope.task == "demo"
+    assert envelope.codec.name == name
+    assert envelope.decode() == {"data": {"demo": "data"}}
+    assert envelope.load(Request) == request
+    assert envelope.dump() == data
+
+
+def test_envelope_no_payload():
+    data = Envelope.from_message(Request(task="stop")).dump()
+    envelope = Envelope.unpack(data)
+    assert envelope.task == "stop"
+    assert envelope.payload is None
+    assert envelope.codec is None
+    assert envelope.load(Request) == Request(task="stop")
+
+
+def test_envelope_forward_raw_payload():
+    envelope = Envelope.unpack(Envelope.from_message(Request(task="ohlc", data={"isin": "abc"})).dump())
+    forwarded = Envelope("worker_ohlc", envelope.payload).dump()
+    assert Envelope.unpack(forwarded).load(Request) == Request(task="worker_ohlc", data={"isin": "abc"})
+
+
+@pytest.mark.parametrize("data", [None, {"days": 2}])
+def test_envelope_session(data):
+    request = Request(task="credit", data=data, session="a3f1")
+    envelope = Envelope.unpack(Envelope.from_message(request, codec.MSGPACK).dump())
+    assert envelope.session == "a3f1"
+    assert envelope.decode() == ({"data": data} if data else {})
+    assert envelope.load(Request) == request
+
+    with pytest.raises(EnvelopeError, match="too long for an envelope"):
+        Envelope("credit", session="a" * 256).dump()
+
+
+def test_envelope_bad_data():
+    assert not is_envelope(Request(task="demo").dump())
+    with pytest.raises(EnvelopeError, match="data is not an envelope"):
+        Envelope.unpack(Request(task="demo").dump())
+    data = Envelope.from_message(Request(task="demo", data={"demo": "data"})).dump()
+    with pytest.raises(EnvelopeError, match="envelope length mismatch"):
+        Envelope.unpack(data[:-1])
+    data = Envelope.from_message(Request(task="demo", session="a3f1")).dump()
+    with pytest.raises(EnvelopeError, match="envelope too short for its session"):
+        Envelope.unpack(data[: -len("a3f1") - 1])
+
+
+def test_socket_client_envelope():
+    client = SocketClient(SocketConfig(host="127.0.0.1"))
+    requester = Req0(dial=client.url())
+    requester.recv_timeout = 5000
+
+    requester.send(Envelope.from_message(Request(task="demo", data={"demo": "data"}), codec.MSGPACK).dump())
+    envelope = client.recv(lazy=True)
+    assert type(envelope) == Envelope
+    assert envelope.task == "demo"
+    client.send(Response(task="demo", data={"response": "data"}))
+
+    data = requester.recv()
+    assert is_envelope(data)
+    assert Envelope.unpack(data).codec.name == codec.MSGPACK
+    assert Envelope.unpack(data).load(Response) == Response(task="demo", data={"response": "data"})
+
+    requester.send(Request(task="plain").dump())
+    assert client.recv(lazy=True) == Request(task="plain")
+    client.send(Response(task="plain"))
+    assert Response.load(requester.recv()) == Response(task="plain")
+
+    requester.close()
+    client.close()
@@ -0,0 +1,34 @@
+import pytest
+from foreverbull_core.models.socket import Request, Response, SocketConfig, SocketType
+from foreverbull_core.socket.exceptions import SocketClosed, SocketTimeout
+from foreverbull_core.socket.memory import MemorySocket
+
+
+def test_memory_socket_request_reply():
+    socket = MemorySocket(SocketConfig(transport="memory", socket_type=SocketType.REPLIER))
+    request = Request(task="demo")
+    socket.connect(lambda message: Response(task=message.task, data={"same": message is request}))
+
+    socket.send(request)
+    response = socket.recv()
+    assert response.task == "demo"
+    assert response.data == {"same": True}
+
+    with pytest.raises(SocketTimeout):
+        socket.recv()
+
+
+def test_memory_socket_publisher():
+    socket = MemorySocket(SocketConfig(transport="memory", socket_type=SocketType.PUBLISHER))
+    socket.send(Request(task="dropped"))
+
+    received = []
+    socket.connect(received.append)
+    socket.send(Request(task="demo"))
+    assert [message.task for message in received] == ["demo"]
+    with pytest.raises(SocketTimeout):
+        socket.recv()
+
+    socket.close()
+    with pytest.raises(SocketClosed):
+        socket.send(Request(task="demo"))
@@ -1,11 +1,13 @@
+import os
 import socket
 
 import pynng
 import pytest
-from foreverbull_core.models.socket import Request, Response, SocketConfig
+from foreverbull_core import metrics
+from foreverbull_core.models.socket import Request, Response, SocketConfig, SocketType
 from foreverbull_core.socket.client import SocketClient
-from foreverbull_core.socket.exceptions import SocketClosed, SocketTimeout
-from foreverbull_core.socket.nanomsg import NanomsgSocket
+from foreverbull_core.socket.exceptions import FrameError, SocketClosed, SocketTimeout
+from foreverbull_core.socket.nanomsg import NanomsgSocket, is_frame, pack_frame, unpack_frame
 
 
 @pytest.fixture(scope="function")
@@ -41,6 +43,13 @@ def test_default_configuration():
         "listen": True,
         "recv_timeout": 5000,
         "send_timeout": 5000,
+        "codec": "json",
+        "envelope": False,
+        "compression": None,
+        "compression_threshold": 65536,
+        "transport": "tcp",
+        "path": None,
+        "topics": False,
     }
     assert c.dict() == expected
 
@@ -70,9 +79,12 @@ def test_socket_client(local_requester):
     assert reply == expected
 
     expected = Response(task="demo", error=repr(Exception("no work")), data={"response": "data"})
+    encoded = sc._encode_seconds.count
     reply = sc.send(expected)
     reply = lr.recv()
     assert Response.load(reply) == expected
+    assert sc._encode_seconds.count == encoded + 1
+    assert sc.new_context()._encode_seconds is sc._encode_seconds
 
 
 def test_nanomsg_socket():
@@ -110,6 +122,37 @@ def test_nanomsg_socket_recv_senc(local_requester):
     lr.close()
 
 
+def test_nanomsg_socket_metrics(local_requester):
+    sock = NanomsgSocket(SocketConfig(socket_type="replier", host="127.0.0.1", port=0, recv_timeout=10))
+    lr = local_requester(sock.url())
+
+    # sockets of the same type and transport share their metrics
+    labels = {"type": "replier", "transport": "tcp"}
+    names = ["socket_messages_received", "socket_bytes_received", "socket_messages_sent", "socket_bytes_sent"]
+    before = {name: metrics.REGISTRY.counter(name, "", **labels).value for name in names + ["socket_timeouts"]}
+    waits = metrics.REGISTRY.histogram("socket_recv_wait_seconds", "", **labels).count
+
+    lr.send(b"hello")
+    assert sock.recv() == b"hello"
+    sock.send(b"world!")
+    assert lr.recv() == b"world!"
+    with pytest.raises(SocketTimeout):
+        sock.recv()
+
+    def delta(name):
+        return metrics.REGISTRY.counter(name, "", **labels).value - before[name]
+
+    assert delta("socket_messages_received") == 1
+    assert delta("socket_bytes_received") == 5
+    assert delta("socket_messages_sent") == 1
+    assert delta("socket_bytes_sent") == 6
+    assert delta("socket_timeouts") == 1
+    assert metrics.REGISTRY.histogram("socket_recv_wait_seconds", "", **labels).count - waits == 1
+    assert not any("socket" in dict(key) for key in metrics.REGISTRY._families["socket_messages_sent"]["metrics"])
+    sock.close()
+    lr.close()
+
+
 def test_nanomsg_socket_dial(local_replier):
     expected_url = "tcp://127.0.0.1:1337"
     lr = local_replier(expected_url)
@@ -197,3 +240,83 @@ def test_context_socket_second():
     second_req.close()
     context_rep.close()
     context_req.close()
+
+
+def test_pack_unpack_frame():
+    np = pytest.importorskip("numpy")
+    arrays = {
+        "isin": np.array(["US0378331005", "US88160R1014", "US5949181045"]),
+        "close": np.array([1.5, 2.5, 3.5]),
+        "volume": np.array([100, 200, 300], dtype=np.int64),
+        "matrix": np.arange(6, dtype=np.int32).reshape(2, 3),
+    }
+    data = pack_frame(arrays, {"task": "ohlc_batch"})
+    assert is_frame(data)
+
+    meta, loaded = unpack_frame(data)
+    assert meta == {"task": "ohlc_batch"}
+    for name, array in arrays.items():
+        assert loaded[name].dtype == array.dtype
+        np.testing.assert_array_equal(loaded[name], array)
+        assert loaded[name].base is not None and not loaded[name].flags.owndata
+
+
+def test_pack_frame_object_array():
+    np = pytest.importorskip("numpy")
+    with pytest.raises(FrameError, match="array isin of dtype object can not be sent as a frame"):
+        pack_frame({"isin": np.array(["a", None], dtype=object)})
+
+
+def test_unpack_frame_bad_data():
+    pytest.importorskip("numpy")
+    with pytest.raises(FrameError, match="data is not an array frame"):
+        unpack_frame(b'{"task": "demo"}')
+
+
+def test_unpack_frame_truncated():
+    np = pytest.importorskip("numpy")
+    data = pack_frame({"close": np.array([1.0, 2.0, 3.0])})
+    with pytest.raises(FrameError, match="invalid array frame"):
+        unpack_frame(data[:-8])
+
+
+def test_nanomsg_socket_frame(local_requester):
+    np = pytest.importorskip("numpy")
+    config = SocketConfig(socket_type="replier", host="127.0.0.1", port=1337)
+    sock = NanomsgSocket(config)
+    lr = local_requester(sock.url())
+
+    lr.send(pack_frame({"close": np.array([1.0, 2.0])}))
+    meta, arrays = sock.recv_frame()
+    assert meta == {}
+    np.testing.assert_array_equal(arrays["close"], [1.0, 2.0])
+
+    sock.send_frame({"open": np.array([3.0])}, {"task": "demo"})
+    meta, arrays = unpack_frame(lr.recv())
+    assert meta == {"task": "demo"}
+    np.testing.assert_array_equal(arrays["open"], [3.0])
+
+    lr.close()
+    sock.close()
+
+
+@pytest.mark.parametrize("transport", ["ipc", "inproc"])
+def test_local_transports(transport):
+    replier = NanomsgSocket(SocketConfig(transport=transport, socket_type=SocketType.REPLIER))
+    assert replier.url() == f"{transport}://{replier._config.path}"
+
+    requester = NanomsgSocket(SocketConfig(**dict(replier._config.dict(), listen=False, socket_type="requester")))
+    requester.send(b"hello")
+    assert replier.recv() == b"hello"
+    replier.send(b"world")
+    assert requester.recv() == b"world"
+
+    requester.close()
+    replier.close()
+    if transport == "ipc":
+        assert not os.path.exists(replier._config.path)
+
+
+def test_unknown_transport():
+    with pytest.raises(ValueError, match="not a valid SocketTransport"):
+        SocketConfig(transport="udp")
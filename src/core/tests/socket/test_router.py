@@ -1,9 +1,14 @@
+import asyncio
+import time
+from threading import Thread
 from unittest.mock import create_autospec
 
 import pytest
+from foreverbull_core import metrics
 from foreverbull_core.models.base import Base
 from foreverbull_core.models.socket import Request, Response
-from foreverbull_core.socket.router import MessageRouter, TaskAlreadyExists
+from foreverbull_core.socket.envelope import Envelope
+from foreverbull_core.socket.router import AsyncMessageRouter, MessageRouter, TaskAlreadyExists
 
 
 class DemoModel(Base):
@@ -28,6 +33,8 @@ def test_add_route():
 
     assert "demo" in router._routes
     assert demo_function == router._routes["demo"].func
+    assert "demo" in router
+    assert "other" not in router
 
 
 def test_add_route_with_model():
@@ -91,3 +98,125 @@ def test_call_error_function():
     rsp = router(req)
     assert rsp.error is not None
     assert rsp.error == "Exception('this does not work')"
+
+
+def test_call_metrics():
+    router = MessageRouter()
+    router.add_route(demo_function, "metrics_demo")
+    router.add_route(error_function, "metrics_error")
+
+    router(Request(task="metrics_demo"))
+    router(Request(task="metrics_demo"))
+    router(Request(task="metrics_error"))
+
+    assert metrics.REGISTRY.counter("router_calls", "", route="metrics_demo").value == 2
+    assert metrics.REGISTRY.counter("router_errors", "", route="metrics_demo").value == 0
+    assert metrics.REGISTRY.counter("router_errors", "", route="metrics_error").value == 1
+    assert metrics.REGISTRY.histogram("router_handler_seconds", "", route="metrics_demo").count == 2
+    assert metrics.REGISTRY.histogram("router_decode_seconds", "", route="metrics_error").count == 1
+
+
+def test_call_trusted_route():
+    mock_func = create_autospec(demo_function_with_model)
+
+    router = MessageRouter(trusted=True)
+    router.add_route(mock_func, "demo", DemoModel)
+    router.add_route(mock_func, "strict", DemoModel, trusted=False)
+    assert router._routes["demo"].trusted
+    assert not router._routes["strict"].trusted
+
+    rsp = router(Request(task="demo", data={"name": 1337}))
+    assert rsp.error is None
+    mock_func.assert_called_once_with(DemoModel.construct(name=1337))
+
+    rsp = router(Request(task="strict", data={}))
+    assert rsp.error.startswith("ValidationError")
+
+
+def test_call_envelope():
+    mock_func = create_autospec(demo_function)
+    mock_func_with_model = create_autospec(demo_function_with_model)
+
+    router = MessageRouter()
+    router.add_route(mock_func, "demo")
+    router.add_route(mock_func_with_model, "demo_with_model", DemoModel)
+
+    rsp = router(Envelope("demo", b"not decoded when route takes no model"))
+    assert rsp.error is None
+    mock_func.assert_called_once()
+
+    data = Envelope.from_message(Request(task="demo_with_model", data={"name": "best"})).dump()
+    rsp = router(Envelope.unpack(data))
+    assert rsp.error is None
+    mock_func_with_model.assert_called_once_with(DemoModel(name="best"))
+
+
+def test_async_router():
+    async def async_function(demo: DemoModel):
+        await asyncio.sleep(0)
+        return {"name": demo.name}
+
+    router = AsyncMessageRouter()
+    router.add_route(async_function, "async", DemoModel)
+    router.add_route(demo_function, "sync")
+    router.add_route(error_function, "error")
+
+    response = asyncio.run(router(Request(task="async", data={"name": "demo"})))
+    assert response.data == {"name": "demo"}
+    assert response.error is None
+
+    response = asyncio.run(router(Envelope.from_message(Request(task="sync"))))
+    assert response.task == "sync"
+    assert response.error is None
+
+    response = asyncio.run(router(Request(task="error")))
+    assert response.error == "Exception('this does not work')"
+
+    response = asyncio.run(router(Request(task="unknown")))
+    assert response.error == "task not found"
+
+
+def test_serialized_routes():
+    running = []
+    overlaps = []
+
+    def slow_function():
+        if running:
+            overlaps.append(True)
+        running.append(True)
+        time.sleep(0.05)
+        running.pop()
+
+    router = MessageRouter()
+    router.add_route(slow_function, "first", serialize="shared")
+    router.add_route(slow_function, "second", serialize="shared")
+    assert router._routes["first"].lock == router._routes["second"].lock == "shared"
+
+    threads = [Thread(target=router, args=(Request(task=task),)) for task in ("first", "second", "first")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == []
+
+
+def test_serialized_async_routes():
+    running = []
+    overlaps = []
+
+    async def slow_function():
+        if running:
+            overlaps.append(True)
+        running.append(True)
+        await asyncio.sleep(0.05)
+        running.pop()
+
+    router = AsyncMessageRouter()
+    router.add_route(slow_function, "slow", serialize=True)
+
+    async def call_concurrently():
+        return await asyncio.gather(*[router(Request(task="slow")) for _ in range(3)])
+
+    responses = asyncio.run(call_concurrently())
+    assert all(response.error is None for response in responses)
+    assert overlaps == []
@@ -0,0 +1,20 @@
+from foreverbull_core.socket.sequence import SequenceTracker
+
+
+def test_sequence_tracker():
+    tracker = SequenceTracker()
+    assert tracker.last is None
+    assert list(tracker.check(0)) == []
+    assert list(tracker.check(1)) == []
+    assert list(tracker.check(4)) == [2, 3]
+    assert tracker.missed == 2
+    assert tracker.last == 4
+
+    # replayed messages are not gaps
+    assert list(tracker.check(2)) == []
+    assert list(tracker.check(None)) == []
+    assert tracker.last == 4
+
+    tracker.reset()
+    assert tracker.missed == 0
+    assert list(tracker.check(10)) == []
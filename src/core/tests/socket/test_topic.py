@@ -0,0 +1,19 @@
+import pytest
+from foreverbull_core.socket.topic import add_topic, split_topic, topic
+
+
+def test_topic():
+    assert topic("period") == b"period/"
+    assert topic("ohlc", "US0378331005") == b"ohlc/US0378331005/"
+    assert topic("ohlc", 3) == b"ohlc/3/"
+    assert not topic("ohlc_batch").startswith(topic("ohlc"))
+
+
+def test_add_split_topic():
+    data = add_topic(b'{"task": "ohlc"}', topic("ohlc", 3))
+    key, message = split_topic(data)
+    assert key == b"ohlc/3/"
+    assert bytes(message) == b'{"task": "ohlc"}'
+
+    with pytest.raises(ValueError):
+        split_topic(b'{"task": "ohlc"}')
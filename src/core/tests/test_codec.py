@@ -0,0 +1,122 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from foreverbull_core import codec
+from foreverbull_core.models.finance import OHLC
+from foreverbull_core.models.socket import Request, Response, SocketConfig
+from foreverbull_core.socket.client import SocketClient
+from pynng import Req0
+
+
+@pytest.fixture
+def ohlc():
+    return OHLC(
+        isin="US0378331005",
+        open=133.6,
+        high=1337.8,
+        low=133.2,
+        close=1337.7,
+        volume=9001,
+        time=datetime(2020, 1, 7, 21, 0, 0, 1, tzinfo=timezone.utc),
+    )
+
+
+def test_get():
+    assert codec.get().name == codec.JSON
+    assert codec.get(codec.MSGPACK).name == codec.MSGPACK
+    with pytest.raises(codec.CodecNotFound, match="codec asdf not found"):
+        codec.get("asdf")
+
+
+def test_resolve_fallback():
+    assert codec.resolve("asdf").name == codec.JSON
+    assert codec.resolve(codec.MSGPACK).name == codec.MSGPACK
+
+
+def test_to_epoch():
+    assert codec.to_epoch(datetime(1970, 1, 1, 0, 0, 1)) == 1000000
+    assert codec.to_epoch(datetime(2020, 1, 7, tzinfo=timezone.utc)) == codec.to_epoch(datetime(2020, 1, 7).date())
+
+
+@pytest.mark.parametrize(
+    "time",
+    [
+        datetime(1969, 12, 31, 23, tzinfo=timezone.utc),
+        datetime(1970, 3, 1, tzinfo=timezone.utc),
+        datetime(2020, 1, 7, 21, 0, 0, 1, tzinfo=timezone.utc),
+    ],
+)
+def test_from_epoch(time):
+    assert codec.from_epoch(codec.to_epoch(time)) == time
+
+
+@pytest.mark.parametrize("name", [codec.JSON, codec.MSGPACK])
+def test_round_trip(name, ohlc):
+    data = ohlc.dump(name)
+    assert codec.detect(data).name == name
+    assert OHLC.load(data) == ohlc
+
+
+def test_msgpack_naive_datetime_loaded_as_utc(ohlc):
+    naive = ohlc.copy(update={"time": ohlc.time.replace(tzinfo=None)})
+    assert OHLC.load(naive.dump(codec.MSGPACK)).time == ohlc.time
+    assert OHLC.load(naive.dump(codec.MSGPACK), trusted=True).time == ohlc.time
+
+
+def test_json_naive_datetime_kept_naive(ohlc):
+    naive = ohlc.copy(update={"time": ohlc.time.replace(tzinfo=None)})
+    assert OHLC.load(naive.dump(codec.JSON)).time == naive.time
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+@pytest.mark.parametrize(
+    "time",
+    [
+        datetime(1970, 1, 1, tzinfo=timezone.utc),
+        datetime(1970, 3, 1, tzinfo=timezone.utc),
+        datetime(1969, 12, 31, 23, tzinfo=timezone.utc),
+        datetime(1969, 12, 31, 23, 59, 59, 999999, tzinfo=timezone.utc),
+        datetime(1900, 1, 1, 12, 0, 0, 1, tzinfo=timezone.utc),
+    ],
+)
+def test_msgpack_datetime_near_epoch(ohlc, time, trusted):
+    ohlc = ohlc.copy(update={"time": time})
+    assert OHLC.load(ohlc.dump(codec.MSGPACK), trusted=trusted).time == time
+
+
+def test_msgpack_datetime_as_timestamp(ohlc):
+    request = Request(task="ohlc", data=ohlc)
+    loaded = Request.load(request.dump(codec.MSGPACK))
+    assert loaded.data["time"] == ohlc.time
+    assert OHLC(**loaded.data) == ohlc
+
+
+def test_msgpack_date():
+    day = date(1970, 1, 2)
+    assert codec.get(codec.MSGPACK).decode(codec.get(codec.MSGPACK).encode({"day": day})) == {"day": "1970-01-02"}
+
+
+def test_msgpack_smaller_than_json(ohlc):
+    assert len(ohlc.dump(codec.MSGPACK)) < len(ohlc.dump(codec.JSON))
+
+
+def test_socket_client_replies_with_peer_codec():
+    client = SocketClient(SocketConfig(host="127.0.0.1", codec=codec.MSGPACK))
+    requester = Req0(dial=client.url())
+    requester.recv_timeout = 5000
+
+    requester.send(Request(task="json").dump())
+    assert client.recv().task == "json"
+    client.send(Response(task="json"))
+    data = requester.recv()
+    assert codec.detect(data).name == codec.JSON
+
+    requester.send(Request(task="msgpack").dump(codec.MSGPACK))
+    assert client.recv().task == "msgpack"
+    client.send(Response(task="msgpack"))
+    data = requester.recv()
+    assert codec.detect(data).name == codec.MSGPACK
+    assert Response.load(data).task == "msgpack"
+
+    requester.close()
+    client.close()
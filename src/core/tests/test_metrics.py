@@ -0,0 +1,67 @@
+import math
+
+import pytest
+from foreverbull_core import metrics
+
+
+@pytest.fixture
+def registry():
+    return metrics.Registry()
+
+
+def test_counter(registry):
+    counter = registry.counter("messages", "Messages", socket="a")
+    counter.inc()
+    counter.inc(2)
+    assert registry.counter("messages", "Messages", socket="a") is counter
+    assert registry.counter("messages", "Messages", socket="b") is not counter
+    assert registry.snapshot() == {
+        "messages": [{"labels": {"socket": "a"}, "value": 3}, {"labels": {"socket": "b"}, "value": 0}]
+    }
+
+
+def test_histogram(registry):
+    histogram = registry.histogram("latency", "Latency")
+    histogram.observe(0.0002)
+    histogram.observe(0.002)
+    histogram.observe(60)
+    assert histogram.count == 3
+    buckets = histogram.cumulative()
+    assert buckets[0.0001] == 0
+    assert buckets[0.0005] == 1
+    assert buckets[0.005] == 2
+    assert buckets[30.0] == 2
+    assert buckets[math.inf] == 3
+    sample = registry.snapshot()["latency"][0]
+    assert sample["count"] == 3
+    assert sample["buckets"]["+Inf"] == 3
+
+
+def test_type_mismatch(registry):
+    registry.counter("demo", "Demo")
+    with pytest.raises(ValueError, match="metric demo is a counter, not a histogram"):
+        registry.histogram("demo", "Demo")
+
+
+def test_openmetrics(registry):
+    registry.counter("messages", "Messages sent", socket='tcp://"a"').inc(5)
+    registry.histogram("latency", "Latency", route="info").observe(0.003)
+    text = registry.openmetrics()
+    lines = text.splitlines()
+    assert lines[:3] == [
+        "# TYPE messages counter",
+        "# HELP messages Messages sent",
+        'messages_total{socket="tcp://\\"a\\""} 5',
+    ]
+    assert 'latency_bucket{route="info",le="0.001"} 0' in lines
+    assert 'latency_bucket{route="info",le="0.005"} 1' in lines
+    assert 'latency_bucket{route="info",le="+Inf"} 1' in lines
+    assert 'latency_count{route="info"} 1' in lines
+    assert lines[-1] == "# EOF"
+    assert text.endswith("\n")
+
+
+def test_clear(registry):
+    registry.counter("messages", "Messages").inc()
+    registry.clear()
+    assert registry.snapshot() == {}
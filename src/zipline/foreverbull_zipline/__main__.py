@@ -3,11 +3,11 @@ import logging
 import os
 import signal
 import socket
-import time
 
 import foreverbull_core.logger
 from foreverbull_core.broker import Broker
-from foreverbull_zipline.app import Application
+from foreverbull_core.models.socket import SocketTransport
+from foreverbull_zipline.pool import EnginePool, Supervisor
 
 log = logging.getLogger()
 
@@ -16,6 +16,10 @@ parser.add_argument("--broker-url", help="URL of broker")
 parser.add_argument("--local-host", help="Local Address")
 parser.add_argument("--service-id", help="Service ID")
 parser.add_argument("--instance-id", help="Instance ID")
+parser.add_argument("--transport", help="Transport of feed and broker sockets: tcp or ipc")
+parser.add_argument("--pool", type=int, help="Serve from a pool of this many warm engine processes")
+parser.add_argument("--preload", help="Comma separated bundles loaded by engine processes of the pool")
+parser.add_argument("--processes", type=int, help="Run simulations in engine processes, keeping this many warm")
 
 
 def get_broker(args: argparse.Namespace) -> Broker:
@@ -31,27 +35,56 @@ def get_broker(args: argparse.Namespace) -> Broker:
     return Broker(broker_url, local_host)
 
 
-def run_application(application: Application):
+def run_application(application):
     application.start()
     try:
-        while application.running:
-            time.sleep(1)
+        application.join()
     except KeyboardInterrupt:
         application.stop()
-    application.join()
+        application.join()
+
+
+def get_transport(args: argparse.Namespace) -> str:
+    transport = args.transport if args.transport else os.environ.get("SOCKET_TRANSPORT", "tcp")
+    if transport not in (SocketTransport.TCP.value, SocketTransport.IPC.value):
+        # inproc and memory addresses can only be dialed from within this process, see foreverbull.embedded
+        parser.error(f"transport {transport} can not be reached by workers, use tcp or ipc")
+    return transport
+
+
+def get_application(args: argparse.Namespace, socket_config, transport: str):
+    pool = args.pool if args.pool else int(os.environ.get("ENGINE_POOL", 0))
+    processes = args.processes if args.processes else int(os.environ.get("ENGINE_PROCESSES", 0))
+    preload = args.preload if args.preload else os.environ.get("PRELOAD_BUNDLES", "")
+    bundles = [name for name in preload.split(",") if name]
+    if not pool:
+        # imported here, a supervisor leaves importing zipline to the engine processes
+        from foreverbull_zipline.app import Application
+
+        if not processes:
+            return Application(socket_config, transport=transport)
+        engines = EnginePool(processes, bundles=bundles)
+        engines.start()
+        return Application(socket_config, transport=transport, pool=engines)
+    engines = EnginePool(pool, bundles=bundles)
+    engines.start()
+    return Supervisor(engines, socket_config, transport)
 
 
 if __name__ == "__main__":
     foreverbull_core.logger.Logger()
     args = parser.parse_args()
     broker = get_broker(args)
-    application = Application(broker.socket_config)
+    transport = get_transport(args)
+    application = get_application(args, broker.socket_config, transport)
     broker.http.service.update_instance(
         os.environ.get("SERVICE_NAME"), socket.gethostname(), broker.socket_config, True
     )
-    signal.signal(signal.SIGTERM, application.stop)
+    signal.signal(signal.SIGTERM, lambda *_: application.stop())
     log.info("starting application")
     run_application(application)
+    if getattr(application, "pool", None) is not None:
+        application.pool.stop()
     log.info("ending application")
     broker.http.service.update_instance(
         os.environ.get("SERVICE_NAME"), socket.gethostname(), broker.socket_config, False
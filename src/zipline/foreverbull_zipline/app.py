@@ -1,16 +1,26 @@
 import logging
 import threading
-from datetime import datetime, timezone
+import uuid
+from typing import Dict, Union
 
-from foreverbull_core.models.backtest import EngineConfig, IngestConfig, Period, Result
-from foreverbull_core.models.socket import SocketConfig
+from foreverbull_core import metrics
+from foreverbull_core.models.backtest import SessionId
+from foreverbull_core.models.socket import Request, Response, SocketConfig, SocketTransport
+from foreverbull_core.socket import compression
 from foreverbull_core.socket.client import SocketClient
+from foreverbull_core.socket.envelope import Envelope
 from foreverbull_core.socket.exceptions import SocketClosed, SocketTimeout
+from foreverbull_core.socket.memory import MemorySocket
 from foreverbull_core.socket.router import MessageRouter
 from foreverbull_zipline.backtest import Backtest
 from foreverbull_zipline.broker import Broker
-from foreverbull_zipline.exceptions import BacktestNotRunning
+from foreverbull_zipline.exceptions import SessionNotFound
 from foreverbull_zipline.feed import Feed
+from foreverbull_zipline.pool import EnginePool
+from foreverbull_zipline.session import Session
+
+# session of requests without one, so a single backtest is run like before sessions existed
+DEFAULT_SESSION = "default"
 
 
 class ApplicationError(Exception):
@@ -18,100 +28,203 @@ class ApplicationError(Exception):
 
 
 class Application(threading.Thread):
-    def __init__(self, socket_config: SocketConfig):
+    def __init__(self, socket_config: SocketConfig, contexts: int = 4, transport: str = "tcp", pool: EnginePool = None):
+        """Control plane of the backtest engine, serves requests on the main socket
+
+        Args:
+            socket_config (SocketConfig): Configuration of the main socket
+            contexts (int, optional): Number of requests served concurrently. Defaults to 4.
+            transport (str, optional): Transport of the feed and broker sockets, ipc or inproc when the workers
+            run on the same host or in the same process. Defaults to "tcp".
+            pool (EnginePool, optional): Pool of engine processes, every session runs its simulation in one
+            taken from it. Defaults to None, simulations run in the application process.
+
+        With memory transport for the main socket requests are sent to the application through
+        Application.socket instead, see foreverbull.embedded.
+
+        Many backtests can run side by side, each in a session created with the new_session task. Requests
+        carrying the id of a session go to it, others to the default session.
+        """
         self.logger = logging.getLogger(__name__)
         self.socket_config: SocketConfig = socket_config
+        if socket_config.compression is None:
+            # results run into megabytes, replies are only compressed towards peers that accept it
+            socket_config.compression = (
+                compression.ZSTD if compression.ZSTD in compression.available() else compression.ZLIB
+            )
+        self.contexts = contexts
+        self.transport = transport
+        self.pool = pool
         self.running = False
         self.online = False
         self._router = MessageRouter()
         self._router.add_route(self.info, "info")
-        self._router.add_route(self._ingest, "ingest", IngestConfig)
-        self._router.add_route(self._configure, "configure", EngineConfig)
-        self._router.add_route(self._run, "run")
-        self._router.add_route(self._continue, "continue")
-        self._router.add_route(self._status, "status")
         self._router.add_route(self.stop, "stop")
-        self._router.add_route(self._result, "result")
-        self._stop_lock = threading.Lock()
-        self.backtest: Backtest = Backtest()
-        self.feed: Feed = Feed(self.backtest)
-        self.stock_broker: Broker = Broker(self.backtest, self.feed)
+        self._router.add_route(self._new_session, "new_session")
+        self._router.add_route(self._sessions, "sessions")
+        self._router.add_route(self._close_session, "close_session", SessionId)
+        self._router.add_route(metrics.snapshot, "metrics")
+        self._router.add_route(self._openmetrics, "openmetrics")
+        self.socket = None
+        if socket_config.transport == SocketTransport.MEMORY.value:
+            self.socket = MemorySocket(socket_config)
+            self.socket.connect(self._route)
+        self._waiting = set()
+        self._waiting_lock = threading.Lock()
+        self._stopped = False
+        self.started = threading.Event()
+        self.sessions: Dict[str, Session] = {DEFAULT_SESSION: Session(DEFAULT_SESSION, transport, pool)}
+        self._sessions_lock = threading.Lock()
         threading.Thread.__init__(self)
 
-    def _ingest(self, config: IngestConfig):
-        self.backtest.ingest(config)
+    @property
+    def backtest(self) -> Backtest:
+        return self.sessions[DEFAULT_SESSION].backtest
+
+    @property
+    def feed(self) -> Feed:
+        return self.sessions[DEFAULT_SESSION].feed
+
+    @property
+    def stock_broker(self) -> Broker:
+        return self.sessions[DEFAULT_SESSION].stock_broker
+
+    def session(self, id: str = None) -> Session:
+        """Session by id
 
-    def _configure(self, config: EngineConfig):
-        self.backtest.configure(config)
+        Args:
+            id (str, optional): Id of the session. Defaults to the default session.
 
-    def _run(self):
-        self.logger.info("running backtest")
-        self.backtest.set_callbacks(self.feed.handle_data, self.feed.backtest_completed)
-        self.stock_broker.start()
-        self.backtest.start()
-        return {"status": "ok"}
+        Raises:
+            SessionNotFound: In case there is no session with the id
 
-    def _continue(self) -> None:
-        if not self.running:
-            raise BacktestNotRunning("backtest is not running")
-        self.feed.lock.set()  # TODO: Maybe change this variable name?
+        Returns:
+            Session: session
+        """
+        with self._sessions_lock:
+            try:
+                return self.sessions[id or DEFAULT_SESSION]
+            except KeyError:
+                raise SessionNotFound(f"session {id} not found")
+
+    def _route(self, message: Union[Request, Envelope]) -> Response:
+        # envelopes carry the session in their header, the payload is left for the router to decode
+        session_id = message.session
+        if session_id is None and message.task in self._router:
+            return self._router(message)
+        try:
+            session = self.session(session_id)
+        except SessionNotFound as exc:
+            return Response(task=message.task, error=repr(exc))
+        return session.router(message)
+
+    def _new_session(self) -> dict:
+        with self._sessions_lock:
+            if self._stopped:
+                raise ApplicationError("application stopped")
+        session = Session(uuid.uuid4().hex, self.transport, self.pool)
+        with self._sessions_lock:
+            stopped = self._stopped
+            if not stopped:
+                self.sessions[session.id] = session
+        if stopped:
+            # stopped while the session was set up, stop did not see it so its sockets and engine are ours to close
+            session.stop()
+            raise ApplicationError("application stopped")
+        self.logger.info(f"new session {session.id}")
+        return session.info()
+
+    def _sessions(self) -> dict:
+        with self._sessions_lock:
+            sessions = list(self.sessions.values())
+        return {"sessions": [session.info() for session in sessions]}
+
+    def _close_session(self, session: SessionId) -> None:
+        if session.id == DEFAULT_SESSION:
+            raise ApplicationError("the default session is closed when the application stops")
+        with self._sessions_lock:
+            closing = self.sessions.pop(session.id, None)
+        if closing is None:
+            raise SessionNotFound(f"session {session.id} not found")
+        closing.stop()
+
+    def _openmetrics(self) -> dict:
+        return {"text": metrics.openmetrics()}
 
     def info(self) -> dict:
+        session = self.session()
         return {
             "socket": self.socket_config.dict(),
-            "feed": {"socket": self.feed.configuration.dict()},
-            "broker": {"socket": self.stock_broker.configuration.dict()},
+            "feed": {"socket": session.feed.configuration.dict()},
+            "broker": {"socket": session.stock_broker.configuration.dict()},
             "running": self.running,
         }
 
-    def _status(self) -> dict:
-        return {
-            "running": self.running,
-            "configured": self.backtest.configured,
-            "day_completed": self.feed.day_completed,
-        }
-
     def run(self) -> None:
         self.logger.info("starting application")
+        if self.socket is not None:
+            # requests are routed as they are sent over the memory socket
+            self.running = True
+            self.started.set()
+            return
         socket = SocketClient(self.socket_config)
-        self.running = True
+        with self._waiting_lock:
+            self.running = not self._stopped
+        self.started.set()
+        contexts = [threading.Thread(target=self._serve, args=(socket,)) for _ in range(self.contexts)]
+        for context in contexts:
+            context.start()
+        for context in contexts:
+            context.join()
+        socket.close()
+
+    def _recv(self, context_socket):
+        # contexts waiting for a request are closed on stop, so stop does not wait for receive timeouts
+        with self._waiting_lock:
+            if not self.running:
+                raise SocketClosed("application stopped")
+            self._waiting.add(context_socket)
+        try:
+            return context_socket.recv(lazy=True)
+        finally:
+            with self._waiting_lock:
+                self._waiting.discard(context_socket)
+
+    def _serve(self, socket: SocketClient) -> None:
         while self.running:
+            context_socket = socket.new_context()
+            message = None
             try:
-                context_socket = socket.new_context()
-                message = context_socket.recv()
+                message = self._recv(context_socket)
                 self.logger.info(f"received task: {message.task}")
-                rsp = self._router(message)
+                rsp = self._route(message)
                 self.logger.info(f"sending response for task: {message.task}")
                 context_socket.send(rsp)
-                context_socket.close()
             except SocketTimeout:
                 self.logger.debug("timeout")
-                context_socket.close()
             except SocketClosed:
                 return
             except Exception as e:
-                self.logger.warning(f"Unknown Exception when running: {repr(e)}")
-        socket.close()
+                self.logger.warning(f"Unknown Exception when running: {repr(e)}", exc_info=True)
+                self._send_error(context_socket, message, e)
+            finally:
+                context_socket.close()
+
+    def _send_error(self, context_socket, message, exc: Exception) -> None:
+        # the requester gets the error instead of waiting for a reply that never comes
+        task = message.task if message is not None else "unknown"
+        try:
+            context_socket.send(Response(task=task, error=repr(exc)))
+        except Exception as send_exc:
+            self.logger.warning(f"Unable to send error response: {repr(send_exc)}")
 
     def stop(self):
-        self.running = False
-        self._stop_lock.acquire()
-        if self.backtest and self.backtest.is_alive():
-            self.backtest.stop()
-            # self.backtest.join()
-            self.backtest = None
-        if self.stock_broker and self.stock_broker.is_alive():
-            self.stock_broker.stop()
-            self.stock_broker.join()
-            self.stock_broker = None
-        if self.running:
-            self.feed.stop()
-        self._stop_lock.release()
-
-    def _result(self) -> Result:
-        result = Result(periods=[])
-        for period in self.backtest.result:
-            period["period"] = datetime.fromtimestamp(period["period_open"] / 1000, tz=timezone.utc)
-            period_result = Period(**period)
-            result.periods.append(period_result)
-        return result
+        with self._waiting_lock:
+            self.running = False
+            self._stopped = True
+            for context_socket in self._waiting:
+                context_socket.close()
+        with self._sessions_lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            session.stop()
@@ -7,19 +7,19 @@ import pandas as pd
 import pytz
 import six
 from foreverbull_core.models.backtest import EngineConfig, IngestConfig
+from foreverbull_core.models.finance import SymbolTable
 from foreverbull_zipline.data_bundles.foreverbull import DatabaseEngine, SQLIngester
 
 from zipline import TradingAlgorithm
 from zipline.data import bundles
-from zipline.data.data_portal import DataPortal
 from zipline.errors import SymbolNotFound
 from zipline.extensions import load
 from zipline.finance import metrics
 from zipline.finance.blotter import Blotter
 from zipline.finance.trading import SimulationParameters
-from zipline.utils.calendar_utils import get_calendar
-from zipline.utils.run_algo import BenchmarkSpec, _RunAlgoError
+from zipline.utils.run_algo import _RunAlgoError
 
+from . import cache
 from .exceptions import ConfigError
 
 Config = namedtuple(
@@ -27,23 +27,31 @@ Config = namedtuple(
 )
 Assets = namedtuple("assets", "isins, benchmark")
 
+# the ingester is configured through class attributes, so one ingest at a time
+_ingest_lock = threading.Lock()
+
 
 class Backtest(threading.Thread):
     def __init__(self):
         self.assets = None
+        self.symbols = None
         self.handle_data = None
         self.trading_algorithm = None
         self._config = None
+        # bundle, calendar and data portal from the cache, handed back when the backtest is done
+        self._data_portal = None
         self.backtest_completed = None
         super(Backtest, self).__init__()
 
     def ingest(self, config: IngestConfig) -> None:
-        bundles.register("foreverbull", SQLIngester(), calendar_name=config.calendar_name)
-        SQLIngester.engine = DatabaseEngine(config.database)
-        SQLIngester.from_date = config.from_date
-        SQLIngester.to_date = config.to_date
-        SQLIngester.isins = config.isins
-        bundles.ingest(config.name, os.environ, pd.Timestamp.utcnow(), [], True)
+        with _ingest_lock:
+            bundles.register("foreverbull", SQLIngester(), calendar_name=config.calendar_name)
+            SQLIngester.engine = DatabaseEngine(config.database)
+            SQLIngester.from_date = config.from_date
+            SQLIngester.to_date = config.to_date
+            SQLIngester.isins = config.isins
+            SQLIngester.frequency = config.frequency
+            bundles.ingest(config.name, os.environ, pd.Timestamp.utcnow(), [], True)
 
     def set_callbacks(self, handle_data, backtest_completed) -> None:
         self.handle_data = handle_data
@@ -53,6 +61,11 @@ class Backtest(threading.Thread):
     def configured(self) -> bool:
         return True if self.trading_algorithm else False
 
+    @property
+    def data_portal(self):
+        """Data portal of the configured backtest, None once it is handed back to the cache"""
+        return self._data_portal[2] if self._data_portal else None
+
     def configure(self, config: EngineConfig) -> None:
         self._config = config
         try:
@@ -61,35 +74,21 @@ class Backtest(threading.Thread):
         except pytz.exceptions.UnknownTimeZoneError as e:
             raise ConfigError(repr(e))
 
-        bundle_data = bundles.load(
-            config.bundle,
-            os.environ,
-            None,
-        )
+        bundle = cache.bundle(config.bundle)
         try:
-            benchmark_spec = BenchmarkSpec(None, None, None, benchmark_symbol=config.benchmark, no_benchmark=True)
-            benchmark_returns, benchmark_sid = benchmark_spec.resolve(
-                asset_finder=bundle_data.asset_finder,
-                start_date=start_date,
-                end_date=end_date,
-            )
+            benchmark_returns, benchmark_sid = cache.benchmark(bundle, config.benchmark, start_date, end_date)
         except _RunAlgoError as e:
             raise ConfigError(repr(e))
-        trading_calendar = get_calendar("NYSE")
-        data_portal = DataPortal(
-            bundle_data.asset_finder,
-            trading_calendar=trading_calendar,
-            first_trading_day=bundle_data.equity_minute_bar_reader.first_trading_day,
-            equity_minute_reader=bundle_data.equity_minute_bar_reader,
-            equity_daily_reader=bundle_data.equity_daily_bar_reader,
-            adjustment_reader=bundle_data.adjustment_reader,
-        )
+        trading_calendar = cache.calendar("NYSE")
+        self._release_data_portal()
+        data_portal = cache.acquire_data_portal(bundle, trading_calendar)
+        self._data_portal = (bundle, trading_calendar, data_portal)
         sim_params = SimulationParameters(
             start_session=start_date,
             end_session=end_date,
             trading_calendar=trading_calendar,
             capital_base=100000,
-            data_frequency="daily",
+            data_frequency=config.data_frequency,
         )
         metrics_set = "default"
         blotter = "default"
@@ -108,6 +107,7 @@ class Backtest(threading.Thread):
             data_portal, trading_calendar, sim_params, metrics_set, blotter, benchmark_returns, benchmark_sid
         )
         self.assets = Assets(config.isins, config.benchmark)
+        self.symbols = SymbolTable(isins=config.isins)
         self.trading_algorithm = TradingAlgorithm(
             namespace={},
             data_portal=trading_config.data_portal,
@@ -117,7 +117,7 @@ class Backtest(threading.Thread):
             blotter=trading_config.blotter,
             benchmark_returns=trading_config.benchmark_returns,
             benchmark_sid=trading_config.benchmark_sid,
-            handle_data=self.handle_data,
+            handle_data=self._handle_data,
             analyze=self.analyze,
         )
         self.trading_algorithm.assets = []
@@ -129,14 +129,30 @@ class Backtest(threading.Thread):
         self.trading_algorithm.set_benchmark(self.trading_algorithm.symbol(self.assets.benchmark))
         return self.trading_algorithm
 
+    def _release_data_portal(self) -> None:
+        if self._data_portal is not None:
+            cache.release_data_portal(*self._data_portal)
+            self._data_portal = None
+
     def run(self) -> None:
-        # Need to reconfigure to get the trading engine as local thread object
-        self.configure(self._config)
-        self.trading_algorithm.run()
+        try:
+            self.trading_algorithm.run()
+        finally:
+            self._release_data_portal()
 
     def stop(self) -> None:
         return None
 
+    def close(self) -> None:
+        """Hands the data portal back to the cache, run does so when it ends but a backtest configured and
+        never run still holds it
+        """
+        self._release_data_portal()
+
+    def _handle_data(self, context, data) -> None:
+        # callbacks are set after configure
+        self.handle_data(context, data)
+
     def analyze(self, _, result: pd.DataFrame) -> None:
         result.drop("positions", axis=1, inplace=True)
         result.drop("orders", axis=1, inplace=True)
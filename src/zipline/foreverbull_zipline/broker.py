@@ -1,9 +1,13 @@
 import logging
 import threading
+from typing import Union
 
-from foreverbull_core.models.finance import Instrument, Order
-from foreverbull_core.models.socket import Request, SocketConfig
+from foreverbull_core import codec as codecs
+from foreverbull_core.models.finance import Instrument, Order, UnknownAssetId
+from foreverbull_core.models.socket import Request, Response, SocketConfig, SocketTransport
+from foreverbull_core.socket.envelope import Envelope, is_envelope
 from foreverbull_core.socket.exceptions import SocketClosed, SocketTimeout
+from foreverbull_core.socket.memory import MemorySocket
 from foreverbull_core.socket.nanomsg import NanomsgSocket
 from foreverbull_core.socket.router import MessageRouter
 from foreverbull_zipline.backtest import Backtest
@@ -22,8 +26,12 @@ class Broker(threading.Thread):
         if configuration is None:
             configuration = SocketConfig(socket_type="replier", recv_timeout=200000)
         self.configuration = configuration
-        self.socket = NanomsgSocket(configuration)
-        self.router = MessageRouter()
+        self.router = MessageRouter(trusted=True)
+        if configuration.transport == SocketTransport.MEMORY.value:
+            self.socket = MemorySocket(configuration)
+            self.socket.connect(self.router)
+        else:
+            self.socket = NanomsgSocket(configuration)
         self.router.add_route(self._can_trade, "can_trade", Instrument)
         self.router.add_route(self._order, "order", Order)
         self.router.add_route(self._get_order, "get_order", Order)
@@ -35,20 +43,75 @@ class Broker(threading.Thread):
         return {"socket": self.configuration.dict()}
 
     def run(self) -> None:
+        if isinstance(self.socket, MemorySocket):
+            # requests are routed as they are sent
+            return
         while True:
             try:
                 req_data = self.socket.recv()
-                req = Request.load(req_data)
-                rsp = self.router(req)
-                self.socket.send(rsp.dump())
+                self.socket.send(self._reply(req_data))
             except SocketTimeout:
                 pass
             except SocketClosed:
                 return
 
+    def _reply(self, req_data: bytes) -> bytes:
+        try:
+            return self.handle(req_data)
+        except Exception as exc:
+            # the requester waits for a reply to every request, so failures are answered instead of ending the thread
+            self.logger.error(f"Error handling broker request: {repr(exc)}", exc_info=True)
+            return self._error(req_data, exc)
+
+    def _error(self, req_data: bytes, exc: Exception) -> bytes:
+        """Error response to a request, in the format of the request when it can be read
+
+        Args:
+            req_data (bytes): Request, enveloped or encoded with any codec
+            exc (Exception): Error to reply with
+
+        Returns:
+            bytes: Response
+        """
+        try:
+            if is_envelope(req_data):
+                req = Envelope.unpack(req_data)
+                return Envelope.from_message(Response(task=req.task, error=repr(exc)), req.codec).dump()
+            codec = codecs.detect(req_data)
+            req = Request.load(req_data, codec, trusted=True)
+            return Response(task=req.task, error=repr(exc)).dump(codec)
+        except Exception:
+            return Response(task="unknown", error=repr(exc)).dump()
+
+    def handle(self, req_data: bytes) -> bytes:
+        """Routes a request as received on the socket
+
+        Args:
+            req_data (bytes): Request, enveloped or encoded with any codec
+
+        Returns:
+            bytes: Response, in the format of the request
+        """
+        if is_envelope(req_data):
+            req = Envelope.unpack(req_data)
+            rsp = self.router(req)
+            return Envelope.from_message(rsp, req.codec).dump()
+        codec = codecs.detect(req_data)
+        req = Request.load(req_data, codec, trusted=True)
+        rsp = self.router(req)
+        return rsp.dump(codec)
+
+    def _symbol(self, isin: Union[str, int]):
+        if self.backtest.symbols is not None:
+            try:
+                isin = self.backtest.symbols.isin(isin)
+            except UnknownAssetId:
+                raise zipline.errors.SymbolNotFound(symbol=isin)
+        return self.backtest.trading_algorithm.symbol(isin)
+
     def _can_trade(self, instrument: Instrument) -> bool:
         try:
-            equity = self.backtest.trading_algorithm.symbol(instrument.isin)
+            equity = self._symbol(instrument.isin)
         except zipline.errors.SymbolNotFound as e:
             raise BrokerError(repr(e))
         if self.feed.bardata.can_trade(equity):
@@ -58,7 +121,7 @@ class Broker(threading.Thread):
     def _order(self, order: Order) -> dict:
         self.logger.info(f"order: {order}")
         try:
-            asset = self.backtest.trading_algorithm.symbol(order.isin)
+            asset = self._symbol(order.isin)
         except zipline.errors.SymbolNotFound as e:
             raise BrokerError(repr(e))
         order.id = self.backtest.trading_algorithm.order(
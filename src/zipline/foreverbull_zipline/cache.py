@@ -0,0 +1,192 @@
+import os
+import sqlite3
+import threading
+from collections import defaultdict, namedtuple
+from typing import Tuple
+
+import pandas as pd
+
+from zipline.data import bundles
+from zipline.data.adjustments import SQLiteAdjustmentReader
+from zipline.data.data_portal import DataPortal
+from zipline.utils.calendar_utils import get_calendar
+from zipline.utils.run_algo import BenchmarkSpec
+
+# a bundle loaded at one of its ingestions, adjustments is the path of the adjustments database
+BUNDLE = namedtuple("bundle", "name, ingestion, data, adjustments")
+
+# attributes the bar readers compute on first use, which is not safe from many threads at once
+_LAZY_READER_ATTRIBUTES = {
+    "equity_daily_bar_reader": (
+        "_table",
+        "sessions",
+        "_first_rows",
+        "_last_rows",
+        "_calendar_offsets",
+        "first_trading_day",
+        "trading_calendar",
+        "last_available_dt",
+    ),
+    "equity_minute_bar_reader": (
+        "trading_calendar",
+        "last_available_dt",
+        "first_trading_day",
+        "_minute_exclusion_tree",
+    ),
+}
+
+_lock = threading.Lock()
+# loaded bundles by name, only the latest ingestion is kept
+_bundles = {}
+_calendars = {}
+# benchmark returns and sid by bundle, ingestion, benchmark and dates
+_benchmarks = {}
+# data portals not used by a backtest, by bundle and ingestion
+_data_portals = defaultdict(list)
+
+
+def _latest_ingestion(name: str) -> pd.Timestamp:
+    try:
+        ingestions = bundles.ingestions_for_bundle(name, os.environ)
+    except OSError:
+        return None
+    return ingestions[0] if ingestions else None
+
+
+def _load(name: str, ingestion: pd.Timestamp) -> BUNDLE:
+    data = bundles.load(name, os.environ, ingestion)
+    for reader, attributes in _LAZY_READER_ATTRIBUTES.items():
+        for attribute in attributes:
+            getattr(getattr(data, reader), attribute)
+    # pandas builds the lookup table of an index on the first lookup
+    sessions = data.equity_daily_bar_reader.sessions
+    sessions.get_loc(sessions[0])
+    _, _, adjustments = data.adjustment_reader.conn.execute("PRAGMA database_list").fetchone()
+    return BUNDLE(name, ingestion, data, adjustments)
+
+
+def bundle(name: str) -> BUNDLE:
+    """Latest ingestion of a bundle, loaded once per process. The bar readers and asset finder are shared
+    by every backtest on it. Caches of earlier ingestions are dropped once a new one is loaded.
+
+    Args:
+        name (str): Name of the bundle
+
+    Returns:
+        BUNDLE: bundle
+    """
+    ingestion = _latest_ingestion(name)
+    with _lock:
+        cached = _bundles.get(name)
+        if cached is not None and cached.ingestion == ingestion and ingestion is not None:
+            return cached
+    # loading raises when there is no ingestion
+    loaded = _load(name, ingestion)
+    with _lock:
+        cached = _bundles.get(name)
+        if cached is not None and cached.ingestion == ingestion:
+            return cached
+        _evict(name)
+        _bundles[name] = loaded
+    return loaded
+
+
+def _evict(name: str) -> None:
+    _bundles.pop(name, None)
+    for key in [key for key in _benchmarks if key[0] == name]:
+        del _benchmarks[key]
+    for key in [key for key in _data_portals if key[0] == name]:
+        del _data_portals[key]
+
+
+def calendar(name: str):
+    """Trading calendar, created once per process
+
+    Args:
+        name (str): Name of the calendar
+
+    Returns:
+        TradingCalendar: calendar
+    """
+    with _lock:
+        if name not in _calendars:
+            _calendars[name] = get_calendar(name)
+        return _calendars[name]
+
+
+def benchmark(bundle: BUNDLE, symbol: str, start_date: pd.Timestamp, end_date: pd.Timestamp) -> Tuple:
+    """Benchmark returns and sid of a symbol, resolved once per bundle ingestion and dates
+
+    Args:
+        bundle (BUNDLE): Bundle the symbol is looked up in
+        symbol (str): Symbol of the benchmark
+        start_date (pd.Timestamp): First session of the backtest
+        end_date (pd.Timestamp): Last session of the backtest
+
+    Raises:
+        _RunAlgoError: In case the benchmark can not be resolved
+
+    Returns:
+        Tuple: benchmark returns and sid, as BenchmarkSpec.resolve
+    """
+    key = (bundle.name, bundle.ingestion, symbol, start_date, end_date)
+    with _lock:
+        if key in _benchmarks:
+            return _benchmarks[key]
+    benchmark_spec = BenchmarkSpec(None, None, None, benchmark_symbol=symbol, no_benchmark=True)
+    resolved = benchmark_spec.resolve(asset_finder=bundle.data.asset_finder, start_date=start_date, end_date=end_date)
+    with _lock:
+        if _bundles.get(bundle.name) is bundle:
+            _benchmarks[key] = resolved
+    return resolved
+
+
+def acquire_data_portal(bundle: BUNDLE, trading_calendar) -> DataPortal:
+    """Data portal for a single backtest, hand it back with release_data_portal when the backtest is done.
+    Portals keep their history windows from earlier backtests.
+
+    Args:
+        bundle (BUNDLE): Bundle to read from
+        trading_calendar (TradingCalendar): Calendar of the backtest
+
+    Returns:
+        DataPortal: data portal
+    """
+    key = (bundle.name, bundle.ingestion, trading_calendar.name)
+    with _lock:
+        if _data_portals.get(key):
+            return _data_portals[key].pop()
+    # only one backtest uses the portal at a time, but not always from the thread creating it
+    adjustment_reader = SQLiteAdjustmentReader(sqlite3.connect(bundle.adjustments, check_same_thread=False))
+    data_portal = DataPortal(
+        bundle.data.asset_finder,
+        trading_calendar=trading_calendar,
+        first_trading_day=bundle.data.equity_minute_bar_reader.first_trading_day,
+        equity_minute_reader=bundle.data.equity_minute_bar_reader,
+        equity_daily_reader=bundle.data.equity_daily_bar_reader,
+        adjustment_reader=adjustment_reader,
+    )
+    return data_portal
+
+
+def release_data_portal(bundle: BUNDLE, trading_calendar, data_portal: DataPortal) -> None:
+    """Hand back a data portal from acquire_data_portal, to be used by the next backtest
+
+    Args:
+        bundle (BUNDLE): Bundle the portal was acquired for
+        trading_calendar (TradingCalendar): Calendar the portal was acquired for
+        data_portal (DataPortal): data portal
+    """
+    with _lock:
+        # portals of an earlier ingestion are dropped
+        if _bundles.get(bundle.name) is bundle:
+            _data_portals[(bundle.name, bundle.ingestion, trading_calendar.name)].append(data_portal)
+
+
+def clear() -> None:
+    """Drop everything cached"""
+    with _lock:
+        _bundles.clear()
+        _calendars.clear()
+        _benchmarks.clear()
+        _data_portals.clear()
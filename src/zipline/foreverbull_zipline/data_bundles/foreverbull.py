@@ -2,7 +2,7 @@ import warnings
 
 import numpy as np
 import pandas as pd
-from foreverbull_core.models.backtest import Database
+from foreverbull_core.models.backtest import Database, DataFrequency
 from pandas import read_sql_query
 from sqlalchemy import create_engine
 
@@ -32,6 +32,7 @@ class SQLIngester:
     isins = []
     from_date = None
     to_date = None
+    frequency = DataFrequency.DAILY.value
 
     def __init__(self):
         pass
@@ -70,6 +71,37 @@ class SQLIngester:
                 self._df_metadata.iloc[index] = start_date, end_date, autoclose_date, isin, "NASDAQ"
                 yield index, data
 
+    @staticmethod
+    def daily_bars(data: pd.DataFrame, calendar) -> pd.DataFrame:
+        """Aggregates minute bars into one bar per session of the calendar. Sessions of exchanges outside
+        of UTC can span two UTC days, minutes outside of a session are left out.
+
+        Args:
+            data (pd.DataFrame): Minute bars indexed by time, naive times are UTC
+            calendar (ExchangeCalendar): Calendar of the bundle
+
+        Returns:
+            pd.DataFrame: Daily bars indexed by session
+        """
+        minutes = data.index if data.index.tz is not None else data.index.tz_localize("UTC")
+        traded = minutes.isin(calendar.minutes)
+        sessions = calendar.minutes_to_sessions(minutes[traded])
+        daily = (
+            data[traded]
+            .groupby(sessions)
+            .agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+        )
+        daily.dropna(inplace=True)
+        if daily.index.tz is not None:
+            daily.index = daily.index.tz_localize(None)
+        return daily
+
+    def minute_writer(self, show_progress: bool, calendar, daily: list) -> iter(int, pd.DataFrame):
+        # daily bars are still needed for history and the benchmark, collect them while writing minutes
+        for index, data in self.writer(show_progress):
+            daily.append((index, self.daily_bars(data, calendar)))
+            yield index, data
+
     def __call__(
         self,
         environ,
@@ -85,7 +117,12 @@ class SQLIngester:
         output_dir,
     ):
         self._df_metadata = self.create_metadata()
-        daily_bar_writer.write(self.writer(show_progress), show_progress=show_progress)
+        if self.frequency == DataFrequency.MINUTE.value:
+            daily = []
+            minute_bar_writer.write(self.minute_writer(show_progress, calendar, daily), show_progress=show_progress)
+            daily_bar_writer.write(daily, show_progress=show_progress)
+        else:
+            daily_bar_writer.write(self.writer(show_progress), show_progress=show_progress)
         asset_db_writer.write(equities=self._df_metadata)
         adjustment_writer.write()
 
@@ -2,6 +2,10 @@ class BacktestNotRunning(Exception):
     pass
 
 
+class BacktestRunning(Exception):
+    pass
+
+
 class BacktestDayNotFinished(Exception):
     pass
 
@@ -16,3 +20,19 @@ class BrokerError(Exception):
 
 class EndOfDayError(Exception):
     pass
+
+
+class SlowConsumerError(Exception):
+    pass
+
+
+class ReplayError(Exception):
+    pass
+
+
+class SessionNotFound(Exception):
+    pass
+
+
+class EngineNotAvailable(Exception):
+    pass
@@ -1,16 +1,32 @@
+import functools
 import logging
 import threading
 import time
+from collections import deque, namedtuple
+from datetime import datetime
+from queue import Full, Queue
+from typing import Dict, List, Tuple
 
-from foreverbull_core.models.backtest import Period
-from foreverbull_core.models.finance import OHLC, Position
-from foreverbull_core.models.socket import Request, SocketConfig
+import numpy as np
+from foreverbull_core import codec as codecs
+from foreverbull_core.models.backtest import DataFrequency, EngineConfig, FeedMode, Period, PortfolioSnapshot
+from foreverbull_core.models.finance import OHLC, OHLCBatch, Position
+from foreverbull_core.models.socket import Request, SocketConfig, SocketTransport
+from foreverbull_core.socket.envelope import Envelope
 from foreverbull_core.socket.exceptions import SocketClosed
-from foreverbull_core.socket.nanomsg import NanomsgSocket
-from foreverbull_zipline.exceptions import EndOfDayError
+from foreverbull_core.socket.memory import MemorySocket
+from foreverbull_core.socket.nanomsg import NanomsgSocket, pack_frame
+from foreverbull_core.socket.topic import topic
+from foreverbull_zipline.exceptions import EndOfDayError, ReplayError, SlowConsumerError
 
 from zipline.api import get_datetime
 
+LINGER = 0.5
+FIELDS = ["open", "high", "low", "close", "volume"]
+
+# state of the backtest at the end of a period, handed from the simulation to the publisher
+SNAPSHOT = namedtuple("snapshot", "period, positions, isins, columns, time")
+
 
 class Feed:
     def __init__(self, engine, configuration=None):
@@ -19,91 +35,439 @@ class Feed:
         if configuration is None:
             configuration = SocketConfig(socket_type="publisher")
         self.configuration = configuration
-        self.socket = NanomsgSocket(configuration)
+        if configuration.transport == SocketTransport.MEMORY.value:
+            self.socket = MemorySocket(configuration)
+        else:
+            self.socket = NanomsgSocket(configuration)
+        self.codec = codecs.resolve(configuration.codec)
         self.bardata = None
+        self.mode = FeedMode.OHLC
+        self.minute = False
+        # current session and its close, in minute mode the day is completed at the close
+        self._session = None
+        self.symbols = None
         self.day_completed = False
-        self.timeouts = 10
+        # seconds to wait for the next day or a slow consumer before giving up
+        self.timeout = 5.0
         self.lock = threading.Event()
         self.lock.set()
+        self.seq = 0
+        self.acked = -1
+        self.window = 0
+        # sent messages kept for replay, none unless the consumer asks for a buffer with feed_buffer
+        self.buffer = deque(maxlen=0)
+        self._sequence = threading.Condition()
+        # error that failed the backtest, a consumer too slow to keep up
+        self.error = None
+        self._queue = None
+        self._publisher_thread = None
+        # days the engine may complete without waiting for the consumer
+        self.credit = 0
+        self._credit = threading.Lock()
+        self.portfolio = False
+        self.keyframe = 20
+        # amount and cost basis of the positions in the last portfolio snapshot, by isin
+        self._positions = None
+        self._since_keyframe = 0
 
     def info(self) -> None:
         return {"socket": self.configuration.dict()}
 
-    def _send_period(self):
-        period = Period.from_zipline_backtest(self.engine.trading_algorithm.portfolio, get_datetime())
+    def configure(self, config: EngineConfig) -> None:
+        self.mode = FeedMode(config.feed_mode)
+        if self.mode == FeedMode.OHLC_FRAME and isinstance(self.socket, MemorySocket):
+            # no need to pack arrays when the batch is passed by reference
+            self.mode = FeedMode.OHLC_BATCH
+        self.minute = config.data_frequency == DataFrequency.MINUTE.value
+        if self.minute and self.mode == FeedMode.OHLC:
+            # a message per asset and minute can not keep up with the simulation
+            self.mode = FeedMode.OHLC_BATCH
+        self._session = None
+        self.symbols = self.engine.symbols if config.symbol_ids else None
+        with self._credit:
+            self.credit = config.feed_credit
+        self.portfolio = config.feed_portfolio
+        self.keyframe = config.feed_keyframe
+        self._positions = None
+        with self._sequence:
+            self.window = config.feed_window
+            self.buffer = deque(self.buffer, maxlen=config.feed_buffer)
+        # with a queue the engine goes on while the publisher thread sends, but at the end of a day it still
+        # waits for the consumer, who can only continue once the day is sent. Days overlap with sending given
+        # feed_credit, without it only the bars within a minute session do
+        if config.feed_queue and self._publisher_thread is None:
+            self._queue = Queue(maxsize=config.feed_queue)
+            self._publisher_thread = threading.Thread(target=self._publisher, args=(self._queue,), daemon=True)
+            self._publisher_thread.start()
+
+    def release(self) -> None:
+        """Let the engine run to the end without sending or waiting, the socket stays open"""
+        lock = self.lock
+        self.lock = None
+        if lock:
+            lock.set()
+        with self._sequence:
+            # wake up a send waiting for a slow consumer
+            self._sequence.notify_all()
+
+    def rearm(self, engine) -> None:
+        """Prepare the feed for the next backtest on the same socket, after the previous engine is done.
+        Sequence numbers start over so consumers can tell the backtests apart.
+
+        Args:
+            engine: Backtest the feed reads from
+        """
+        if self._queue is not None:
+            # days of the previous backtest are sent before numbering starts over
+            self._queue.join()
+        self.engine = engine
+        self.bardata = None
+        self.symbols = None
+        self.day_completed = False
+        self.error = None
+        self._session = None
+        self._positions = None
+        self._since_keyframe = 0
+        with self._credit:
+            self.credit = 0
+        with self._sequence:
+            self.seq = 0
+            self.acked = -1
+            self.buffer.clear()
+        self.lock = threading.Event()
+        self.lock.set()
+
+    def grant(self, days: int = 1) -> None:
+        """Allow the engine to complete days more, without waiting for the consumer.
+        A waiting engine uses the first day right away.
+
+        Args:
+            days (int, optional): Number of days. Defaults to 1.
+        """
+        with self._credit:
+            if self.lock is not None and not self.lock.is_set():
+                self.lock.set()
+                days -= 1
+            self.credit += days
+
+    def resume(self) -> None:
+        """Allow the engine to complete the next day, as a continue from the consumer.
+        Unlike grant, a continue sent before the engine waits leaves at most one day of credit,
+        so repeated continues do not add up. Credit is granted with grant.
+        """
+        with self._credit:
+            if self.lock is not None and not self.lock.is_set():
+                self.lock.set()
+                return
+            self.credit = max(self.credit, 1)
+
+    def _next_day(self) -> None:
+        with self._credit:
+            if self.lock is None:
+                return
+            if self.credit > 0:
+                self.credit -= 1
+                return
+            self.lock.clear()
+        self.wait_for_new_day()
+
+    def ack(self, seq: int) -> None:
+        """Acknowledge that all messages up to and including seq have been received
+
+        Args:
+            seq (int): Sequence number of the last message received
+        """
+        with self._sequence:
+            if seq > self.acked:
+                self.acked = seq
+                self._sequence.notify_all()
+
+    def replay(self, seq: int) -> int:
+        """Send all buffered messages from seq again, with their original sequence numbers
+
+        Args:
+            seq (int): Sequence number of the first message to send again
+
+        Raises:
+            ReplayError: In case messages from seq are no longer buffered
+
+        Returns:
+            int: Number of messages sent
+        """
+        with self._sequence:
+            if not self.buffer.maxlen:
+                raise ReplayError("replay is disabled, configure feed_buffer to keep messages")
+            if seq >= self.seq:
+                return 0
+            if not self.buffer or self.buffer[0][0] > seq:
+                raise ReplayError(f"message {seq} is no longer buffered")
+            messages = [(data, key) for message_seq, data, key in self.buffer if message_seq >= seq]
+        for data, key in messages:
+            self._send_data(self.socket, data, key)
+        return len(messages)
+
+    def _wait_for_consumer(self) -> None:
+        if not self.window:
+            return
+        if self._sequence.wait_for(lambda: self.lock is None or self.seq - self.acked <= self.window, self.timeout):
+            if self.lock is None:
+                raise SocketClosed("feed stopped")
+            return
+        raise SlowConsumerError(f"consumer is {self.seq - self.acked - 1} messages behind, last ack {self.acked}")
+
+    def _send_data(self, socket, data, key: bytes) -> None:
+        if self.configuration.topics and not isinstance(socket, MemorySocket):
+            # the socket adds the topic after compression, so subscribers can match on it
+            socket.send(data, topic=key)
+            return
+        socket.send(data)
+
+    def _publish(self, encode, key: bytes, wait: bool = True) -> None:
+        with self._sequence:
+            if wait:
+                self._wait_for_consumer()
+            # stop closes the socket while the engine may still be running
+            socket = self.socket
+            if socket is None:
+                raise SocketClosed("feed stopped")
+            seq = self.seq
+            data = encode(seq)
+            self._send_data(socket, data, key)
+            if self.buffer.maxlen:
+                self.buffer.append((seq, data, key))
+            self.seq += 1
+
+    def _send(self, message: Request, wait: bool = True) -> None:
+        if self.symbols is not None and message.data:
+            message.data = self.symbols.encode(message.data)
+
+        def encode(seq: int):
+            message.seq = seq
+            if isinstance(self.socket, MemorySocket):
+                return message
+            if self.configuration.envelope:
+                return Envelope.from_message(message, self.codec).dump()
+            return message.dump(self.codec)
+
+        asset = message.data.get("isin") if message.data else None
+        self._publish(encode, topic(message.task, asset if isinstance(asset, (str, int)) else None), wait)
+
+    def _send_period(self, period: Period):
         req = Request(task="period", data=period.dict())
-        self.socket.send(req.dump())
-
-    def _send_positions(self):
-        positions = self.engine.trading_algorithm.portfolio.positions.items()
-        for _, position in positions:
-            pos = Position(
-                isin=position.sid.symbol, amount=position.amount, cost_basis=position.cost_basis, period=get_datetime()
-            )
-            req = Request(task="position", data=pos.dict())
-            self.socket.send(req.dump())
-
-    def _send_ohlc(self, asset, data):
-        ohlc = OHLC(
-            isin=asset.symbol,
-            open=data.current(asset, "open"),
-            high=data.current(asset, "high"),
-            low=data.current(asset, "low"),
-            close=data.current(asset, "close"),
-            volume=data.current(asset, "volume"),
-            time=get_datetime().to_pydatetime(),
+        self._send(req)
+
+    def _send_positions(self, positions: List[Position]):
+        for position in positions:
+            req = Request(task="position", data=position.dict())
+            self._send(req)
+
+    def _send_portfolio(self, period: Period, positions: List[Position]):
+        current = {position.isin: (position.amount, position.cost_basis) for position in positions}
+        keyframe = self._positions is None or self._since_keyframe + 1 >= self.keyframe
+        if keyframe:
+            snapshot = PortfolioSnapshot(period=period, positions=positions, keyframe=True)
+            self._since_keyframe = 0
+        else:
+            changed = [
+                position for position in positions if self._positions.get(position.isin) != current[position.isin]
+            ]
+            closed = [isin for isin in self._positions if isin not in current]
+            snapshot = PortfolioSnapshot(period=period, positions=changed, closed=closed)
+            self._since_keyframe += 1
+        self._positions = current
+        req = Request(task="portfolio", data=snapshot.dict())
+        self._send(req)
+
+    def _bars(self, assets, data) -> Tuple[List[str], Dict[str, np.ndarray], datetime]:
+        """Reads all fields of all assets from zipline in a single call
+
+        Args:
+            assets: Assets to read
+            data: zipline BarData of the current period
+
+        Returns:
+            Tuple[List[str], Dict[str, np.ndarray], datetime]: isins, one column per field in the order of assets
+            and the period
+        """
+        period = get_datetime()
+        if self.minute:
+            # BarData wraps every read in pandas objects, which is most of the time spent per minute
+            portal = self.engine.data_portal
+            bars = {field: portal.get_spot_value(assets, field, period, "minute") for field in FIELDS}
+        else:
+            bars = data.current(assets, FIELDS)
+        columns = {field: np.asarray(bars[field], dtype=np.float64) for field in FIELDS}
+        # assets without a bar have no volume, casting nan would give the smallest int64
+        columns["volume"] = np.nan_to_num(columns["volume"], nan=0.0).astype(np.int64)
+        return [asset.symbol for asset in assets], columns, period.to_pydatetime()
+
+    def _send_ohlc(self, isins: List[str], columns: Dict[str, np.ndarray], period: datetime):
+        rows = zip(*[columns[field].tolist() for field in FIELDS])
+        for isin, row in zip(isins, rows):
+            ohlc = OHLC(isin=isin, time=period, **dict(zip(FIELDS, row)))
+            req = Request(task="ohlc", data=ohlc.dict())
+            self._send(req)
+
+    def _send_ohlc_batch(self, isins: List[str], columns: Dict[str, np.ndarray], period: datetime):
+        batch = {field: column.tolist() for field, column in columns.items()}
+        batch = OHLCBatch.from_trusted(dict(batch, isin=isins, time=period))
+        req = Request(task="ohlc_batch", data=batch.dict())
+        self._send(req)
+
+    def _send_ohlc_frame(self, isins: List[str], columns: Dict[str, np.ndarray], period: datetime):
+        if self.symbols is not None:
+            isin = np.array([self.symbols.id(isin) for isin in isins], dtype=np.int32)
+        else:
+            isin = np.array(isins, dtype=str)
+        arrays = dict(isin=isin, **columns)
+        timestamp = codecs.to_epoch(period)
+        self._publish(
+            lambda seq: pack_frame(arrays, {"task": "ohlc_batch", "time": timestamp, "seq": seq}), topic("ohlc_batch")
         )
-        req = Request(task="ohlc", data=ohlc.dict())
-        self.socket.send(req.dump())
+
+    def _end_of_day(self, data) -> bool:
+        if not self.minute:
+            return True
+        session = data.current_session
+        if self._session is None or self._session[0] != session:
+            self._session = (session, self.engine.trading_algorithm.trading_calendar.session_close(session))
+        return get_datetime() >= self._session[1]
+
+    def _snapshot(self, context, data) -> SNAPSHOT:
+        # everything read from zipline, the engine moves on once the snapshot is handed off
+        if not self._end_of_day(data):
+            return SNAPSHOT(None, None, *self._bars(context.assets, data))
+        portfolio = self.engine.trading_algorithm.portfolio
+        period = get_datetime()
+        positions = [
+            Position(isin=position.sid.symbol, amount=position.amount, cost_basis=position.cost_basis, period=period)
+            for position in portfolio.positions.values()
+        ]
+        return SNAPSHOT(Period.from_zipline_backtest(portfolio, period), positions, *self._bars(context.assets, data))
+
+    def _send_day(self, snapshot: SNAPSHOT) -> bool:
+        # within a minute session only the bars are sent, the rest once the day is completed
+        day_completed = snapshot.period is not None
+        try:
+            if day_completed and self.portfolio:
+                self._send_portfolio(snapshot.period, snapshot.positions)
+            elif day_completed:
+                self._send_period(snapshot.period)
+                self._send_positions(snapshot.positions)
+            if self.mode == FeedMode.OHLC_BATCH:
+                self._send_ohlc_batch(snapshot.isins, snapshot.columns, snapshot.time)
+            elif self.mode == FeedMode.OHLC_FRAME:
+                self._send_ohlc_frame(snapshot.isins, snapshot.columns, snapshot.time)
+            else:
+                self._send_ohlc(snapshot.isins, snapshot.columns, snapshot.time)
+            if day_completed:
+                self._send(Request(task="day_completed"))
+        except SocketClosed as exc:
+            self.logger.error(exc, exc_info=True)
+            # the engine only waits for the consumer at the end of a day
+            return not day_completed
+        except SlowConsumerError as exc:
+            # the rest of the day is lost, the backtest can not go on
+            self.error = exc
+            raise
+        return True
+
+    def _publisher(self, queue: Queue) -> None:
+        while True:
+            send = queue.get()
+            if send is None:
+                queue.task_done()
+                return
+            try:
+                sent = send()
+            except Exception as exc:
+                self.logger.error(exc, exc_info=True)
+                sent = False
+            if sent is False:
+                # nothing to wait for when the day could not be sent
+                self.resume()
+            queue.task_done()
 
     def handle_data(self, context, data) -> None:
         if self.lock is None:
             return
         self.logger.debug("running day {}".format(str(get_datetime())))
-        self.day_completed = False
-        self.lock.clear()
         self.bardata = data
-        self._send_period()
-        self._send_positions()
-        for asset in context.assets:
-            try:
-                self._send_ohlc(asset, data)
-            except SocketClosed as exc:
-                self.logger.error(exc, exc_info=True)
-                return
-        message = Request(task="day_completed")
-        try:
-            self.socket.send(message.dump())
-        except SocketClosed as exc:
-            self.logger.error(exc, exc_info=True)
+        self.publish(self._snapshot(context, data))
+
+    def publish(self, snapshot: SNAPSHOT) -> None:
+        """Sends a snapshot of the engine and, at the end of a day, waits until the engine may go on.
+        Called by handle_data, or for every snapshot of an engine running in another process.
+
+        Args:
+            snapshot (SNAPSHOT): snapshot
+
+        Raises:
+            SlowConsumerError: In case the consumer fell behind and a day could not be sent in full
+        """
+        if self.lock is None:
             return
-        self.wait_for_new_day()
+        if self.error is not None:
+            # a day sent by the publisher thread failed
+            raise self.error
+        self.day_completed = False
+        if self._queue is not None:
+            self._queue.put(functools.partial(self._send_day, snapshot))
+        elif not self._send_day(snapshot):
+            return
+        if snapshot.period is None:
+            return
+        self._next_day()
+        if self.error is not None:
+            raise self.error
         self.day_completed = True
 
     def backtest_completed(self) -> None:
         message = Request(task="backtest_completed")
-        self.socket.send(message.dump())
+        if self._queue is not None:
+            self._queue.put(functools.partial(self._send, message))
+            return
+        try:
+            self._send(message)
+        except SocketClosed:
+            # stop has sent backtest_completed already
+            self.logger.debug("feed stopped before the backtest completed")
 
     def wait_for_new_day(self) -> None:
-        for _ in range(self.timeouts):
-            try:
-                if self.lock.wait(0.5):
-                    break
-            except AttributeError:
-                return
-        else:
+        lock = self.lock
+        if lock is None:
+            return
+        # stop sets the lock, so we wake up right away when stopped
+        if not lock.wait(self.timeout):
             raise EndOfDayError("timeout when waiting for new day")
 
+    def _linger(self, seq: int) -> None:
+        # a publisher drops queued messages on close, give subscribers time to receive the last ones
+        if isinstance(self.socket, MemorySocket):
+            return
+        if self.window:
+            with self._sequence:
+                self._sequence.wait_for(lambda: self.acked >= seq, LINGER)
+            return
+        time.sleep(LINGER)
+
     def stop(self) -> None:
-        if self.lock:
-            self.lock.set()
-        self.lock = None
+        self.release()
+        if self._publisher_thread is not None:
+            # queued days are sent before backtest_completed
+            try:
+                self._queue.put(None, timeout=self.timeout)
+            except Full:
+                self.logger.error("publisher did not empty its queue")
+            self._publisher_thread.join(self.timeout)
+            self._queue = None
+            self._publisher_thread = None
         if self.socket is None:
             return
         message = Request(task="backtest_completed")
         try:
-            self.socket.send(message.dump())
-            time.sleep(0.5)
+            self._send(message, wait=False)
+            self._linger(self.seq - 1)
             self.socket.close()
             self.socket = None
         except SocketClosed as exc:
@@ -0,0 +1,255 @@
+import logging
+import multiprocessing
+import signal
+import threading
+from collections import deque
+from typing import Callable, List
+
+from foreverbull_core.models.socket import SocketConfig
+
+# imported once by the fork server, engine processes forked from it start with them loaded
+PRELOAD = ["foreverbull_zipline.app"]
+READY = "ready"
+
+
+def _engine(conn, bundles: List[str]) -> None:
+    # runs in the engine process, warms up and waits to be handed work
+    from foreverbull_zipline import cache
+
+    logger = logging.getLogger(__name__)
+    for name in bundles:
+        try:
+            cache.bundle(name)
+        except Exception as exc:
+            logger.warning(f"could not preload bundle {name}: {repr(exc)}")
+    conn.send(READY)
+    try:
+        target, args = conn.recv()
+    except (EOFError, KeyboardInterrupt):
+        return
+    finally:
+        conn.close()
+    target(*args)
+
+
+def serve_application(socket_config: SocketConfig, transport: str = "tcp") -> None:
+    """Runs an application until it is stopped by a stop request or SIGTERM, target for Engine.run
+
+    Args:
+        socket_config (SocketConfig): Configuration of the main socket
+        transport (str, optional): Transport of the feed and broker sockets. Defaults to "tcp".
+    """
+    from foreverbull_zipline.app import Application
+
+    application = Application(socket_config, transport=transport)
+    signal.signal(signal.SIGTERM, lambda *_: application.stop())
+    application.start()
+    application.join()
+
+
+class Engine:
+    def __init__(self, context, bundles: List[str]):
+        """Engine process forked with zipline imported, waiting to be handed work
+
+        Args:
+            context: multiprocessing context to create the process with
+            bundles (List[str]): Bundles loaded by the process before it is ready
+        """
+        self._conn, child = context.Pipe()
+        self.process = context.Process(target=_engine, args=(child, bundles), name="foreverbull-engine")
+        self.process.start()
+        child.close()
+
+    def ready(self, timeout: float = None) -> bool:
+        """Waits until the process is warmed up
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None, no timeout.
+
+        Returns:
+            bool: True in case the process is ready for work
+        """
+        try:
+            return self._conn.poll(timeout) and self._conn.recv() == READY
+        except EOFError:
+            return False
+
+    def run(self, target: Callable, *args) -> None:
+        """Hand work to the process, it runs target and exits
+
+        Args:
+            target (Callable): Function to run, passed by name so it must be importable
+            args: Arguments to the function
+        """
+        self._conn.send((target, args))
+        self._conn.close()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Terminates the process, it is killed in case it does not exit in time
+
+        Args:
+            timeout (float, optional): Seconds to wait for the process to exit. Defaults to 5.0.
+        """
+        self.process.terminate()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class EnginePool:
+    def __init__(
+        self,
+        size: int = 1,
+        bundles: List[str] = None,
+        method: str = "forkserver",
+        backoff: float = 1.0,
+        max_failures: int = 5,
+    ):
+        """Keeps a number of engine processes warm. Processes are forked from a server that has imported
+        zipline once, so a new process is ready in the time it takes to load the bundles.
+
+        Args:
+            size (int, optional): Number of idle processes to keep. Defaults to 1.
+            bundles (List[str], optional): Bundles to load in idle processes. Defaults to None.
+            method (str, optional): multiprocessing start method, fork server unless the platform lacks it.
+            Defaults to "forkserver".
+            backoff (float, optional): Seconds to wait before starting a process again after one exited before
+            it was ready, doubled on every failure in a row. Defaults to 1.0.
+            max_failures (int, optional): Failures in a row after which the pool gives up. Defaults to 5.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.size = size
+        self.bundles = bundles or []
+        self.backoff = backoff
+        self.max_failures = max_failures
+        self._context = multiprocessing.get_context(method)
+        if method == "forkserver":
+            self._context.set_forkserver_preload(PRELOAD)
+        self._idle = deque()
+        self._condition = threading.Condition()
+        self._stopped = False
+        # set when engine processes keep exiting before they are ready
+        self._failed = False
+        self._filler = None
+
+    def start(self) -> None:
+        """Starts filling the pool in the background"""
+        self._filler = threading.Thread(target=self._fill, daemon=True)
+        self._filler.start()
+
+    def _fill(self) -> None:
+        failures = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._stopped or len(self._idle) < self.size)
+                if self._stopped:
+                    return
+            engine = Engine(self._context, self.bundles)
+            if not engine.ready():
+                self.logger.error(f"engine process {engine.process.pid} exited before it was ready")
+                engine.stop()
+                failures += 1
+                with self._condition:
+                    if failures >= self.max_failures:
+                        self.logger.error(f"giving up after {failures} engine processes failed to start")
+                        self._failed = True
+                        self._condition.notify_all()
+                        return
+                    # stop wakes us up right away
+                    if self._condition.wait_for(lambda: self._stopped, self.backoff * 2 ** (failures - 1)):
+                        return
+                continue
+            failures = 0
+            with self._condition:
+                if self._stopped:
+                    engine.stop()
+                    return
+                self._idle.append(engine)
+                self._condition.notify_all()
+
+    @property
+    def idle(self) -> int:
+        with self._condition:
+            return len(self._idle)
+
+    def acquire(self, timeout: float = None) -> Engine:
+        """Takes a warm engine out of the pool, the pool starts a new one in its place
+
+        Args:
+            timeout (float, optional): Seconds to wait for an engine. Defaults to None, no timeout.
+
+        Raises:
+            TimeoutError: In case no engine was ready in time
+            RuntimeError: In case the pool is stopped, or gave up as engine processes failed to start
+
+        Returns:
+            Engine: engine
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._stopped or self._failed or self._idle, timeout):
+                raise TimeoutError("no engine ready")
+            if self._stopped:
+                raise RuntimeError("pool is stopped")
+            if not self._idle:
+                raise RuntimeError("engine processes failed to start")
+            engine = self._idle.popleft()
+            self._condition.notify_all()
+        return engine
+
+    def stop(self) -> None:
+        """Stops the idle engines, engines acquired are stopped by their owner"""
+        with self._condition:
+            self._stopped = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._condition.notify_all()
+        for engine in idle:
+            engine.stop()
+        if self._filler is not None:
+            self._filler.join()
+
+
+class Supervisor(threading.Thread):
+    def __init__(self, pool: EnginePool, socket_config: SocketConfig, transport: str = "tcp"):
+        """Serves the main socket from a warm engine of the pool. When the application of an engine is
+        stopped the next engine takes over the socket right away.
+
+        Args:
+            pool (EnginePool): Pool to take engines from
+            socket_config (SocketConfig): Configuration of the main socket
+            transport (str, optional): Transport of the feed and broker sockets. Defaults to "tcp".
+        """
+        self.logger = logging.getLogger(__name__)
+        self.pool = pool
+        self.socket_config = socket_config
+        self.transport = transport
+        self.engine = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        threading.Thread.__init__(self)
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                engine = self.pool.acquire()
+            except RuntimeError:
+                return
+            with self._lock:
+                if self._stopped.is_set():
+                    engine.stop()
+                    return
+                self.engine = engine
+            self.logger.info(f"serving from engine process {engine.process.pid}")
+            engine.run(serve_application, self.socket_config, self.transport)
+            engine.process.join()
+            with self._lock:
+                self.engine = None
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped.set()
+            engine = self.engine
+        self.pool.stop()
+        if engine is not None:
+            engine.stop()
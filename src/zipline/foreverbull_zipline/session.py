@@ -0,0 +1,171 @@
+import logging
+import threading
+from datetime import datetime, timezone
+
+from foreverbull_core.models.backtest import EngineConfig, FeedCredit, FeedSequence, IngestConfig, Period, Result
+from foreverbull_core.models.socket import SocketConfig, SocketTransport
+from foreverbull_core.socket.router import MessageRouter
+from foreverbull_zipline.backtest import Backtest
+from foreverbull_zipline.broker import Broker
+from foreverbull_zipline.exceptions import BacktestNotRunning, BacktestRunning, ConfigError, EngineNotAvailable
+from foreverbull_zipline.feed import Feed
+from foreverbull_zipline.pool import EnginePool
+from foreverbull_zipline.simulation import Simulation, SimulationBroker
+
+# seconds to wait for an engine process of the pool, requests for a new session are answered with an error after
+ACQUIRE_TIMEOUT = 30.0
+
+
+class Session:
+    def __init__(self, id: str, transport: str = "tcp", pool: EnginePool = None):
+        """Backtest together with its own feed and broker sockets, an application hosts one or more of them
+
+        Args:
+            id (str): Id of the session, requests carrying it are routed here
+            transport (str, optional): Transport of the feed and broker sockets. Defaults to "tcp".
+            pool (EnginePool, optional): Pool to take an engine process from, the simulation runs there while
+            the feed and broker sockets are served here. Defaults to None, the simulation runs in this process.
+
+        Raises:
+            ConfigError: In case of an engine process with memory transport, which routes broker requests
+            in this process
+            EngineNotAvailable: In case the pool has no engine process ready in time
+        """
+        self.logger = logging.getLogger(__name__)
+        self.id = id
+        self.running = True
+        self.router = MessageRouter()
+        self.router.add_route(self._ingest, "ingest", IngestConfig, serialize="backtest")
+        self.router.add_route(self._configure, "configure", EngineConfig, serialize="backtest")
+        self.router.add_route(self._run, "run", serialize="backtest")
+        self.router.add_route(self._continue, "continue")
+        self.router.add_route(self._credit, "credit", FeedCredit)
+        self.router.add_route(self._ack, "ack", FeedSequence)
+        self.router.add_route(self._replay, "replay", FeedSequence)
+        self.router.add_route(self.status, "status")
+        self.router.add_route(self._result, "result")
+        self.router.add_route(self._reset, "reset", serialize="backtest")
+        self._stop_lock = threading.Lock()
+        broker = Broker
+        if pool is None:
+            self.backtest = Backtest()
+        elif transport == SocketTransport.MEMORY.value:
+            raise ConfigError("engine processes can not be used with memory transport")
+        else:
+            try:
+                engine = pool.acquire(ACQUIRE_TIMEOUT)
+            except (TimeoutError, RuntimeError) as exc:
+                raise EngineNotAvailable(repr(exc))
+            self.backtest = Simulation(engine)
+            broker = SimulationBroker
+        self.feed: Feed = Feed(self.backtest, SocketConfig(socket_type="publisher", transport=transport))
+        self.stock_broker: Broker = broker(
+            self.backtest, self.feed, SocketConfig(socket_type="replier", recv_timeout=200000, transport=transport)
+        )
+
+    def _ingest(self, config: IngestConfig):
+        self.backtest.ingest(config)
+
+    def _configure(self, config: EngineConfig):
+        self.backtest.configure(config)
+        self.feed.configure(config)
+        return self.backtest.symbols
+
+    def _run(self):
+        self.logger.info(f"running backtest of session {self.id}")
+        if isinstance(self.backtest, Simulation):
+            self.backtest.set_callbacks(self.feed.publish, self.feed.backtest_completed)
+        else:
+            self.backtest.set_callbacks(self.feed.handle_data, self.feed.backtest_completed)
+        if self.stock_broker.ident is None:
+            # started once, the broker keeps serving on its socket from one backtest to the next
+            self.stock_broker.start()
+        self.backtest.start()
+        return {"status": "ok"}
+
+    def _continue(self) -> None:
+        if not self.running:
+            raise BacktestNotRunning("backtest is not running")
+        self.feed.resume()
+
+    def _credit(self, credit: FeedCredit) -> None:
+        if not self.running:
+            raise BacktestNotRunning("backtest is not running")
+        self.feed.grant(credit.days)
+
+    def _ack(self, sequence: FeedSequence) -> None:
+        self.feed.ack(sequence.seq)
+
+    def _replay(self, sequence: FeedSequence) -> dict:
+        return {"replayed": self.feed.replay(sequence.seq)}
+
+    def _reset(self) -> None:
+        """Rearm the session for the next configure and run, keeping the feed and broker sockets.
+        A backtest still running is released by the feed and runs to its end without waiting.
+
+        Raises:
+            BacktestNotRunning: In case the session is stopped
+            BacktestRunning: In case the backtest did not end in time
+        """
+        with self._stop_lock:
+            if not self.running:
+                raise BacktestNotRunning("session is stopped")
+            if self.backtest.is_alive():
+                self.feed.release()
+                self.backtest.join(self.feed.timeout)
+                if self.backtest.is_alive():
+                    raise BacktestRunning("backtest did not end after being released")
+            if isinstance(self.backtest, Simulation):
+                # the engine process is kept, only the backtest in it is new
+                self.backtest.reset()
+            else:
+                self.backtest.close()
+                self.backtest = Backtest()
+            self.feed.rearm(self.backtest)
+            self.stock_broker.backtest = self.backtest
+        self.logger.info(f"session {self.id} reset")
+
+    def info(self) -> dict:
+        return {
+            "id": self.id,
+            "feed": {"socket": self.feed.configuration.dict()},
+            "broker": {"socket": self.stock_broker.configuration.dict()},
+            "running": self.running,
+        }
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "configured": self.backtest.configured,
+            "day_completed": self.feed.day_completed,
+            "credit": self.feed.credit,
+            "error": repr(self.feed.error) if self.feed.error else None,
+        }
+
+    def stop(self) -> None:
+        with self._stop_lock:
+            if not self.running:
+                return
+            self.running = False
+            backtest = self.backtest
+            if self.backtest and self.backtest.is_alive():
+                self.backtest.stop()
+                self.backtest = None
+            if self.stock_broker and self.stock_broker.is_alive():
+                self.stock_broker.stop()
+                self.stock_broker.join()
+                self.stock_broker = None
+            self.feed.stop()
+            if isinstance(backtest, Simulation):
+                backtest.close()
+            elif not backtest.is_alive():
+                # a running backtest hands back its data portal when it ends
+                backtest.close()
+
+    def _result(self) -> Result:
+        result = Result(periods=[])
+        for period in self.backtest.result:
+            period["period"] = datetime.fromtimestamp(period["period_open"] / 1000, tz=timezone.utc)
+            period_result = Period(**period)
+            result.periods.append(period_result)
+        return result
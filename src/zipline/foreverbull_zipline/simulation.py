@@ -0,0 +1,254 @@
+import logging
+import multiprocessing
+import threading
+import time
+from typing import Callable
+
+from foreverbull_core.models.backtest import EngineConfig, IngestConfig
+from foreverbull_core.models.socket import SocketConfig
+from foreverbull_zipline.backtest import Backtest
+from foreverbull_zipline.broker import Broker
+from foreverbull_zipline.feed import SNAPSHOT, Feed
+from foreverbull_zipline.pool import Engine
+
+DAY = "day"
+COMPLETED = "completed"
+# seconds a join holds the channel, so broker requests are served in between
+JOIN_INTERVAL = 0.1
+
+
+class SimulationError(Exception):
+    pass
+
+
+class SimulationServer:
+    def __init__(self, days):
+        """Runs in the engine process, holds the backtest and serves calls from Simulation. Snapshots of
+        the feed go to the application over days, which answers at the end of every day.
+
+        Args:
+            days (Connection): Channel of snapshots to the application
+        """
+        self.days = days
+        self._days_lock = threading.Lock()
+        self.backtest = None
+        self.feed = None
+        self.broker = None
+        self.reset()
+
+    def reset(self) -> None:
+        if self.backtest is not None:
+            self.backtest.close()
+        self.backtest = Backtest()
+        # only the engine side of the feed and the router of the broker are used, sockets stay in the application
+        self.feed = Feed(self.backtest, SocketConfig(socket_type="publisher", transport="memory"))
+        self.broker = Broker(self.backtest, self.feed, SocketConfig(socket_type="replier", transport="memory"))
+        self.backtest.set_callbacks(self._handle_data, self._backtest_completed)
+
+    def _send(self, kind: str, snapshot: SNAPSHOT = None) -> None:
+        with self._days_lock:
+            # sent as a tuple, the snapshot type is not importable by its name
+            self.days.send((kind, tuple(snapshot) if snapshot else None))
+
+    def _handle_data(self, context, data) -> None:
+        self.feed.bardata = data
+        snapshot = self.feed._snapshot(context, data)
+        self._send(DAY, snapshot)
+        if snapshot.period is None:
+            return
+        error = self.days.recv()
+        if error is not None:
+            raise error
+
+    def _backtest_completed(self) -> None:
+        self._send(COMPLETED)
+
+    def ingest(self, config: IngestConfig) -> None:
+        self.backtest.ingest(config)
+
+    def configure(self, config: EngineConfig):
+        self.backtest.configure(config)
+        self.feed.configure(config)
+        return self.backtest.symbols
+
+    def configured(self) -> bool:
+        return self.backtest.configured
+
+    def run(self) -> None:
+        self.backtest.start()
+
+    def is_alive(self) -> bool:
+        return self.backtest.is_alive()
+
+    def join(self, timeout: float = None) -> None:
+        self.backtest.join(timeout)
+
+    def result(self) -> list:
+        return self.backtest.result
+
+    def handle(self, req_data: bytes) -> bytes:
+        return self.broker.handle(req_data)
+
+
+def simulate(calls, days) -> None:
+    """Target of the engine process, serves calls until the application closes the channel
+
+    Args:
+        calls (Connection): Channel of calls from the application, every call is answered
+        days (Connection): Channel of snapshots to the application
+    """
+    logger = logging.getLogger(__name__)
+    server = SimulationServer(days)
+    while True:
+        try:
+            call, args = calls.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            calls.send((True, getattr(server, call)(*args)))
+        except Exception as exc:
+            logger.error(exc, exc_info=True)
+            # exceptions may hold objects that can not be pickled
+            calls.send((False, SimulationError(repr(exc))))
+
+
+class Simulation:
+    def __init__(self, engine: Engine):
+        """Backtest running in an engine process, so the simulation does not compete with the control plane,
+        feed and broker sockets of the application for the interpreter lock. Used by a session in place
+        of a Backtest, the feed publishes snapshots sent by the engine process.
+
+        Args:
+            engine (Engine): Warm engine process from the pool, owned by the simulation until closed
+        """
+        self.logger = logging.getLogger(__name__)
+        self.engine = engine
+        self.symbols = None
+        self._calls, calls = multiprocessing.Pipe()
+        self._days, days = multiprocessing.Pipe()
+        engine.run(simulate, calls, days)
+        calls.close()
+        days.close()
+        self._lock = threading.Lock()
+        self._publish = None
+        self._backtest_completed = None
+        self._relay = threading.Thread(target=self._relay_days, daemon=True)
+        self._relay.start()
+
+    def _call(self, call: str, *args):
+        with self._lock:
+            try:
+                self._calls.send((call, args))
+                # the pipe is not closed by a process dying before it took its end, that end is held by the
+                # resource sharer of this process until then
+                while not self._calls.poll(JOIN_INTERVAL):
+                    if not self.engine.process.is_alive():
+                        raise EOFError()
+                ok, value = self._calls.recv()
+            except (EOFError, OSError):
+                raise SimulationError(f"engine process {self.engine.process.pid} exited")
+        if not ok:
+            raise value
+        return value
+
+    def _relay_days(self) -> None:
+        while True:
+            try:
+                kind, fields = self._days.recv()
+            except (EOFError, OSError):
+                # the engine process has exited
+                self._days.close()
+                return
+            if kind == COMPLETED:
+                if self._backtest_completed:
+                    self._backtest_completed()
+                continue
+            snapshot = SNAPSHOT(*fields)
+            error = None
+            try:
+                self._publish(snapshot)
+            except Exception as exc:
+                self.logger.error(exc, exc_info=True)
+                error = SimulationError(repr(exc))
+            if snapshot.period is None:
+                continue
+            try:
+                # the engine waits for the end of the day to be published
+                self._days.send(error)
+            except OSError:
+                self._days.close()
+                return
+
+    def set_callbacks(self, publish: Callable, backtest_completed: Callable) -> None:
+        self._publish = publish
+        self._backtest_completed = backtest_completed
+
+    def ingest(self, config: IngestConfig) -> None:
+        self._call("ingest", config)
+
+    def configure(self, config: EngineConfig) -> None:
+        self.symbols = self._call("configure", config)
+
+    @property
+    def configured(self) -> bool:
+        return self._call("configured")
+
+    def start(self) -> None:
+        self._call("run")
+
+    def is_alive(self) -> bool:
+        if not self.engine.process.is_alive():
+            return False
+        try:
+            return self._call("is_alive")
+        except SimulationError:
+            # the process exited since
+            return False
+
+    def join(self, timeout: float = None) -> None:
+        # joined a bit at a time, a call holds the channel until it returns
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.is_alive():
+            interval = JOIN_INTERVAL if deadline is None else min(JOIN_INTERVAL, deadline - time.monotonic())
+            if interval <= 0:
+                return
+            try:
+                self._call("join", interval)
+            except SimulationError:
+                return
+
+    @property
+    def result(self) -> list:
+        return self._call("result")
+
+    def handle(self, req_data: bytes) -> bytes:
+        return self._call("handle", req_data)
+
+    def reset(self) -> None:
+        self.symbols = None
+        self._call("reset")
+
+    def stop(self) -> None:
+        # as Backtest, the simulation ends with its process on close
+        return None
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Ends the engine process once a simulation still running is done, it is terminated in case it
+        does not exit in time
+
+        Args:
+            timeout (float, optional): Seconds to wait for the process to exit. Defaults to 5.0.
+        """
+        with self._lock:
+            self._calls.close()
+        self.engine.process.join(timeout)
+        if self.engine.process.is_alive():
+            self.engine.stop()
+        self._relay.join(timeout)
+
+
+class SimulationBroker(Broker):
+    """Broker serving the socket in the application, requests are routed in the engine process"""
+
+    def handle(self, req_data: bytes) -> bytes:
+        return self.backtest.handle(req_data)
@@ -2,14 +2,17 @@ import os
 import time
 from threading import Event
 
+import numpy as np
+import pandas as pd
+import pynng
 import pytest
-from foreverbull_core.models.backtest import Database, EngineConfig, IngestConfig
+from foreverbull_core.models.backtest import Database, EngineConfig, IngestConfig, Period
 from foreverbull_core.models.finance import Instrument, Order
 from foreverbull_core.models.socket import SocketConfig
 from foreverbull_zipline.app import Application
 from foreverbull_zipline.backtest import Backtest
 from foreverbull_zipline.broker import Broker
-from foreverbull_zipline.feed import Feed
+from foreverbull_zipline.feed import FIELDS, SNAPSHOT, Feed
 from tests.factories import populate_sql
 
 from zipline.data import bundles
@@ -20,11 +23,7 @@ def application():
     socket_config = SocketConfig(host="127.0.0.1", port=6565)
     application = Application(socket_config)
     application.start()
-    for _ in range(10):
-        if application.running:
-            break
-        time.sleep(0.1)
-    else:
+    if not application.started.wait(1):
         raise Exception("Application not running")
     yield application
     application.stop()
@@ -76,6 +75,78 @@ def configured_backtest(backtest, foreverbull_bundle, engine_config):
 def feed(backtest):
     feed = Feed(backtest)
     yield feed
+    feed.stop()
+
+
+def wait_for_subscriber(feed: Feed, subscriber: pynng.Sub0, key: bytes, timeout: float = 5.0) -> None:
+    """Waits until a subscriber receives from the feed, it drops anything published while it is still connecting.
+    Probes are sent on the socket, so they are not numbered or buffered by the feed.
+
+    Args:
+        feed (Feed): Feed the subscriber dialed
+        subscriber (pynng.Sub0): Subscriber, recv_timeout is changed
+        key (bytes): Topic the subscriber subscribed to
+        timeout (float, optional): Seconds to wait for the subscriber. Defaults to 5.0.
+    """
+    subscriber.recv_timeout = 50
+    deadline = time.monotonic() + timeout
+    while True:
+        feed.socket.send(b"ready", topic=key or None)
+        try:
+            subscriber.recv()
+            break
+        except pynng.exceptions.Timeout:
+            if time.monotonic() > deadline:
+                raise
+    # drop probes sent before the first one arrived
+    while True:
+        try:
+            subscriber.recv()
+        except pynng.exceptions.Timeout:
+            return
+
+
+@pytest.fixture()
+def subscriber():
+    subscribers = []
+
+    def setup(feed: Feed, key: bytes = b"") -> pynng.Sub0:
+        subscriber = pynng.Sub0(dial=feed.socket.url())
+        subscriber.subscribe(key)
+        subscribers.append(subscriber)
+        wait_for_subscriber(feed, subscriber, key)
+        subscriber.recv_timeout = 5000
+        return subscriber
+
+    yield setup
+    for subscriber in subscribers:
+        subscriber.close()
+
+
+@pytest.fixture()
+def timestamp(mocker):
+    timestamp = pd.Timestamp("2020-01-07", tz="utc")
+    mocker.patch("foreverbull_zipline.feed.get_datetime", return_value=timestamp)
+    return timestamp
+
+
+@pytest.fixture()
+def assets(mocker):
+    return [mocker.Mock(symbol="US0378331005"), mocker.Mock(symbol="US88160R1014")]
+
+
+@pytest.fixture()
+def bar_data(mocker, assets):
+    data = mocker.Mock()
+    data.current.return_value = pd.DataFrame(10.0, index=range(len(assets)), columns=FIELDS)
+    return data
+
+
+@pytest.fixture()
+def snapshot(timestamp):
+    columns = {field: np.array([10.0]) for field in FIELDS}
+    columns["volume"] = np.array([100])
+    return SNAPSHOT(Period(period=timestamp), [], ["US0378331005"], columns, timestamp.to_pydatetime())
 
 
 @pytest.fixture()
@@ -1,26 +1,32 @@
+import threading
 import time
 
-from foreverbull_core.models.socket import SocketConfig
+import pynng
+from foreverbull_core.models.backtest import IngestConfig
+from foreverbull_core.models.socket import Request, Response, SocketConfig
+from foreverbull_core.socket import compression
+from foreverbull_core.socket.envelope import Envelope
 from foreverbull_zipline.app import Application
 from foreverbull_zipline.backtest import Backtest
+from foreverbull_zipline.session import Session
 
 
 def test_start_stop():
     socket_config = SocketConfig(host="127.0.0.1", port=6565)
     application = Application(socket_config)
     application.start()
-    for _ in range(10):
-        if application.running:
-            break
-        time.sleep(0.1)
-    else:
+    if not application.started.wait(1):
         raise Exception("Application not running")
+    started = time.monotonic()
     application.stop()
-    application.join()
+    application.join(1)
+    assert not application.is_alive()
+    # waiting contexts are closed instead of running into the receive timeout
+    assert time.monotonic() - started < application.socket_config.recv_timeout / 1000
 
 
 def test_route_backtest_status(application: Application):
-    status = application._status()
+    status = application.session().status()
     assert status["running"]
 
 
@@ -31,14 +37,15 @@ def test_application_test_info_status(application: Application):
     assert "broker" in application.info() and "socket" in application.info()["broker"]
     assert "running" in application.info() and application.info()["running"] is True
 
-    assert application._status()["configured"] is False
-    assert application._status()["day_completed"] is False
+    assert application.session().status()["configured"] is False
+    assert application.session().status()["day_completed"] is False
+    assert application.session().status()["error"] is None
 
 
 def test_configured(application, engine_config):
-    assert application._status()["configured"] is False
+    assert application.session().status()["configured"] is False
     application.backtest.configure(engine_config)
-    assert application._status()["configured"] is True
+    assert application.session().status()["configured"] is True
 
 
 def test_run_once(application: Application, engine_config, mocker):
@@ -55,3 +62,196 @@ def test_run_early_stop(application: Application, engine_config):
     application._run()
     time.sleep(0.5)
     application.stop()
+
+
+def test_concurrent_requests(application: Application, mocker):
+    ingesting = threading.Event()
+    mocker.patch.object(application.backtest, "ingest", side_effect=lambda _: ingesting.wait(5))
+    socket = pynng.Req0(dial=f"tcp://{application.socket_config.host}:{application.socket_config.port}")
+    socket.recv_timeout = 5000
+
+    ingest_context = socket.new_context()
+    ingest = IngestConfig(name="demo", calendar_name="XNYS", from_date="2020-01-01", to_date="2020-02-01", isins=[])
+    ingest_context.send(Request(task="ingest", data=ingest).dump())
+
+    status_context = socket.new_context()
+    status_context.send(Request(task="status").dump())
+    response = Response.load(status_context.recv())
+    assert response.error is None
+    assert response.data["running"] is True
+    assert not ingesting.is_set()
+
+    ingesting.set()
+    response = Response.load(ingest_context.recv())
+    assert response.task == "ingest"
+    assert response.error is None
+
+    ingest_context.close()
+    status_context.close()
+    socket.close()
+
+
+def test_bad_request_answered(application: Application):
+    socket = pynng.Req0(dial=f"tcp://{application.socket_config.host}:{application.socket_config.port}")
+    socket.recv_timeout = 5000
+    for _ in range(application.contexts + 1):
+        socket.send(b"{not json")
+        response = Response.load(socket.recv())
+        assert response.task == "unknown" and response.error is not None
+    socket.send(Request(task="status").dump())
+    assert Response.load(socket.recv()).error is None
+    socket.close()
+
+
+def test_metrics(application: Application):
+    socket = pynng.Req0(dial=f"tcp://{application.socket_config.host}:{application.socket_config.port}")
+    socket.recv_timeout = 5000
+    socket.send(Request(task="status").dump())
+    Response.load(socket.recv())
+
+    socket.send(Request(task="metrics").dump())
+    response = Response.load(socket.recv())
+    assert response.error is None
+    calls = {sample["labels"]["route"]: sample["value"] for sample in response.data["router_calls"]}
+    assert calls["status"] >= 1
+    assert "socket_bytes_received" in response.data
+
+    socket.send(Request(task="openmetrics").dump())
+    response = Response.load(socket.recv())
+    assert response.error is None
+    assert 'router_calls_total{route="status"}' in response.data["text"]
+    assert response.data["text"].endswith("# EOF\n")
+    socket.close()
+
+
+def test_credit(application: Application):
+    response = application._route(Request(task="credit", data={"days": 0}))
+    assert "days must be at least 1" in response.error
+
+    response = application._route(Request(task="credit", data={"days": 2}))
+    assert response.error is None
+    assert application.session().status()["credit"] == 2
+
+    # continue leaves credit to the credit route
+    for _ in range(3):
+        assert application._route(Request(task="continue")).error is None
+    assert application.session().status()["credit"] == 2
+
+
+def test_ipc_transport():
+    application = Application(SocketConfig(host="127.0.0.1", port=6566), transport="ipc")
+    info = application.info()
+    assert info["feed"]["socket"]["transport"] == "ipc"
+    assert info["feed"]["socket"]["path"].endswith(".ipc")
+    assert info["broker"]["socket"]["transport"] == "ipc"
+    application.feed.socket.close()
+    application.stock_broker.socket.close()
+
+
+def test_sessions(application: Application, mocker):
+    response = application._route(Request(task="new_session"))
+    assert response.error is None
+    session = response.data
+    assert session["id"] != "default"
+    assert session["feed"]["socket"]["port"] != application.info()["feed"]["socket"]["port"]
+
+    response = application._route(Request(task="credit", data={"days": 2}, session=session["id"]))
+    assert response.error is None
+    assert application.session(session["id"]).status()["credit"] == 2
+    assert application.session().status()["credit"] == 0
+
+    decode = mocker.spy(Envelope, "decode")
+    envelope = Envelope.unpack(
+        Envelope.from_message(Request(task="credit", data={"days": 3}, session=session["id"])).dump()
+    )
+    response = application._route(envelope)
+    assert response.error is None
+    assert application.session(session["id"]).status()["credit"] == 5
+    # the session is read from the header, only the credit route decodes the payload
+    assert decode.call_count == 1
+
+    response = application._route(Request(task="sessions"))
+    assert [s["id"] for s in response.data["sessions"]] == ["default", session["id"]]
+
+    response = application._route(Request(task="close_session", data={"id": session["id"]}))
+    assert response.error is None
+    response = application._route(Request(task="status", session=session["id"]))
+    assert "SessionNotFound" in response.error
+    response = application._route(Request(task="close_session", data={"id": "default"}))
+    assert response.error is not None
+
+
+def test_new_session_stopped(application: Application, mocker):
+    created = []
+
+    def new_session(*args):
+        # the application stops while the session is set up
+        created.append(Session(*args))
+        application.stop()
+        return created[-1]
+
+    mocker.patch("foreverbull_zipline.app.Session", side_effect=new_session)
+    response = application._route(Request(task="new_session"))
+    assert "application stopped" in response.error
+    assert not created[0].running and created[0].feed.socket is None
+    response = application._route(Request(task="new_session"))
+    assert "application stopped" in response.error
+    assert len(created) == 1
+
+
+def test_concurrent_sessions(application: Application, engine_config):
+    sessions = [application.session(application._new_session()["id"]) for _ in range(2)]
+    for session in sessions:
+        assert application._route(Request(task="configure", data=engine_config, session=session.id)).error is None
+        # credit for every day, so both feeds publish while the backtests run side by side
+        assert application._route(Request(task="credit", data={"days": 100}, session=session.id)).error is None
+        assert application._route(Request(task="run", session=session.id)).error is None
+    for session in sessions:
+        session.backtest.join(30)
+        assert len(session._result().periods) > 0
+        assert session.feed.seq > 0 and session.feed.credit > 0
+
+
+def test_reset(application: Application, mocker):
+    release = mocker.patch("foreverbull_zipline.backtest.cache.release_data_portal")
+    backtest = application.backtest
+    # configured and never run
+    backtest._data_portal = ("foreverbull", "XNYS", mocker.Mock())
+    data_portal = backtest._data_portal
+    feed_socket = application.feed.socket
+    response = application._route(Request(task="reset"))
+    assert response.error is None
+    release.assert_called_once_with(*data_portal)
+    assert application.backtest is not backtest
+    assert application.stock_broker.backtest is application.backtest
+    assert application.feed.engine is application.backtest
+    assert application.feed.socket is feed_socket
+
+    application.backtest._data_portal = data_portal
+    application.session().stop()
+    assert release.call_count == 2
+    response = application._route(Request(task="reset"))
+    assert "BacktestNotRunning" in response.error
+
+
+def test_compressed_replies():
+    application = Application(SocketConfig(host="127.0.0.1", port=6594, compression_threshold=64))
+    application.start()
+    application.started.wait(1)
+    requester = pynng.Req0(dial="tcp://127.0.0.1:6594")
+    requester.recv_timeout = 5000
+    try:
+        # peers that do not accept compression get plain replies
+        requester.send(Request(task="info").dump())
+        assert Response.load(requester.recv()).error is None
+
+        peer = compression.Peer(compression.resolve(compression.ZLIB), 64)
+        requester.send(peer.pack(Request(task="info").dump()))
+        data = requester.recv()
+        assert data[:2] == compression.ACCEPT_MAGIC and compression.is_compressed(data[3:])
+
+        assert Response.load(peer.unpack(data)).data["running"] is True
+    finally:
+        requester.close()
+        application.stop()
+        application.join()
@@ -1,8 +1,12 @@
+import pandas as pd
 import pytest
 from foreverbull_zipline.backtest import Backtest
+from foreverbull_zipline.data_bundles.foreverbull import SQLIngester
 from foreverbull_zipline.exceptions import ConfigError
 from tests.factories import populate_sql
 
+from zipline.utils.calendar_utils import get_calendar
+
 
 def test_configure(engine_config):
     Backtest._config = None
@@ -10,6 +14,7 @@ def test_configure(engine_config):
     assert backtest.configured is False
     backtest.configure(engine_config)
     assert backtest.configured is True
+    assert backtest.symbols.isins == engine_config.isins
 
 
 def test_configure_bad_timezone(engine_config):
@@ -46,3 +51,38 @@ def test_run_backtest(engine_config):
     backtest = Backtest()
     backtest.configure(engine_config)
     backtest.run()
+
+
+def test_data_portal(engine_config):
+    backtest = Backtest()
+    assert backtest.data_portal is None
+    backtest.configure(engine_config)
+    assert backtest.data_portal is backtest.trading_algorithm.data_portal
+    backtest.close()
+    assert backtest.data_portal is None
+
+
+def test_daily_bars_from_minutes():
+    minutes = pd.date_range("2020-01-07 14:31", "2020-01-07 21:00", freq="1min", tz="utc").append(
+        pd.date_range("2020-01-08 14:31", "2020-01-08 21:00", freq="1min", tz="utc")
+    )
+    data = pd.DataFrame({"open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 10}, index=minutes)
+    data.iloc[0, data.columns.get_loc("open")] = 0.9
+    data.iloc[-1, data.columns.get_loc("close")] = 1.7
+
+    daily = SQLIngester.daily_bars(data, get_calendar("XNYS"))
+    assert list(daily.index) == [pd.Timestamp("2020-01-07"), pd.Timestamp("2020-01-08")]
+    assert daily.index.tz is None
+    assert list(daily["open"]) == [0.9, 1.0]
+    assert list(daily["close"]) == [1.5, 1.7]
+    assert list(daily["volume"]) == [3900, 3900]
+
+
+def test_daily_bars_session_across_utc_days():
+    # in January the session of 2020-01-08 in Sydney starts at 23:00 UTC the day before
+    minutes = pd.date_range("2020-01-07 22:00", "2020-01-08 05:00", freq="1min", tz="utc")
+    data = pd.DataFrame({"open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 10}, index=minutes)
+
+    daily = SQLIngester.daily_bars(data, get_calendar("XASX"))
+    assert list(daily.index) == [pd.Timestamp("2020-01-08")]
+    assert list(daily["volume"]) == [3600]
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+from foreverbull_zipline import cache
+
+
+@pytest.fixture()
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_calendar(clear_cache):
+    assert cache.calendar("NYSE") is cache.calendar("NYSE")
+
+
+def test_bundle_ingestions(clear_cache, mocker):
+    ingestion = pd.Timestamp("2020-01-01")
+    mocker.patch("foreverbull_zipline.cache._latest_ingestion", side_effect=lambda _: ingestion)
+    load = mocker.patch(
+        "foreverbull_zipline.cache._load",
+        side_effect=lambda name, ingestion: cache.BUNDLE(name, ingestion, mocker.Mock(), "adjustments.sqlite"),
+    )
+    bundle = cache.bundle("demo")
+    assert cache.bundle("demo") is bundle
+    assert load.call_count == 1
+
+    calendar = mocker.Mock()
+    calendar.name = "NYSE"
+    data_portal = mocker.Mock()
+    cache.release_data_portal(bundle, calendar, data_portal)
+    assert cache.acquire_data_portal(bundle, calendar) is data_portal
+
+    # a new ingestion is loaded and everything cached for the earlier one dropped
+    cache.release_data_portal(bundle, calendar, data_portal)
+    ingestion = pd.Timestamp("2020-01-02")
+    reloaded = cache.bundle("demo")
+    assert reloaded is not bundle and reloaded.ingestion == ingestion
+    assert load.call_count == 2
+    assert not cache._data_portals
+    cache.release_data_portal(bundle, calendar, data_portal)
+    assert not cache._data_portals
+
+
+def test_data_portal(clear_cache, foreverbull_bundle, ingest_config):
+    bundle = cache.bundle(ingest_config.name)
+    calendar = cache.calendar("NYSE")
+    data_portal = cache.acquire_data_portal(bundle, calendar)
+    assert cache.acquire_data_portal(bundle, calendar) is not data_portal
+    cache.release_data_portal(bundle, calendar, data_portal)
+    assert cache.acquire_data_portal(bundle, calendar) is data_portal
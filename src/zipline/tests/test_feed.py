@@ -1,9 +1,32 @@
 import threading
 import time
+from collections import deque
 
+import numpy as np
+import pandas as pd
+import pynng
 import pytest
-from foreverbull_zipline.exceptions import EndOfDayError
-from foreverbull_zipline.feed import Feed
+from foreverbull_core.models.backtest import EngineConfig, FeedMode, Period, PortfolioSnapshot
+from foreverbull_core.models.finance import OHLC, OHLCBatch, Position, SymbolTable
+from foreverbull_core.models.socket import Request, SocketConfig
+from foreverbull_core.socket import compression
+from foreverbull_core.socket.exceptions import SocketClosed
+from foreverbull_core.socket.nanomsg import unpack_frame
+from foreverbull_core.socket.topic import split_topic, topic
+from foreverbull_zipline.exceptions import EndOfDayError, ReplayError, SlowConsumerError
+from foreverbull_zipline.feed import FIELDS, Feed
+
+
+def demo_config(**kwargs) -> EngineConfig:
+    return EngineConfig(
+        bundle="demo",
+        calendar="XNYS",
+        start_date="2020-01-07",
+        end_date="2020-01-08",
+        benchmark="US0378331005",
+        isins=["US0378331005"],
+        **kwargs,
+    )
 
 
 def test_start_stop(backtest):
@@ -11,6 +34,15 @@ def test_start_stop(backtest):
     feed.stop()
 
 
+def test_send_after_stop(backtest):
+    feed = Feed(backtest)
+    feed.stop()
+    with pytest.raises(SocketClosed, match="feed stopped"):
+        feed._send(Request(task="day_completed"))
+    # stop sent backtest_completed already
+    feed.backtest_completed()
+
+
 def test_timeout(backtest):
     feed = Feed(backtest)
     feed.lock.clear()
@@ -27,6 +59,368 @@ def test_timeout(backtest):
 def test_timeout_exception(backtest):
     feed = Feed(backtest)
     feed.lock.clear()
-    feed._timeouts = 2
+    feed.timeout = 1.0
     with pytest.raises(EndOfDayError, match="timeout when waiting for new day"):
         feed.wait_for_new_day()
+
+
+def test_send_ohlc(feed, subscriber, timestamp, assets, bar_data):
+    subscriber = subscriber(feed)
+    bar_data.current.return_value = pd.DataFrame(
+        {"open": [1.0, 2.0], "high": [1.5, 2.5], "low": [0.5, 1.5], "close": [1.2, 2.2], "volume": [100.0, 200.0]}
+    )
+
+    feed._send_ohlc(*feed._bars(assets, bar_data))
+    bar_data.current.assert_called_once_with(assets, FIELDS)
+    first = OHLC(**Request.load(subscriber.recv()).data)
+    second = OHLC(**Request.load(subscriber.recv()).data)
+    assert (first.isin, first.close, first.volume) == ("US0378331005", 1.2, 100)
+    assert (second.isin, second.close, second.volume) == ("US88160R1014", 2.2, 200)
+
+
+def test_bars_missing_asset(feed, timestamp, assets, bar_data):
+    bar_data.current.return_value = pd.DataFrame(
+        {
+            "open": [1.0, np.nan],
+            "high": [1.5, np.nan],
+            "low": [0.5, np.nan],
+            "close": [1.2, np.nan],
+            "volume": [100.0, np.nan],
+        }
+    )
+
+    isins, columns, _ = feed._bars(assets, bar_data)
+    assert isins == ["US0378331005", "US88160R1014"]
+    assert columns["volume"].tolist() == [100, 0]
+    assert columns["close"][0] == 1.2 and np.isnan(columns["close"][1])
+
+
+def test_send_ohlc_batch(feed, subscriber, timestamp, assets, bar_data):
+    subscriber = subscriber(feed)
+
+    feed._send_ohlc_batch(*feed._bars(assets, bar_data))
+    message = Request.load(subscriber.recv())
+    assert message.task == "ohlc_batch"
+    batch = OHLCBatch(**message.data)
+    assert batch.isin == ["US0378331005", "US88160R1014"]
+    assert batch.volume == [10, 10]
+    assert batch.time == timestamp.to_pydatetime()
+
+
+def test_send_ohlc_frame(feed, subscriber, timestamp, assets, bar_data):
+    subscriber = subscriber(feed)
+
+    feed._send_ohlc_frame(*feed._bars(assets, bar_data))
+    meta, arrays = unpack_frame(subscriber.recv())
+    assert meta["task"] == "ohlc_batch"
+    assert list(arrays["isin"]) == ["US0378331005", "US88160R1014"]
+    assert list(arrays["close"]) == [10.0, 10.0]
+
+
+def test_send_ohlc_batch_symbol_ids(feed, subscriber, timestamp, assets, bar_data):
+    feed.symbols = SymbolTable(isins=["US88160R1014", "US0378331005"])
+    subscriber = subscriber(feed)
+
+    feed._send_ohlc_batch(*feed._bars(assets, bar_data))
+    message = Request.load(subscriber.recv())
+    assert message.data["isin"] == [1, 0]
+    assert feed.symbols.decode(message.data)["isin"] == ["US0378331005", "US88160R1014"]
+
+    feed._send_ohlc_frame(*feed._bars(assets, bar_data))
+    _, arrays = unpack_frame(subscriber.recv())
+    assert list(arrays["isin"]) == [1, 0]
+
+
+def test_publisher_thread(feed, subscriber, snapshot, mocker):
+    feed.configure(demo_config(feed_queue=2))
+    subscriber = subscriber(feed)
+    mocker.patch.object(feed, "_snapshot", return_value=snapshot)
+    senders = []
+    send = feed.socket.send
+    mocker.patch.object(
+        feed.socket, "send", side_effect=lambda data: senders.append(threading.current_thread()) or send(data)
+    )
+
+    simulation = threading.Thread(target=feed.handle_data, args=(mocker.Mock(), mocker.Mock()))
+    simulation.start()
+    assert [Request.load(subscriber.recv()).task for _ in range(3)] == ["period", "ohlc", "day_completed"]
+    assert simulation.is_alive()
+    assert simulation not in senders and feed._publisher_thread in senders
+
+    feed.grant()
+    simulation.join()
+    assert feed.day_completed
+    feed.backtest_completed()
+    assert Request.load(subscriber.recv()).task == "backtest_completed"
+
+    feed.stop()
+    assert feed._publisher_thread is None
+
+
+def test_publisher_thread_with_credit(feed, snapshot, mocker):
+    feed.configure(demo_config(feed_queue=2, feed_credit=2))
+    mocker.patch.object(feed, "_snapshot", return_value=snapshot)
+    sending = threading.Event()
+    sent = []
+    mocker.patch.object(feed.socket, "send", side_effect=lambda data: sending.wait(5) and sent.append(data))
+
+    # the engine completes both days while the publisher is still sending the first one
+    simulation = threading.Thread(target=lambda: [feed.handle_data(mocker.Mock(), mocker.Mock()) for _ in range(2)])
+    simulation.start()
+    simulation.join(2)
+    assert not simulation.is_alive()
+    assert feed.credit == 0 and feed.day_completed
+    assert sent == []
+
+    sending.set()
+    feed._queue.join()
+    assert len(sent) == 6
+
+
+def test_credit(feed, mocker):
+    feed.timeout = 1.0
+    mocker.patch.object(feed, "_send_day", return_value=True)
+    mocker.patch.object(feed, "_snapshot")
+    mocker.patch("foreverbull_zipline.feed.get_datetime")
+
+    feed.grant(2)
+    assert feed.credit == 2
+    feed.handle_data(mocker.Mock(), mocker.Mock())
+    feed.handle_data(mocker.Mock(), mocker.Mock())
+    assert feed.credit == 0
+    assert feed.day_completed
+
+    simulation = threading.Thread(target=feed.handle_data, args=(mocker.Mock(), mocker.Mock()))
+    simulation.start()
+    simulation.join(0.2)
+    assert simulation.is_alive()
+    feed.grant(3)
+    simulation.join()
+    assert feed.credit == 2
+
+
+def test_resume(feed, mocker):
+    feed.timeout = 1.0
+    mocker.patch.object(feed, "_send_day", return_value=True)
+    mocker.patch.object(feed, "_snapshot")
+    mocker.patch("foreverbull_zipline.feed.get_datetime")
+
+    # continues sent before the engine waits leave one day of credit
+    feed.resume()
+    feed.resume()
+    assert feed.credit == 1
+    feed.grant(2)
+    feed.resume()
+    assert feed.credit == 3
+
+    feed.credit = 0
+    simulation = threading.Thread(target=feed.handle_data, args=(mocker.Mock(), mocker.Mock()))
+    simulation.start()
+    simulation.join(0.2)
+    assert simulation.is_alive()
+    feed.resume()
+    simulation.join()
+    assert feed.credit == 0
+
+
+def test_release_and_rearm(feed, subscriber, snapshot, mocker):
+    subscriber = subscriber(feed)
+    mocker.patch.object(feed, "_snapshot", return_value=snapshot)
+
+    simulation = threading.Thread(target=feed.handle_data, args=(mocker.Mock(), mocker.Mock()))
+    simulation.start()
+    assert [Request.load(subscriber.recv()).seq for _ in range(3)] == [0, 1, 2]
+    feed.release()
+    simulation.join(1)
+    assert not simulation.is_alive()
+    # the released engine runs on without sending
+    feed.handle_data(mocker.Mock(), mocker.Mock())
+    assert feed.seq == 3
+
+    engine = mocker.Mock()
+    socket = feed.socket
+    feed.rearm(engine)
+    assert feed.engine is engine and feed.socket is socket
+    assert feed.seq == 0 and not feed.buffer
+    feed.grant()
+    feed.handle_data(mocker.Mock(), mocker.Mock())
+    assert [Request.load(subscriber.recv()).seq for _ in range(3)] == [0, 1, 2]
+
+
+def test_portfolio_snapshot(feed, subscriber):
+    feed.portfolio = True
+    feed.keyframe = 3
+    subscriber = subscriber(feed)
+
+    period = Period(period=pd.Timestamp("2020-01-07", tz="utc").to_pydatetime())
+
+    def position(isin, amount):
+        return Position(isin=isin, amount=amount, cost_basis=10.0, period=period.period)
+
+    days = [
+        [position("A", 10), position("B", 5)],
+        [position("A", 10), position("B", 7)],
+        [position("B", 7)],
+        [position("B", 7), position("C", 1)],
+    ]
+    positions = None
+    snapshots = []
+    for day in days:
+        feed._send_portfolio(period, day)
+        message = Request.load(subscriber.recv())
+        assert message.task == "portfolio"
+        snapshot = PortfolioSnapshot(**message.data)
+        positions = snapshot.apply(positions)
+        assert positions == {p.isin: p for p in day}
+        snapshots.append(snapshot)
+
+    assert snapshots[0].keyframe
+    assert [p.isin for p in snapshots[1].positions] == ["B"] and snapshots[1].closed == []
+    assert snapshots[2].positions == [] and snapshots[2].closed == ["A"]
+    assert snapshots[3].keyframe and len(snapshots[3].positions) == 2
+
+
+def test_minute_frequency(feed, subscriber, assets, mocker):
+    feed.minute = True
+    feed.mode = FeedMode.OHLC_BATCH
+    subscriber = subscriber(feed)
+
+    close = pd.Timestamp("2020-01-07 21:00", tz="utc")
+    minutes = [pd.Timestamp("2020-01-07 20:59", tz="utc"), close, close]
+    mocker.patch("foreverbull_zipline.feed.get_datetime", side_effect=lambda: minutes[0])
+    mocker.patch("foreverbull_zipline.feed.Period.from_zipline_backtest", return_value=Period(period=close))
+    feed.engine = mocker.Mock()
+    feed.engine.trading_algorithm.trading_calendar.session_close.return_value = close
+    feed.engine.trading_algorithm.portfolio.positions = {}
+    feed.engine.data_portal.get_spot_value.return_value = [10.0, 10.0]
+    context = mocker.Mock(assets=assets)
+    data = mocker.Mock(current_session=pd.Timestamp("2020-01-07"))
+
+    # within the session only bars are sent and the engine does not wait
+    feed.handle_data(context, data)
+    assert Request.load(subscriber.recv()).task == "ohlc_batch"
+    data.current.assert_not_called()
+
+    minutes.pop(0)
+    feed.grant()
+    feed.handle_data(context, data)
+    assert [Request.load(subscriber.recv()).task for _ in range(3)] == ["period", "ohlc_batch", "day_completed"]
+    assert feed.day_completed
+    assert feed.engine.trading_algorithm.trading_calendar.session_close.call_count == 1
+
+
+def test_sequence_and_replay(feed, subscriber):
+    feed.buffer = deque(maxlen=10)
+    subscriber = subscriber(feed)
+
+    for _ in range(3):
+        feed._send(Request(task="day_completed"))
+    assert [Request.load(subscriber.recv()).seq for _ in range(3)] == [0, 1, 2]
+
+    assert feed.replay(1) == 2
+    assert [Request.load(subscriber.recv()).seq for _ in range(2)] == [1, 2]
+    assert feed.replay(3) == 0
+
+    feed.buffer = deque(feed.buffer, maxlen=1)
+    feed._send(Request(task="day_completed"))
+    with pytest.raises(ReplayError, match="message 2 is no longer buffered"):
+        feed.replay(2)
+
+
+def test_replay_disabled(feed):
+    feed._send(Request(task="day_completed"))
+    assert not feed.buffer
+    with pytest.raises(ReplayError, match="replay is disabled"):
+        feed.replay(0)
+
+    feed.configure(demo_config(feed_buffer=2))
+    for _ in range(3):
+        feed._send(Request(task="day_completed"))
+    assert [seq for seq, _, _ in feed.buffer] == [2, 3]
+
+
+def test_backpressure(feed):
+    feed.window = 2
+    feed.timeout = 1.0
+    feed._send(Request(task="day_completed"))
+    feed._send(Request(task="day_completed"))
+    with pytest.raises(SlowConsumerError, match="consumer is 2 messages behind"):
+        feed._send(Request(task="day_completed"))
+
+    def ack():
+        time.sleep(0.2)
+        feed.ack(0)
+
+    thread = threading.Thread(target=ack)
+    thread.start()
+    feed._send(Request(task="day_completed"))
+    thread.join()
+    assert feed.seq == 3
+
+
+@pytest.mark.parametrize("feed_queue", [0, 2])
+def test_slow_consumer_fails_backtest(backtest, feed, snapshot, feed_queue):
+    feed.configure(demo_config(feed_queue=feed_queue, feed_window=2))
+    feed.timeout = 0.2
+
+    # the engine does not wait for the day, period and ohlc are sent and day_completed waits for the consumer
+    feed.grant(2)
+    if feed_queue:
+        feed.publish(snapshot)
+        feed._queue.join()
+    else:
+        with pytest.raises(SlowConsumerError):
+            feed.publish(snapshot)
+    assert isinstance(feed.error, SlowConsumerError)
+    with pytest.raises(SlowConsumerError):
+        feed.publish(snapshot)
+
+    feed.release()
+    feed.rearm(backtest)
+    assert feed.error is None
+
+
+def test_topics(backtest, subscriber):
+    feed = Feed(backtest, SocketConfig(socket_type="publisher", topics=True))
+    periods = subscriber(feed, topic("period"))
+    asset = subscriber(feed, topic("ohlc", "US0378331005"))
+
+    feed._send(Request(task="ohlc", data={"isin": "US88160R1014"}))
+    feed._send(Request(task="ohlc", data={"isin": "US0378331005"}))
+    feed._send(Request(task="period", data={"period": "2020-01-07"}))
+
+    key, message = split_topic(periods.recv())
+    assert key == b"period/"
+    assert Request.load(bytes(message)).task == "period"
+
+    key, message = split_topic(asset.recv())
+    assert key == b"ohlc/US0378331005/"
+    assert Request.load(bytes(message)).data == {"isin": "US0378331005"}
+
+    asset.recv_timeout = 200
+    with pytest.raises(pynng.exceptions.Timeout):
+        asset.recv()
+    feed.stop()
+
+
+def test_topics_compressed(backtest, subscriber):
+    feed = Feed(
+        backtest, SocketConfig(socket_type="publisher", topics=True, compression="zlib", compression_threshold=8)
+    )
+    feed.buffer = deque(maxlen=10)
+    asset = subscriber(feed, topic("ohlc", "US0378331005"))
+
+    # repeated data so the messages compress
+    feed._send(Request(task="ohlc", data={"isin": "US88160R1014", "note": "a" * 256}))
+    feed._send(Request(task="ohlc", data={"isin": "US0378331005", "note": "a" * 256}))
+    key, message = split_topic(asset.recv())
+    assert key == b"ohlc/US0378331005/"
+    assert compression.is_compressed(bytes(message))
+    assert Request.load(compression.decompress(bytes(message))).data["isin"] == "US0378331005"
+
+    # replayed messages keep their topic
+    assert feed.replay(1) == 1
+    key, message = split_topic(asset.recv())
+    assert key == b"ohlc/US0378331005/"
+    assert Request.load(compression.decompress(bytes(message))).seq == 1
+    feed.stop()
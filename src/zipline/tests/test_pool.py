@@ -0,0 +1,72 @@
+import time
+
+import pynng
+import pytest
+from foreverbull_core.models.socket import Request, Response, SocketConfig
+from foreverbull_zipline.pool import EnginePool, Supervisor, serve_application
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = EnginePool(2)
+    pool.start()
+    yield pool
+    pool.stop()
+
+
+def request(port: int, task: str) -> Response:
+    socket = pynng.Req0()
+    socket.dial(f"tcp://127.0.0.1:{port}", block=False)
+    socket.recv_timeout = 10000
+    socket.send(Request(task=task).dump())
+    response = Response.load(socket.recv())
+    socket.close()
+    return response
+
+
+def test_engine_pool(pool: EnginePool):
+    engine = pool.acquire(60)
+    engine.run(serve_application, SocketConfig(host="127.0.0.1", port=6591))
+    response = request(6591, "info")
+    assert response.error is None
+    assert response.data["running"] is True
+
+    # an engine is started in place of the one acquired
+    deadline = time.monotonic() + 60
+    while pool.idle < pool.size and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert pool.idle == pool.size
+
+    engine.stop()
+    assert engine.process.exitcode == 0
+
+
+def test_supervisor(pool: EnginePool):
+    supervisor = Supervisor(pool, SocketConfig(host="127.0.0.1", port=6592))
+    supervisor.start()
+    assert request(6592, "info").error is None
+    first = supervisor.engine
+    request(6592, "stop")
+
+    # the next engine takes over the socket once the application is stopped
+    deadline = time.monotonic() + 30
+    while supervisor.engine in (None, first) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert supervisor.engine is not first
+    assert request(6592, "info").error is None
+
+    supervisor.stop()
+    supervisor.join(10)
+    assert not supervisor.is_alive()
+    assert not first.process.is_alive()
+
+
+def test_engine_pool_gives_up(mocker):
+    engine = mocker.patch("foreverbull_zipline.pool.Engine")
+    engine.return_value.ready.return_value = False
+    pool = EnginePool(1, backoff=0.01, max_failures=3)
+    pool.start()
+    with pytest.raises(RuntimeError, match="engine processes failed to start"):
+        pool.acquire(10)
+    assert engine.call_count == 3
+    pool.stop()
@@ -0,0 +1,151 @@
+import multiprocessing
+import threading
+import time
+
+import pynng
+import pytest
+from foreverbull_core.models.backtest import EngineConfig
+from foreverbull_core.models.socket import Request, Response, SocketConfig
+from foreverbull_zipline.app import Application
+from foreverbull_zipline.exceptions import EngineNotAvailable
+from foreverbull_zipline.pool import EnginePool
+from foreverbull_zipline.session import ACQUIRE_TIMEOUT, Session
+from foreverbull_zipline.simulation import Simulation, SimulationError, SimulationServer, simulate
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = EnginePool(1)
+    pool.start()
+    yield pool
+    pool.stop()
+
+
+@pytest.fixture()
+def application(pool: EnginePool):
+    application = Application(SocketConfig(host="127.0.0.1", port=6593), pool=pool)
+    application.start()
+    if not application.started.wait(60):
+        raise Exception("Application not running")
+    yield application
+    application.stop()
+    application.join()
+
+
+def test_simulation(application: Application):
+    session = application.session()
+    assert isinstance(session.backtest, Simulation)
+    process = session.backtest.engine.process
+    assert process.is_alive()
+    assert application.session().status()["configured"] is False
+
+    # errors of the engine process are returned as from the application
+    config = EngineConfig(
+        bundle="missing", calendar="NYSE", start_date="2020-01-07", end_date="2020-02-01", benchmark="", isins=[]
+    )
+    response = application._route(Request(task="configure", data=config))
+    assert response.error is not None
+
+    # broker requests are routed by the backtest in the engine process
+    data = session.stock_broker.handle(Request(task="get_open_orders").dump())
+    assert Response.load(data).task == "get_open_orders"
+
+    response = application._route(Request(task="reset"))
+    assert response.error is None
+    assert application.backtest is session.backtest
+
+    application.stop()
+    process.join(10)
+    assert not process.is_alive()
+
+
+def test_close_session(application: Application):
+    response = application._route(Request(task="new_session"))
+    assert response.error is None
+    process = application.session(response.data["id"]).backtest.engine.process
+    response = application._route(Request(task="close_session", data={"id": response.data["id"]}))
+    assert response.error is None
+    process.join(10)
+    assert not process.is_alive()
+
+
+def test_close_session_dead_engine(application: Application):
+    response = application._route(Request(task="new_session"))
+    session = application.session(response.data["id"])
+    session.backtest.engine.process.kill()
+    session.backtest.engine.process.join(10)
+
+    assert not session.backtest.is_alive()
+    session.backtest.join(1)
+    response = application._route(Request(task="close_session", data={"id": session.id}))
+    assert response.error is None
+    assert session.feed.socket is None
+
+
+def test_broker_dead_engine(application: Application, mocker):
+    response = application._route(Request(task="new_session"))
+    session = application.session(response.data["id"])
+    process = session.backtest.engine.process
+    calls = session.backtest._calls
+
+    def send(call):
+        # the engine dies while the request is on its way
+        process.kill()
+        process.join(10)
+        calls.send(call)
+
+    mocker.patch.object(session.backtest, "_calls", send=send, recv=calls.recv)
+    # started by run otherwise
+    session.stock_broker.start()
+    requester = pynng.Req0(dial=session.stock_broker.socket.url(), recv_timeout=5000)
+    requester.send(Request(task="get_open_orders").dump())
+    response = Response.load(requester.recv())
+    assert response.task == "get_open_orders"
+    assert "SimulationError" in response.error
+
+    # the broker keeps serving
+    requester.send(Request(task="get_open_orders").dump())
+    assert "SimulationError" in Response.load(requester.recv()).error
+    assert session.stock_broker.is_alive()
+    requester.close()
+
+
+def test_simulate_unpicklable_error(mocker):
+    error = ValueError("bad configuration")
+    error.lock = threading.Lock()
+    mocker.patch.object(SimulationServer, "configured", side_effect=error)
+    calls, server_calls = multiprocessing.Pipe()
+    days, server_days = multiprocessing.Pipe()
+    server = threading.Thread(target=simulate, args=(server_calls, server_days))
+    server.start()
+
+    calls.send(("configured", ()))
+    ok, value = calls.recv()
+    assert not ok
+    assert isinstance(value, SimulationError) and "bad configuration" in str(value)
+
+    calls.close()
+    server.join(10)
+    assert not server.is_alive()
+
+
+def test_session_without_engine(mocker):
+    pool = mocker.Mock()
+    pool.acquire.side_effect = TimeoutError("no engine ready")
+    with pytest.raises(EngineNotAvailable, match="no engine ready"):
+        Session("test", pool=pool)
+    pool.acquire.assert_called_once_with(ACQUIRE_TIMEOUT)
+
+
+def test_run(application: Application, engine_config):
+    session = application.session()
+    session.feed.timeout = 0.1
+    assert application._route(Request(task="configure", data=engine_config)).error is None
+    assert session.feed.symbols is None
+    application.feed.grant(100)
+    assert application._route(Request(task="run")).error is None
+    deadline = time.monotonic() + 60
+    while session.backtest.is_alive() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert len(session._result().periods) > 0
+    assert session.feed.seq > 0